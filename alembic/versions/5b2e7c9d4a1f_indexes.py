@@ -0,0 +1,49 @@
+"""Indexes for hot filters
+
+Revision ID: 5b2e7c9d4a1f
+Revises: 16cee3a17066
+Create Date: 2023-12-20 10:12:41.318264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2e7c9d4a1f'
+down_revision: Union[str, None] = '16cee3a17066'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # feed of user and global lists of posts, ordered by (created_at, id)
+    op.create_index('ix_images_owner_id_crated_at_id', 'images', ['owner_id', 'crated_at', 'id'])
+    op.create_index('ix_images_crated_at_id', 'images', ['crated_at', 'id'])
+    # comments of image ordered by (created_at, id), comments of user
+    op.create_index('ix_comments_image_id_crated_at_id', 'comments', ['image_id', 'crated_at', 'id'])
+    op.create_index('ix_comments_owner_id', 'comments', ['owner_id'])
+    # the same tag was attachable twice, keep the first link before unique constraint
+    op.execute(
+        "DELETE FROM image_m2m_tag WHERE id NOT IN "
+        "(SELECT MIN(id) FROM image_m2m_tag GROUP BY image_id, tag_id)"
+    )
+    with op.batch_alter_table('image_m2m_tag') as batch_op:
+        batch_op.create_unique_constraint('uq_image_m2m_tag_image_id_tag_id', ['image_id', 'tag_id'])
+    op.create_index('ix_image_m2m_tag_tag_id_image_id', 'image_m2m_tag', ['tag_id', 'image_id'])
+    # purge of old tokens
+    op.create_index('ix_bannedlist_crated_at', 'bannedlist', ['crated_at'])
+    op.create_index('ix_users_roles', 'users', ['roles'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_roles', table_name='users')
+    op.drop_index('ix_bannedlist_crated_at', table_name='bannedlist')
+    op.drop_index('ix_image_m2m_tag_tag_id_image_id', table_name='image_m2m_tag')
+    with op.batch_alter_table('image_m2m_tag') as batch_op:
+        batch_op.drop_constraint('uq_image_m2m_tag_image_id_tag_id', type_='unique')
+    op.drop_index('ix_comments_owner_id', table_name='comments')
+    op.drop_index('ix_comments_image_id_crated_at_id', table_name='comments')
+    op.drop_index('ix_images_crated_at_id', table_name='images')
+    op.drop_index('ix_images_owner_id_crated_at_id', table_name='images')
@@ -0,0 +1,165 @@
+"""Full-text search of posts
+
+Revision ID: 8c1d3e5f7a9b
+Revises: 5b2e7c9d4a1f
+Create Date: 2023-12-21 11:05:17.402113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1d3e5f7a9b'
+down_revision: Union[str, None] = '5b2e7c9d4a1f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# DDL as of this revision, later changes of src/database/search.py get their own migration
+POSTGRES_CREATE = [
+    "ALTER TABLE images ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE INDEX IF NOT EXISTS ix_images_search_vector ON images USING gin (search_vector)",
+    """
+    CREATE OR REPLACE FUNCTION images_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce((
+                SELECT string_agg(t.name, ' ')
+                FROM image_m2m_tag m JOIN tags t ON t.id = m.tag_id
+                WHERE m.image_id = NEW.id
+            ), '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS images_search_vector ON images",
+    """
+    CREATE TRIGGER images_search_vector BEFORE INSERT OR UPDATE OF description ON images
+    FOR EACH ROW EXECUTE FUNCTION images_search_vector_update()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION image_m2m_tag_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            UPDATE images SET description = description WHERE id = OLD.image_id;
+            RETURN OLD;
+        END IF;
+        UPDATE images SET description = description WHERE id = NEW.image_id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS image_m2m_tag_search_vector ON image_m2m_tag",
+    """
+    CREATE TRIGGER image_m2m_tag_search_vector AFTER INSERT OR DELETE ON image_m2m_tag
+    FOR EACH ROW EXECUTE FUNCTION image_m2m_tag_search_vector_update()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION tags_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        UPDATE images SET description = description
+        WHERE id IN (SELECT image_id FROM image_m2m_tag WHERE tag_id = NEW.id);
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS tags_search_vector ON tags",
+    """
+    CREATE TRIGGER tags_search_vector AFTER UPDATE OF name ON tags
+    FOR EACH ROW EXECUTE FUNCTION tags_search_vector_update()
+    """,
+    "UPDATE images SET description = description",
+]
+
+POSTGRES_DROP = [
+    "DROP TRIGGER IF EXISTS tags_search_vector ON tags",
+    "DROP FUNCTION IF EXISTS tags_search_vector_update()",
+    "DROP TRIGGER IF EXISTS image_m2m_tag_search_vector ON image_m2m_tag",
+    "DROP FUNCTION IF EXISTS image_m2m_tag_search_vector_update()",
+    "DROP TRIGGER IF EXISTS images_search_vector ON images",
+    "DROP FUNCTION IF EXISTS images_search_vector_update()",
+    "DROP INDEX IF EXISTS ix_images_search_vector",
+    "ALTER TABLE images DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS images_fts USING fts5(description, tags)",
+    """
+    CREATE TRIGGER IF NOT EXISTS images_fts_insert AFTER INSERT ON images BEGIN
+        INSERT INTO images_fts(rowid, description, tags)
+        VALUES (NEW.id, coalesce(NEW.description, ''), '');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS images_fts_update AFTER UPDATE OF description ON images BEGIN
+        UPDATE images_fts SET description = coalesce(NEW.description, '') WHERE rowid = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS images_fts_delete AFTER DELETE ON images BEGIN
+        DELETE FROM images_fts WHERE rowid = OLD.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS image_m2m_tag_fts_insert AFTER INSERT ON image_m2m_tag BEGIN
+        UPDATE images_fts SET tags = coalesce((
+            SELECT group_concat(t.name, ' ') FROM image_m2m_tag m JOIN tags t ON t.id = m.tag_id
+            WHERE m.image_id = NEW.image_id
+        ), '')
+        WHERE rowid = NEW.image_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS image_m2m_tag_fts_delete AFTER DELETE ON image_m2m_tag BEGIN
+        UPDATE images_fts SET tags = coalesce((
+            SELECT group_concat(t.name, ' ') FROM image_m2m_tag m JOIN tags t ON t.id = m.tag_id
+            WHERE m.image_id = OLD.image_id
+        ), '')
+        WHERE rowid = OLD.image_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tags_fts_update AFTER UPDATE OF name ON tags BEGIN
+        UPDATE images_fts SET tags = coalesce((
+            SELECT group_concat(t.name, ' ') FROM image_m2m_tag m JOIN tags t ON t.id = m.tag_id
+            WHERE m.image_id = images_fts.rowid
+        ), '')
+        WHERE rowid IN (SELECT image_id FROM image_m2m_tag WHERE tag_id = NEW.id);
+    END
+    """,
+    "DELETE FROM images_fts",
+    """
+    INSERT INTO images_fts(rowid, description, tags)
+    SELECT i.id, coalesce(i.description, ''), coalesce((
+        SELECT group_concat(t.name, ' ') FROM image_m2m_tag m JOIN tags t ON t.id = m.tag_id
+        WHERE m.image_id = i.id
+    ), '')
+    FROM images i
+    """,
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS tags_fts_update",
+    "DROP TRIGGER IF EXISTS image_m2m_tag_fts_delete",
+    "DROP TRIGGER IF EXISTS image_m2m_tag_fts_insert",
+    "DROP TRIGGER IF EXISTS images_fts_delete",
+    "DROP TRIGGER IF EXISTS images_fts_update",
+    "DROP TRIGGER IF EXISTS images_fts_insert",
+    "DROP TABLE IF EXISTS images_fts",
+]
+
+
+def upgrade() -> None:
+    # tsvector column + GIN index + triggers (PostgreSQL), FTS5 table + triggers (SQLite),
+    # filled from existing posts
+    statements = {"postgresql": POSTGRES_CREATE, "sqlite": SQLITE_CREATE}
+    for statement in statements.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    statements = {"postgresql": POSTGRES_DROP, "sqlite": SQLITE_DROP}
+    for statement in statements.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
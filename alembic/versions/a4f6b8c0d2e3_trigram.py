@@ -0,0 +1,40 @@
+"""Trigram indexes for fuzzy search
+
+Revision ID: a4f6b8c0d2e3
+Revises: 8c1d3e5f7a9b
+Create Date: 2023-12-21 16:40:52.118604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4f6b8c0d2e3'
+down_revision: Union[str, None] = '8c1d3e5f7a9b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # pg_trgm GIN indexes of images.description and users.username (PostgreSQL only)
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_images_description_trgm ON images "
+        "USING gin (description gin_trgm_ops)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_users_username_trgm ON users "
+        "USING gin (username gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    # the extension stays, other objects may use it
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_users_username_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_images_description_trgm")
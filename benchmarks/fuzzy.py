@@ -0,0 +1,104 @@
+"""Benchmark: fuzzy search with the in-memory trigram index vs ``LIKE '%term%'``.
+
+    python benchmarks/fuzzy.py --rows 1000000 --limit 10
+
+Seeds a SQLite database and times ``FuzzySearch.search`` (the fallback
+``TrigramIndex`` of src/services/fuzzy.py, built once, not timed) against the
+substring search of ``PostServices.search_posts_paginated``. On PostgreSQL
+the fuzzy side is ``<%`` with the pg_trgm GIN index.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.database.models import Base, Image, User  # noqa: E402
+from src.services.fuzzy import fuzzy_search  # noqa: E402
+from src.services.posts import PostServices  # noqa: E402
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def seed(path: str, rows: int) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    rnd = random.Random(1)
+    words = ["".join(rnd.choices(LETTERS, k=rnd.randint(4, 9))) for _ in range(50_000)]
+    words[:3] = ["sunset", "mountain", "photographer"]
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [{"id": 1, "username": "bench", "email": "bench@example.com", "password": "x"}],
+        )
+        batch = 50_000
+        for start in range(0, rows, batch):
+            conn.execute(
+                insert(Image.__table__),
+                [
+                    {
+                        "owner_id": 1,
+                        "url_original": f"https://example.com/{i}.jpg",
+                        "url_original_qr": "",
+                        "description": " ".join(rnd.choices(words, k=6)),
+                    }
+                    for i in range(start, min(start + batch, rows))
+                ],
+            )
+    engine.dispose()
+
+
+async def timed(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+async def run(path: str, limit: int, repeat: int) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    SessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    services = PostServices(Image)
+    async with SessionLocal() as db:
+        started = time.perf_counter()
+        await fuzzy_search.search(db, "warm up", limit=limit)
+        print(f"index build {time.perf_counter() - started:9.2f} s")
+        # exact word, prefix, typo, no match
+        for term in ("sunset", "mounta", "fotographer", "qqqqqq"):
+            async def fuzzy():
+                db.expunge_all()
+                return await fuzzy_search.search(db, term, threshold=0.5, limit=limit)
+
+            async def like():
+                db.expunge_all()
+                return await services.search_posts_paginated(db=db, description=term, limit=limit)
+
+            for label, func in (("fuzzy", fuzzy), ("like", like)):
+                ms = await timed(func, repeat)
+                print(f"{term!r:<15} {label:<6} {ms:9.2f} ms")
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "bench.sqlite")
+        seed(path, args.rows)
+        asyncio.run(run(path, args.limit, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
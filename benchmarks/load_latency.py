@@ -0,0 +1,82 @@
+"""Load benchmark: latency percentiles under concurrent clients.
+
+Run the application (``uvicorn main:app --port 9000``) and then:
+
+    python benchmarks/load_latency.py --url http://localhost:9000/api/healthchecker -c 1 -c 50
+
+Compare the output before and after a change (e.g. sync ``Session`` vs
+``AsyncSession``): with blocking queries p99 grows with the number of
+concurrent clients, because every query stalls the whole event loop.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from httpx import AsyncClient
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def client_worker(
+    ac: AsyncClient, url: str, requests: int, headers: dict, latencies: list[float]
+) -> int:
+    errors = 0
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await ac.get(url, headers=headers)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            errors += 1
+    return errors
+
+
+async def run(url: str, concurrency: int, requests: int, token: str | None) -> dict:
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    latencies: list[float] = []
+    async with AsyncClient(timeout=30) as ac:
+        started = time.perf_counter()
+        errors = await asyncio.gather(
+            *(
+                client_worker(ac, url, requests, headers, latencies)
+                for _ in range(concurrency)
+            )
+        )
+        elapsed = time.perf_counter() - started
+    return {
+        "clients": concurrency,
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:9000/api/healthchecker")
+    parser.add_argument(
+        "-c", "--concurrency", type=int, action="append",
+        help="number of concurrent clients, can be repeated (default: 1, 10, 50)",
+    )
+    parser.add_argument("-n", "--requests", type=int, default=100, help="requests per client")
+    parser.add_argument("--token", default=None, help="access token for protected routes")
+    args = parser.parse_args()
+
+    print(f"{'clients':>8} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for concurrency in args.concurrency or [1, 10, 50]:
+        r = asyncio.run(run(args.url, concurrency, args.requests, args.token))
+        print(
+            f"{r['clients']:>8} {r['requests']:>9} {r['errors']:>7} {r['rps']:>9.1f} "
+            f"{r['p50']:>9.2f} {r['p95']:>9.2f} {r['p99']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Benchmark: LIMIT/OFFSET vs keyset (cursor) pagination of a user feed.
+
+    python benchmarks/pagination.py --rows 100000 --limit 10
+
+Seeds a SQLite database with posts of one user and times
+``PostServices.get_post_list_by_user_paginated`` at page 1 and at the
+last page (page 10,000 with the defaults) in both modes.
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.database.models import Base, Image, User  # noqa: E402
+from src.services.pagination import encode_cursor  # noqa: E402
+from src.services.posts import PostServices  # noqa: E402
+
+
+def seed(path: str, rows: int) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    start = datetime(2023, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [{"id": 1, "username": "bench", "email": "bench@example.com", "password": "x"}],
+        )
+        conn.execute(
+            insert(Image.__table__),
+            [
+                {
+                    "owner_id": 1,
+                    "url_original": f"https://example.com/{i}.jpg",
+                    "url_original_qr": "",
+                    "description": f"post {i}",
+                    # several posts per second, so the id breaks ties
+                    "crated_at": start + timedelta(seconds=i // 3, microseconds=1),
+                    "updated_at": start,
+                }
+                for i in range(rows)
+            ],
+        )
+    engine.dispose()
+
+
+async def timed(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+async def run(path: str, rows: int, limit: int, repeat: int) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    SessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    services = PostServices(Image)
+    last_page = rows // limit
+    async with SessionLocal() as db:
+        # cursor of the row before the last page, as a client walking pages would have it
+        before_last = (
+            await db.execute(
+                text(
+                    "SELECT crated_at, id FROM images WHERE owner_id = 1 "
+                    "ORDER BY crated_at, id LIMIT 1 OFFSET :offset"
+                ),
+                {"offset": (last_page - 1) * limit - 1},
+            )
+        ).one()
+        cursor = encode_cursor(datetime.fromisoformat(before_last[0]), before_last[1])
+        cases = {
+            "offset page 1": dict(offset=0),
+            f"offset page {last_page}": dict(offset=(last_page - 1) * limit),
+            "cursor page 1": dict(),
+            f"cursor page {last_page}": dict(cursor=cursor),
+        }
+        for label, kwargs in cases.items():
+            async def page():
+                db.expunge_all()
+                return await services.get_post_list_by_user_paginated(
+                    db=db, user_id=1, limit=limit, **kwargs
+                )
+
+            ms = await timed(page, repeat)
+            print(f"{label:<22} {ms:8.2f} ms")
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "bench.sqlite")
+        seed(path, args.rows)
+        asyncio.run(run(path, args.rows, args.limit, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark: QR rendering through qrcode's PIL image factory vs the NumPy rasterizer.
+
+    python benchmarks/qr.py --urls 200 --box-size 10
+
+Renders codes of Cloudinary-like URLs the way the routes did before
+(``QRCode.make_image`` saved as PNG) and with ``render_qr`` of
+src/services/qr.py as 1-bit PNG and as SVG. Prints the median render
+time and the average size of the result, then the time of rasterization
+alone: the encoding of ``QRCode.make`` (choice of the mask pattern) is the
+same for both paths and takes most of a full render. Caches are not involved.
+"""
+import argparse
+import statistics
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+import qrcode
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.services.qr import QRSpec, qr_matrix, render_png, render_qr, render_svg  # noqa: E402
+
+
+def legacy_code(spec: QRSpec) -> qrcode.QRCode:
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=spec.box_size,
+        border=spec.border,
+    )
+    qr.add_data(spec.data)
+    qr.make(fit=True)
+    return qr
+
+
+def legacy_image(spec: QRSpec, qr: qrcode.QRCode) -> bytes:
+    out = BytesIO()
+    qr.make_image(fill_color=spec.fill, back_color=spec.back).save(out, format="PNG")
+    return out.getvalue()
+
+
+def legacy(spec: QRSpec) -> bytes:
+    return legacy_image(spec, legacy_code(spec))
+
+
+def measure(render, specs) -> tuple[float, float]:
+    times, sizes = [], []
+    for spec in specs:
+        started = time.perf_counter()
+        data = render(spec)
+        times.append(time.perf_counter() - started)
+        sizes.append(len(data))
+    return statistics.median(times) * 1000, statistics.mean(sizes)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--urls", type=int, default=200)
+    parser.add_argument("--box-size", type=int, default=10)
+    args = parser.parse_args()
+    urls = [
+        f"https://res.cloudinary.com/demo/image/upload/v1702750944/publication/image_{i}_{i * 7919:08x}.jpg"
+        for i in range(args.urls)
+    ]
+    for colors in ({}, {"fill": "navy", "back": "lightyellow"}):
+        print(f"colors: {colors or 'black on white'}")
+        cases = {
+            "qrcode PIL factory": (legacy, "png"),
+            "numpy 1-bit png": (render_qr, "png"),
+            "numpy svg": (render_qr, "svg"),
+        }
+        for label, (render, format) in cases.items():
+            specs = [QRSpec(url, box_size=args.box_size, format=format, **colors) for url in urls]
+            ms, size = measure(render, specs)
+            print(f"  {label:<20} {ms:8.3f} ms {size:10.0f} bytes")
+        print("  rasterization only:")
+        specs = [QRSpec(url, box_size=args.box_size, **colors) for url in urls]
+        codes = {spec: legacy_code(spec) for spec in specs}
+        matrices = {spec: qr_matrix(spec) for spec in specs}
+        cases = {
+            "qrcode PIL factory": lambda spec: legacy_image(spec, codes[spec]),
+            "numpy 1-bit png": lambda spec: render_png(spec, matrices[spec]),
+            "numpy svg": lambda spec: render_svg(spec, matrices[spec]),
+        }
+        for label, render in cases.items():
+            ms, size = measure(render, specs)
+            print(f"  {label:<20} {ms:8.3f} ms {size:10.0f} bytes")
+
+
+if __name__ == "__main__":
+    main()
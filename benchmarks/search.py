@@ -0,0 +1,100 @@
+"""Benchmark: full-text search vs ``description LIKE '%term%'``.
+
+    python benchmarks/search.py --rows 1000000 --limit 10
+
+Seeds a SQLite database (FTS5 index of src/database/search.py, the same
+triggers keep it in sync) and times a ranked full-text query of
+``PostSearch.search`` against the substring search of
+``PostServices.search_posts_paginated``. On PostgreSQL the full-text side
+is the tsvector column with GIN index.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.database.models import Base, Image, User  # noqa: E402
+from src.services.posts import PostServices  # noqa: E402
+from src.services.search import post_search  # noqa: E402
+
+WORDS = [f"word{i}" for i in range(5000)] + ["sunset", "mountain", "river", "city", "portrait"]
+
+
+def seed(path: str, rows: int) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    rnd = random.Random(1)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [{"id": 1, "username": "bench", "email": "bench@example.com", "password": "x"}],
+        )
+        batch = 50_000
+        for start in range(0, rows, batch):
+            conn.execute(
+                insert(Image.__table__),
+                [
+                    {
+                        "owner_id": 1,
+                        "url_original": f"https://example.com/{i}.jpg",
+                        "url_original_qr": "",
+                        "description": " ".join(rnd.choices(WORDS, k=12)),
+                    }
+                    for i in range(start, min(start + batch, rows))
+                ],
+            )
+    engine.dispose()
+
+
+async def timed(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+async def run(path: str, limit: int, repeat: int) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    SessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    services = PostServices(Image)
+    async with SessionLocal() as db:
+        # word42 is a broad prefix (word42, word420..word4299): all matches are ranked
+        for term in ("word42", "sunset", "sunset river", "nothing"):
+            async def fulltext():
+                db.expunge_all()
+                return await post_search.search(db, term, limit=limit)
+
+            async def like():
+                db.expunge_all()
+                return await services.search_posts_paginated(db=db, description=term, limit=limit)
+
+            for label, func in (("fulltext", fulltext), ("like", like)):
+                ms = await timed(func, repeat)
+                print(f"{term!r:<16} {label:<9} {ms:9.2f} ms")
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "bench.sqlite")
+        seed(path, args.rows)
+        asyncio.run(run(path, args.limit, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Micro-benchmark: pickled ORM ``User`` vs ``CachedUser`` msgpack codec.
+
+    python benchmarks/user_cache_codec.py -n 20000
+
+Prints encode/decode time per object and payload size, i.e. what
+``get_current_user`` pays on every request served from the user cache.
+"""
+import argparse
+import pickle
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.database.models import Role, User  # noqa: E402
+from src.services.user_cache import CachedUser, decode_user, encode_user  # noqa: E402
+
+
+def make_user() -> User:
+    return User(
+        id=42,
+        username="benchmark",
+        email="benchmark@example.com",
+        password="$2b$12$" + "x" * 53,
+        avatar="https://www.gravatar.com/avatar/0123456789abcdef0123456789abcdef",
+        role=Role.moderator,
+        active=True,
+        confirmed=True,
+        created_at=datetime(2023, 12, 1, 12, 30),
+    )
+
+
+def measure(label: str, encode, decode, obj, number: int) -> None:
+    payload = encode(obj)
+    enc = timeit.timeit(lambda: encode(obj), number=number) / number * 1e6
+    dec = timeit.timeit(lambda: decode(payload), number=number) / number * 1e6
+    print(f"{label:<10} encode {enc:7.2f} us  decode {dec:7.2f} us  size {len(payload):5d} B")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    user = make_user()
+    measure("pickle", pickle.dumps, pickle.loads, user, args.number)
+    measure("msgpack", encode_user, decode_user, CachedUser.from_user(user), args.number)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-import redis.asyncio as redis
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request, Depends
@@ -11,12 +11,25 @@ import uvicorn
 import logging
 
 from src.conf.config import settings
-from src.routes import users, comments, auth, tools, static, posts, cloudinary_route
+from src.routes import users, comments, auth, tools, static, posts, cloudinary_route, uploads
+from src.database.db import engine, SessionLocal
+from src.database import redis_pool
+from src.repository import logout as repository_logout
+from src.services import user_cache
+from src.services.auth import auth_service
+from src.services.cloudinary_srv import cloudinary_client
+from src.services.fuzzy import fuzzy_search
+from src.services.pagination import NEXT_CURSOR_HEADER
+from src.services.qr import qr_renderer
+from src.services.resumable import resumable_uploads
+from src.services.storage import LocalStorage, storage
+from src.services.uploads import BodySizeLimitMiddleware
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await startup()
     yield
+    await shutdown()
 
 
 
@@ -28,16 +41,30 @@ app.include_router(users.router, prefix="/api")
 app.include_router(auth.router, prefix="/api")
 app.include_router(comments.router, prefix="/api")
 app.include_router(tools.router, prefix="/api")
+# type-ahead: a request per keystroke, before posts_router and under its own limiter
+app.include_router(
+    posts.tags_router,
+    prefix='/posts',
+    dependencies=[
+        Depends(RateLimiter(times=settings.tag_suggest_rate_times, seconds=settings.tag_suggest_rate_seconds))
+    ],
+)
 app.include_router(posts.posts_router, prefix='/posts',
                    dependencies=[Depends(RateLimiter(times=2, seconds=5))])
+# chunks of one upload come quickly, not under the limiter of /posts
+app.include_router(uploads.router, prefix='/posts')
 app.include_router(cloudinary_route.cloud_router, prefix='/cloudinary')
 
+# file of upload_max_size plus text fields and multipart boundaries
+app.add_middleware(BodySizeLimitMiddleware, max_size=settings.upload_max_size + 64 * 1024)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # keyset pagination of posts and comments, browsers hide other headers from scripts
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 
@@ -49,15 +76,51 @@ async def startup():
     :return: None.
     :rtype: None
     """
-    r = await redis.Redis(
-        host=settings.redis_host,
-        port=settings.redis_port,
-        password=settings.redis_password,
-        db=0,
-        encoding="utf-8",
-        decode_responses=True,
-    )
+    r = await redis_pool.init_redis()
     await FastAPILimiter.init(r)
+    auth_service.r = r
+    if engine is not None:
+        async with SessionLocal() as db:
+            await auth_service.migrate_banned_tokens(db)
+    # black list of tokens: filter is loaded after subscribe, so no revoke is missed
+    ready = asyncio.Event()
+    app.state.banned_listener = asyncio.create_task(
+        repository_logout.listen_tokens(r, ready)
+    )
+    await asyncio.wait_for(ready.wait(), timeout=settings.redis_socket_timeout)
+    # local user cache of this worker is invalidated by changes in other workers
+    ready = asyncio.Event()
+    app.state.user_cache_listener = asyncio.create_task(
+        user_cache.listen_invalidations(r, ready)
+    )
+    await asyncio.wait_for(ready.wait(), timeout=settings.redis_socket_timeout)
+    # staged files of expired resumable uploads
+    app.state.upload_cleanup = asyncio.create_task(
+        resumable_uploads.run_cleanup(r, settings.upload_cleanup_interval)
+    )
+    # in-memory fuzzy index follows changes of other workers
+    app.state.fuzzy_refresh = asyncio.create_task(
+        fuzzy_search.run_refresh(settings.fuzzy_index_ttl)
+    )
+
+
+async def shutdown():
+    """
+    Shutdown function.
+
+    :return: None.
+    :rtype: None
+    """
+    app.state.banned_listener.cancel()
+    app.state.user_cache_listener.cancel()
+    app.state.upload_cleanup.cancel()
+    app.state.fuzzy_refresh.cancel()
+    auth_service.hasher.shutdown()
+    await cloudinary_client.close()
+    qr_renderer.shutdown()
+    if isinstance(storage, LocalStorage):
+        storage.engine.shutdown()
+    await redis_pool.close_redis()
 
 
 
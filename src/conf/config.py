@@ -1,5 +1,6 @@
 from os import environ
 from pathlib import Path
+from tempfile import gettempdir
 # from dotenv import load_dotenv
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -12,6 +13,11 @@ ENV_PATH = BASE_PATH.joinpath(".env")
 
 class Settings(BaseSettings):
     sqlalchemy_database_url: str | None = None
+    sqlalchemy_pool_size: int = 5
+    sqlalchemy_max_overflow: int = 10
+    sqlalchemy_pool_timeout: float = 30
+    sqlalchemy_pool_recycle: int = 1800
+    sqlalchemy_pool_pre_ping: bool = True
 
     mail_username: str = "test@example.com"
     mail_password: str = "SuperStronGPasswrod"
@@ -22,10 +28,92 @@ class Settings(BaseSettings):
     redis_host: str = "localhost"
     redis_port: int = 6379
     redis_password: str = ""
+    redis_max_connections: int = 50
+    redis_pool_timeout: int = 5
+    redis_socket_timeout: float = 5
+    redis_socket_connect_timeout: float = 5
+    redis_health_check_interval: int = 30
+    redis_retries: int = 3
+    # delay between retries in seconds: base * 2**attempt with jitter, at most cap
+    redis_retry_backoff_base: float = 0.05
+    redis_retry_backoff_cap: float = 1
+    # pub/sub listeners wait for a message at most this long, shorter than redis_socket_timeout
+    redis_pubsub_poll_timeout: float = 1
+
+    blacklist_bloom_capacity: int = 100_000
+    blacklist_bloom_error_rate: float = 0.001
+
+    user_cache_ttl: int = 900
+    user_cache_local_size: int = 1024
+    user_cache_local_ttl: float = 30
+
+    bcrypt_rounds: int = 12
+    bcrypt_workers: int = 4
+    bcrypt_queue_size: int = 32
+    bcrypt_retry_after: int = 1
+
+    fuzzy_threshold: float = 0.3
+    # in-memory trigram index (not PostgreSQL) is rebuilt after this, to see changes of other workers
+    fuzzy_index_ttl: float = 300
+    tag_suggest_ttl: float = 300
+    # prefixes with a remembered top, least recently asked are dropped
+    tag_suggest_memo_size: int = 1024
+    # type-ahead sends a request per keystroke, it has its own limiter, not the one of /posts
+    tag_suggest_rate_times: int = 30
+    tag_suggest_rate_seconds: int = 10
+
+    # cloudinary | local (content addressed files in storage_local_dir, served at storage_local_url)
+    storage_backend: str = "cloudinary"
+    storage_local_dir: str = str(BASE_PATH.joinpath("media"))
+    storage_local_url: str = "/media"
+    # derived urls are signed with it, a url which was not issued is not rendered
+    storage_local_secret: str = "secret_key"
+    # derived images of local storage: render processes, LRU limit of the cache on disk
+    transform_workers: int = 2
+    transform_cache_max_bytes: int = 512 * 1024 * 1024
+
+    # rendered QR codes: threads of render, per-worker LRU in bytes, Redis ttl
+    qr_workers: int = 4
+    qr_cache_local_bytes: int = 32 * 1024 * 1024
+    qr_cache_ttl: int = 7 * 24 * 3600
+
+    # background jobs (worker.py): attempts with exponential backoff, ttl of finished jobs
+    job_workers: int = 4
+    job_max_attempts: int = 5
+    job_backoff: float = 2
+    job_result_ttl: int = 24 * 3600
+    # shorter than redis_socket_timeout, BLMOVE must return before the socket times out
+    job_poll_timeout: float = 1
+
+    # bulk generation of a gallery: rows per batch (one UPDATE each), images rendered at once
+    bulk_batch_size: int = 100
+    bulk_concurrency: int = 8
+    # QR codes of new posts (worker.py): ids per batch, pause when the queue is drained, latency samples
+    qr_pipeline_batch_size: int = 50
+    qr_pipeline_interval: float = 0.5
+    qr_pipeline_samples: int = 1000
+    # retries of storage and Redis errors: backoff * 2**(attempt - 1) seconds, then the image is dropped
+    qr_pipeline_max_attempts: int = 5
+    qr_pipeline_backoff: float = 2
 
     cloudinary_name: str = ""
     cloudinary_api_key: str = ""
     cloudinary_api_secret: str = ""
+    cloudinary_timeout: float = 60
+    cloudinary_connect_timeout: float = 10
+    cloudinary_retries: int = 3
+    cloudinary_backoff: float = 0.5
+    cloudinary_concurrency: int = 8
+
+    upload_max_size: int = 20 * 1024 * 1024
+    upload_chunk_size: int = 256 * 1024
+    upload_staging_dir: str = str(Path(gettempdir()).joinpath("pixels_uploads"))
+    upload_session_ttl: int = 24 * 3600
+    upload_cleanup_interval: int = 3600
+    # lock of a chunk or finalize, refreshed while the request works
+    upload_lock_ttl: float = 30
+    # open uploads of one user (staged files on disk)
+    upload_max_sessions: int = 5
 
     app_host: str = "0.0.0.0"
     app_port: int = 9000
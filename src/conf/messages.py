@@ -1,5 +1,6 @@
 # main
 OPERATION_FORBIDDEN = "Operation forbidden"
+PAGINATION_INVALID_CURSOR = "Invalid cursor"
 
 # comments
 COMMENT_NOT_FOUND = "Comment not found!"
@@ -31,6 +32,15 @@ AUTH_EMAIL_CHECK_CONF = "Check your email for confirmation."
 AUTH_NOT_VALID_CRED = "Could not validate credentials"
 AUTH_INVALID_TOKEN_EMAILVERIFY = "Invalid token for email verification"
 AUTH_INVALID_TOKEN_SCOPE = "Invalid scope for token"
+AUTH_BUSY = "Too many authentication requests, try again later"
 
 # image
 IMAGE_NOT_FOUND = "Image not found!"
+UPLOAD_TOO_LARGE = "File is too large"
+UPLOAD_NOT_FOUND = "Upload not found or expired"
+UPLOAD_OFFSET_MISMATCH = "Upload-Offset does not match the received size"
+UPLOAD_LOCKED = "Another chunk of this upload is being written"
+UPLOAD_INCOMPLETE = "Upload is not complete"
+UPLOAD_TOO_MANY = "Too many open uploads, finish or cancel one of them"
+JOB_NOT_FOUND = "Job not found or expired"
+JOB_IDEMPOTENCY_CONFLICT = "Idempotency-Key was used for another request"
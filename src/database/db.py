@@ -1,22 +1,138 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from src.conf.config import settings
 
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
 # print(f"db.py {SQLALCHEMY_DATABASE_URL=}")
-# assert SQLALCHEMY_DATABASE_URL, "SQLALCHEMY_DATABASE_URL MUST BE IN .env" 
+# assert SQLALCHEMY_DATABASE_URL, "SQLALCHEMY_DATABASE_URL MUST BE IN .env"
+
+# sync drivers from .env (also used by alembic) -> asyncio drivers for the app
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """Convert database URL with sync driver to URL with asyncio driver.
+
+    :param url: Database URL, e.g. postgresql+psycopg2://...
+    :type url: str
+    :return: Database URL with asyncio driver, e.g. postgresql+asyncpg://...
+    :rtype: str
+    """
+    url_obj = make_url(url)
+    drivername = ASYNC_DRIVERS.get(url_obj.drivername, url_obj.drivername)
+    return url_obj.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+class PoolWaitStats:
+    """Counters of time spent to get connection from the pool."""
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def add(self, wait: float) -> None:
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class MeasuredQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool which measures how long checkout waits for connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_wait_stats.timeouts += 1
+            raise
+        finally:
+            pool_wait_stats.add(time.perf_counter() - start)
+
+
+def build_engine(url: str) -> AsyncEngine:
+    """Create async engine, pool is configured by settings (sqlalchemy_pool_*).
+
+    :param url: Database URL with sync or asyncio driver.
+    :type url: str
+    :return: The engine.
+    :rtype: AsyncEngine
+    """
+    url = async_database_url(url)
+    if make_url(url).get_backend_name() == "sqlite":
+        # SQLite doesn't need sizing of pool, SQLAlchemy selects pool by itself
+        return create_async_engine(url)
+    return create_async_engine(
+        url,
+        poolclass=MeasuredQueuePool,
+        pool_size=settings.sqlalchemy_pool_size,
+        max_overflow=settings.sqlalchemy_max_overflow,
+        pool_timeout=settings.sqlalchemy_pool_timeout,
+        pool_recycle=settings.sqlalchemy_pool_recycle,
+        pool_pre_ping=settings.sqlalchemy_pool_pre_ping,
+    ) # echo=True
+
+
+def get_pool_status(_engine: AsyncEngine | None = None) -> dict:
+    """Live statistics of connection pool.
+
+    :param _engine: Engine to inspect, defaults to engine of application.
+    :type _engine: AsyncEngine | None
+    :return: Size, checked-in, checked-out, overflow and wait time (ms) of pool.
+    :rtype: dict
+    """
+    _engine = _engine or engine
+    if _engine is None:
+        return {}
+    pool = _engine.pool
+    result = {"pool": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        result.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            timeout=pool.timeout(),
+        )
+    if isinstance(pool, MeasuredQueuePool):
+        checkouts = pool_wait_stats.checkouts
+        result.update(
+            checkouts=checkouts,
+            timeouts=pool_wait_stats.timeouts,
+            wait_avg_ms=pool_wait_stats.wait_total / checkouts * 1000 if checkouts else 0.0,
+            wait_max_ms=pool_wait_stats.wait_max * 1000,
+        )
+    return result
+
+
 engine = None
-if SQLALCHEMY_DATABASE_URL: 
-    engine = create_engine(SQLALCHEMY_DATABASE_URL) # echo=True
+if SQLALCHEMY_DATABASE_URL:
+    engine = build_engine(SQLALCHEMY_DATABASE_URL)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = async_sessionmaker(
+    bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Integer, String, Boolean, Table, func, Enum
+from sqlalchemy import Column, Integer, String, Boolean, Table, func, Enum, Index, UniqueConstraint
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.sql.schema import ForeignKey
 from sqlalchemy.sql.sqltypes import DateTime
@@ -14,6 +14,9 @@ image_m2m_tag = Table(
     Column("id", Integer, primary_key=True),
     Column("image_id", Integer, ForeignKey("images.id", ondelete="CASCADE")),
     Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE")),
+    # tags of images (selectinload) and images of tag (search by tag)
+    UniqueConstraint("image_id", "tag_id", name="uq_image_m2m_tag_image_id_tag_id"),
+    Index("ix_image_m2m_tag_tag_id_image_id", "tag_id", "image_id"),
 )
 
 
@@ -36,6 +39,8 @@ class User(Base):
     active = Column(Boolean, default=False)
     created_at = Column('crated_at', DateTime, default=func.now())
 
+    __table_args__ = (Index("ix_users_roles", "roles"),)
+
     class Config:
         arbitrary_types_allowed = True
 
@@ -54,7 +59,14 @@ class Image(Base):
     updated_at = Column('updated_at', DateTime)
     owner = relationship("User", backref="images")
 
+    __table_args__ = (
+        # feed of user and global lists, both ordered by (created_at, id)
+        Index("ix_images_owner_id_crated_at_id", "owner_id", "crated_at", "id"),
+        Index("ix_images_crated_at_id", "crated_at", "id"),
+    )
+
     def json(self):
+        """Serializable dict of post, tags must be loaded with the query (selectinload)."""
         return {
             "id": self.id,
             "owner_id": self.owner_id,
@@ -64,8 +76,8 @@ class Image(Base):
             "url_transformed_qr": self.url_transformed_qr,
             "tags": [tag.name for tag in self.tags],
             "description": self.description,
-            "created_at": self.created_at.strftime("%Y-%m-%dT%H:%M:%S"),
-            "updated_at": self.updated_at.strftime("%Y-%m-%dT%H:%M:%S")
+            "created_at": self.created_at.strftime("%Y-%m-%dT%H:%M:%S") if self.created_at else None,
+            "updated_at": self.updated_at.strftime("%Y-%m-%dT%H:%M:%S") if self.updated_at else None,
         }
     
 
@@ -81,6 +93,12 @@ class Comment(Base):
     owner = relationship("User", backref="comments")
     image = relationship("Image", backref="comments")
 
+    __table_args__ = (
+        # comments of image ordered by (created_at, id)
+        Index("ix_comments_image_id_crated_at_id", "image_id", "crated_at", "id"),
+        Index("ix_comments_owner_id", "owner_id"),
+    )
+
 
 class Tag(Base):
     __tablename__ = "tags"
@@ -92,4 +110,4 @@ class Bannedlist(Base):
     __tablename__ = "bannedlist"
     id = Column(Integer, primary_key=True)
     token = Column(String(255), nullable=False, unique=True)
-    created_at = Column('crated_at', DateTime, default=func.now())
\ No newline at end of file
+    created_at = Column('crated_at', DateTime, default=func.now(), index=True)
\ No newline at end of file
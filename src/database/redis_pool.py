@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+import redis.asyncio as redis
+from redis.asyncio.retry import Retry
+from redis.backoff import EqualJitterBackoff
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+
+# one pool per worker, shared by auth cache, black list of tokens and rate limiter
+redis_client: redis.Redis | None = None
+
+
+def build_redis_pool() -> redis.BlockingConnectionPool:
+    """
+    Connection pool configured by settings (redis_*).
+    When all connections are busy, caller waits up to redis_pool_timeout.
+
+    :return: The pool.
+    :rtype: redis.BlockingConnectionPool
+    """
+    return redis.BlockingConnectionPool(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        password=settings.redis_password or None,
+        db=0,
+        max_connections=settings.redis_max_connections,
+        timeout=settings.redis_pool_timeout,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_socket_connect_timeout,
+        health_check_interval=settings.redis_health_check_interval,
+        retry_on_timeout=True,
+        retry=Retry(
+            EqualJitterBackoff(cap=settings.redis_retry_backoff_cap, base=settings.redis_retry_backoff_base),
+            settings.redis_retries,
+        ),
+    )
+
+
+async def init_redis() -> redis.Redis:
+    """
+    Create shared client, called from the app lifespan.
+
+    :return: Redis client.
+    :rtype: redis.Redis
+    """
+    global redis_client
+    if redis_client is None:
+        redis_client = redis.Redis(connection_pool=build_redis_pool())
+    return redis_client
+
+
+async def close_redis() -> None:
+    """
+    Close shared client and disconnect its pool.
+
+    :return: None.
+    :rtype: None
+    """
+    global redis_client
+    if redis_client is not None:
+        await redis_client.close()
+        await redis_client.connection_pool.disconnect()
+        redis_client = None
+
+
+async def listen_channel(
+    r: redis.Redis,
+    channel: str,
+    on_message: Callable[[str], None],
+    on_subscribe: Callable[[], Awaitable],
+    ready: asyncio.Event | None = None,
+) -> None:
+    """
+    Call on_message for every message of the channel, run it as background task.
+
+    Messages are polled with redis_pubsub_poll_timeout, so an idle subscription
+    does not hit the socket timeout. redis-py may still reconnect and subscribe
+    again by itself, and messages published meanwhile are lost: on_subscribe is
+    called on every confirmation of (re)subscribe to recover them. A lost
+    connection ends the subscription, a new one is made with backoff.
+
+    :param r: Redis connection
+    :type r: redis.Redis
+    :param channel: Name of the channel
+    :type channel: str
+    :param on_message: Called with decoded data of a message
+    :type on_message: Callable[[str], None]
+    :param on_subscribe: Called when subscription is active, reloads local state
+    :type on_subscribe: Callable[[], Awaitable]
+    :param ready: Set when subscription is active the first time
+    :type ready: asyncio.Event | None
+    """
+    delay = 1
+    while True:
+        pubsub = r.pubsub()
+        try:
+            await pubsub.subscribe(channel)
+            while True:
+                message = await pubsub.get_message(timeout=settings.redis_pubsub_poll_timeout)
+                if message is None:
+                    continue
+                if message["type"] == "subscribe":
+                    await on_subscribe()
+                    if ready is not None:
+                        ready.set()
+                    delay = 1
+                elif message["type"] == "message":
+                    data = message["data"]
+                    on_message(data.decode() if isinstance(data, bytes) else data)
+        except RedisError as err:
+            logging.warning(f"Subscription to {channel} lost: {err}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+        finally:
+            await pubsub.close()
@@ -0,0 +1,224 @@
+"""
+Full-text index of posts: description and names of tags.
+
+PostgreSQL: images.search_vector (tsvector) with GIN index, kept up to date
+by triggers on images, image_m2m_tag and tags.
+SQLite (tests, development): FTS5 table images_fts with the same triggers.
+
+Trigram indexes (pg_trgm, PostgreSQL only) of images.description and
+users.username serve fuzzy and substring search; other databases use the
+in-memory index of src/services/fuzzy.py.
+
+The objects are created by the Alembic migration and by Base.metadata.create_all.
+"""
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection
+
+from src.database.models import Base
+
+# language agnostic: descriptions are written in Ukrainian and English
+TS_CONFIG = "simple"
+
+POSTGRES_CREATE = [
+    "ALTER TABLE images ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE INDEX IF NOT EXISTS ix_images_search_vector ON images USING gin (search_vector)",
+    f"""
+    CREATE OR REPLACE FUNCTION images_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('{TS_CONFIG}', coalesce(NEW.description, '')), 'A') ||
+            setweight(to_tsvector('{TS_CONFIG}', coalesce((
+                SELECT string_agg(t.name, ' ')
+                FROM image_m2m_tag m JOIN tags t ON t.id = m.tag_id
+                WHERE m.image_id = NEW.id
+            ), '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS images_search_vector ON images",
+    """
+    CREATE TRIGGER images_search_vector BEFORE INSERT OR UPDATE OF description ON images
+    FOR EACH ROW EXECUTE FUNCTION images_search_vector_update()
+    """,
+    # tags changed: touch description, the trigger above rebuilds the vector
+    """
+    CREATE OR REPLACE FUNCTION image_m2m_tag_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            UPDATE images SET description = description WHERE id = OLD.image_id;
+            RETURN OLD;
+        END IF;
+        UPDATE images SET description = description WHERE id = NEW.image_id;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS image_m2m_tag_search_vector ON image_m2m_tag",
+    """
+    CREATE TRIGGER image_m2m_tag_search_vector AFTER INSERT OR DELETE ON image_m2m_tag
+    FOR EACH ROW EXECUTE FUNCTION image_m2m_tag_search_vector_update()
+    """,
+    """
+    CREATE OR REPLACE FUNCTION tags_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        UPDATE images SET description = description
+        WHERE id IN (SELECT image_id FROM image_m2m_tag WHERE tag_id = NEW.id);
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS tags_search_vector ON tags",
+    """
+    CREATE TRIGGER tags_search_vector AFTER UPDATE OF name ON tags
+    FOR EACH ROW EXECUTE FUNCTION tags_search_vector_update()
+    """,
+    # existing posts
+    "UPDATE images SET description = description",
+]
+
+POSTGRES_DROP = [
+    "DROP TRIGGER IF EXISTS tags_search_vector ON tags",
+    "DROP FUNCTION IF EXISTS tags_search_vector_update()",
+    "DROP TRIGGER IF EXISTS image_m2m_tag_search_vector ON image_m2m_tag",
+    "DROP FUNCTION IF EXISTS image_m2m_tag_search_vector_update()",
+    "DROP TRIGGER IF EXISTS images_search_vector ON images",
+    "DROP FUNCTION IF EXISTS images_search_vector_update()",
+    "DROP INDEX IF EXISTS ix_images_search_vector",
+    "ALTER TABLE images DROP COLUMN IF EXISTS search_vector",
+]
+
+_SQLITE_TAGS_OF = """(
+    SELECT group_concat(t.name, ' ') FROM image_m2m_tag m JOIN tags t ON t.id = m.tag_id
+    WHERE m.image_id = {image_id}
+)"""
+
+SQLITE_CREATE = [
+    # rowid of images_fts is images.id
+    "CREATE VIRTUAL TABLE IF NOT EXISTS images_fts USING fts5(description, tags)",
+    """
+    CREATE TRIGGER IF NOT EXISTS images_fts_insert AFTER INSERT ON images BEGIN
+        INSERT INTO images_fts(rowid, description, tags)
+        VALUES (NEW.id, coalesce(NEW.description, ''), '');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS images_fts_update AFTER UPDATE OF description ON images BEGIN
+        UPDATE images_fts SET description = coalesce(NEW.description, '') WHERE rowid = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS images_fts_delete AFTER DELETE ON images BEGIN
+        DELETE FROM images_fts WHERE rowid = OLD.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS image_m2m_tag_fts_insert AFTER INSERT ON image_m2m_tag BEGIN
+        UPDATE images_fts SET tags = coalesce({_SQLITE_TAGS_OF.format(image_id="NEW.image_id")}, '')
+        WHERE rowid = NEW.image_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS image_m2m_tag_fts_delete AFTER DELETE ON image_m2m_tag BEGIN
+        UPDATE images_fts SET tags = coalesce({_SQLITE_TAGS_OF.format(image_id="OLD.image_id")}, '')
+        WHERE rowid = OLD.image_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS tags_fts_update AFTER UPDATE OF name ON tags BEGIN
+        UPDATE images_fts SET tags = coalesce({_SQLITE_TAGS_OF.format(image_id="images_fts.rowid")}, '')
+        WHERE rowid IN (SELECT image_id FROM image_m2m_tag WHERE tag_id = NEW.id);
+    END
+    """,
+    # existing posts
+    "DELETE FROM images_fts",
+    f"""
+    INSERT INTO images_fts(rowid, description, tags)
+    SELECT i.id, coalesce(i.description, ''), coalesce({_SQLITE_TAGS_OF.format(image_id="i.id")}, '')
+    FROM images i
+    """,
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS tags_fts_update",
+    "DROP TRIGGER IF EXISTS image_m2m_tag_fts_delete",
+    "DROP TRIGGER IF EXISTS image_m2m_tag_fts_insert",
+    "DROP TRIGGER IF EXISTS images_fts_delete",
+    "DROP TRIGGER IF EXISTS images_fts_update",
+    "DROP TRIGGER IF EXISTS images_fts_insert",
+    "DROP TABLE IF EXISTS images_fts",
+]
+
+
+POSTGRES_TRGM_CREATE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_images_description_trgm ON images "
+    "USING gin (description gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_username_trgm ON users "
+    "USING gin (username gin_trgm_ops)",
+]
+
+POSTGRES_TRGM_DROP = [
+    "DROP INDEX IF EXISTS ix_users_username_trgm",
+    "DROP INDEX IF EXISTS ix_images_description_trgm",
+]
+
+
+def create_search_index(connection: Connection) -> None:
+    """
+    Create full-text index objects for dialect of connection and fill them.
+
+    :param connection: Connection to the database.
+    :type connection: Connection
+    """
+    statements = {"postgresql": POSTGRES_CREATE, "sqlite": SQLITE_CREATE}
+    for statement in statements.get(connection.dialect.name, []):
+        connection.execute(text(statement))
+
+
+def drop_search_index(connection: Connection) -> None:
+    """
+    Drop full-text index objects for dialect of connection.
+
+    :param connection: Connection to the database.
+    :type connection: Connection
+    """
+    statements = {"postgresql": POSTGRES_DROP, "sqlite": SQLITE_DROP}
+    for statement in statements.get(connection.dialect.name, []):
+        connection.execute(text(statement))
+
+
+def create_trigram_index(connection: Connection) -> None:
+    """
+    Create trigram indexes of description and username (PostgreSQL only).
+
+    :param connection: Connection to the database.
+    :type connection: Connection
+    """
+    if connection.dialect.name == "postgresql":
+        for statement in POSTGRES_TRGM_CREATE:
+            connection.execute(text(statement))
+
+
+def drop_trigram_index(connection: Connection) -> None:
+    """
+    Drop trigram indexes of description and username, the extension stays.
+
+    :param connection: Connection to the database.
+    :type connection: Connection
+    """
+    if connection.dialect.name == "postgresql":
+        for statement in POSTGRES_TRGM_DROP:
+            connection.execute(text(statement))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _after_create(target, connection, **kw) -> None:
+    create_search_index(connection)
+    create_trigram_index(connection)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def _before_drop(target, connection, **kw) -> None:
+    drop_trigram_index(connection)
+    drop_search_index(connection)
@@ -1,64 +1,151 @@
-from sqlalchemy.orm import Session
+import asyncio
+
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import delete, select
 from datetime import date, timedelta
 
+from src.conf.config import settings
 from src.database.models import Bannedlist
+from src.database.redis_pool import listen_channel
+from src.services.bloom import BloomFilter
 
+BANNED_PREFIX = "banned:"
+BANNED_CHANNEL = "banned"
 
-async def add_token(token: str|None, db: Session) -> int | None:
-    """Add token to black list 
+# fast path for "token is not revoked", synced between workers by pub/sub
+banned_filter = BloomFilter(
+    capacity=settings.blacklist_bloom_capacity,
+    error_rate=settings.blacklist_bloom_error_rate,
+)
 
-    :param token: auth_token
-    :type token: str | None
-    :param db: Database session connection
-    :type db: Session
-    :return: id of added token
-    :rtype: int | None
+
+def _remember(token_key: str) -> None:
+    banned_filter.add(token_key)
+
+
+async def add_token(token_key: str | None, ttl: int, r: Redis) -> bool:
+    """Add token to black list for the rest of its lifetime
+
+    :param token_key: jti of token (or hash of token without jti)
+    :type token_key: str | None
+    :param ttl: Seconds until token expires
+    :type ttl: int
+    :param r: Redis connection
+    :type r: Redis
+    :return: True if token was added
+    :rtype: bool
     """
-    if token:
-        try:
-            obj = Bannedlist(token=token)
-            db.add(obj)
-            db.commit()
-            db.refresh(obj)
-            return obj.id # type: ignore
-        except Exception as err:
-            print(f"DB error {err=}")
-            return None
-
-
-async def check_token(token: str, db: Session) -> bool:
-    """Chack token present on database or no
-
-    :param token: auth_token
-    :type token: str
-    :param db: Database session connection
-    :type db: Session
-    :return: True if token is present on database
+    if not token_key or ttl <= 0:
+        return False
+    await r.set(f"{BANNED_PREFIX}{token_key}", 1, ex=ttl)
+    _remember(token_key)
+    await r.publish(BANNED_CHANNEL, token_key)
+    if banned_filter.saturated:
+        await load_tokens(r)
+    return True
+
+
+async def check_token(token_key: str, r: Redis) -> bool:
+    """Check token present in black list or no
+
+    :param token_key: jti of token (or hash of token without jti)
+    :type token_key: str
+    :param r: Redis connection
+    :type r: Redis
+    :return: True if token is present in black list
     :rtype: bool
     """
-    stmt = select(Bannedlist.id).where(Bannedlist.token==token)
-    result = db.scalar(stmt)
-    # print(f"{result=}")
-    # result = db.query(Bannedlist).filter_by(token=token).first()
-    return result is not None
+    if token_key not in banned_filter:
+        return False
+    return bool(await r.exists(f"{BANNED_PREFIX}{token_key}"))
+
+
+async def load_tokens(r: Redis) -> int:
+    """Rebuild in-process filter from tokens stored in Redis
+
+    :param r: Redis connection
+    :type r: Redis
+    :return: How many tokens are in black list
+    :rtype: int
+    """
+    global banned_filter
+    fresh = BloomFilter(
+        capacity=max(settings.blacklist_bloom_capacity, 2 * len(banned_filter)),
+        error_rate=settings.blacklist_bloom_error_rate,
+    )
+    async for key in r.scan_iter(match=f"{BANNED_PREFIX}*", count=1000):
+        if isinstance(key, bytes):
+            key = key.decode()
+        fresh.add(key[len(BANNED_PREFIX):])
+    banned_filter = fresh
+    return len(fresh)
 
 
-async def purge_old(db: Session, duration: int = 7) -> int:
+async def listen_tokens(r: Redis, ready: asyncio.Event | None = None) -> None:
+    """Listen tokens revoked by other workers, run it as background task
+
+    The filter is reloaded on every (re)subscribe, including silent
+    reconnects of redis-py, because revokes published meanwhile were missed.
+
+    :param r: Redis connection
+    :type r: Redis
+    :param ready: Set when subscription is active
+    :type ready: asyncio.Event | None
+    """
+    await listen_channel(r, BANNED_CHANNEL, _remember, lambda: load_tokens(r), ready)
+
+
+async def get_tokens(db: AsyncSession) -> list[str]:
+    """Tokens from legacy black list table
+
+    :param db: Database session connection
+    :type db: AsyncSession
+    :return: List of tokens
+    :rtype: list[str]
+    """
+    result = await db.scalars(select(Bannedlist.token))
+    return list(result.all())
+
+
+async def purge_old(db: AsyncSession, duration: int = 7) -> int:
     """_summary_
 
     :param db: Purge old records for expired tokens
-    :type db: Session
+    :type db: AsyncSession
     :param duration: Day how old token will be purged, defaults to 7
     :type duration: int, optional
     :return: How many recods was deleted
     :rtype: int
     """
     start_range = date.today() + timedelta(days=-duration)
-    stmt = delete(Bannedlist).where(Bannedlist.created_at <= start_range)
-    result = db.execute(stmt)
-    db.commit()
+    stmt = (
+        delete(Bannedlist)
+        .where(Bannedlist.created_at <= start_range)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    await db.commit()
     return result.rowcount
 
 
+async def delete_tokens(db: AsyncSession, tokens: list[str]) -> int:
+    """Remove tokens from legacy black list table
 
+    :param db: Database session connection
+    :type db: AsyncSession
+    :param tokens: Tokens to remove
+    :type tokens: list[str]
+    :return: How many recods was deleted
+    :rtype: int
+    """
+    if not tokens:
+        return 0
+    stmt = (
+        delete(Bannedlist)
+        .where(Bannedlist.token.in_(tokens))
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    await db.commit()
+    return result.rowcount
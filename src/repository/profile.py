@@ -1,6 +1,6 @@
 from libgravatar import Gravatar
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.repository.users import clear_user_cache, get_user_by_username
 from src.database.models import User, Role, Comment, Image
@@ -8,22 +8,26 @@ from src.schemas import UpdateProfile, UserModel
 from src.services.auth import auth_service
 
 
-async def read_profile(user: User, db: Session) -> dict:
+async def read_profile(user: User, db: AsyncSession) -> dict:
     """
     Retrieves a user profile.
 
     :param email: An email to get user from the database by.
     :type email: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The user.
     :rtype: User
     """
     result = {}
     if user:
         # comments_count = db.query(Comment).filter(Comment.owner_id == user.id).count()
-        comments_count = db.query(func.count(Comment.owner_id == user.id)).scalar()
-        images_count = db.query(func.count(Image.owner_id == user.id)).scalar()
+        comments_count = await db.scalar(
+            select(func.count()).select_from(Comment).where(Comment.owner_id == user.id)
+        )
+        images_count = await db.scalar(
+            select(func.count()).select_from(Image).where(Image.owner_id == user.id)
+        )
         result = {
             "username": user.username,
             "email": user.email,
@@ -36,14 +40,14 @@ async def read_profile(user: User, db: Session) -> dict:
     return result
 
 
-async def update_profile(data: UpdateProfile, user: User, db: Session) -> bool | None:
+async def update_profile(data: UpdateProfile, user: User, db: AsyncSession) -> bool | None:
     """
     Retrieves a user profile.
 
     :param email: An email to get user from the database by.
     :type email: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The user.
     :rtype: User
     """
@@ -51,9 +55,14 @@ async def update_profile(data: UpdateProfile, user: User, db: Session) -> bool |
         if data.username:
             newuser: User = await get_user_by_username(str(data.username), db)
             if not newuser:
-                user.username = str(data.username)
-                db.commit()
-                clear_user_cache(user)
+                # user may be CachedUser snapshot, change the row loaded in this session
+                db_user = await db.get(User, user.id)
+                if db_user is None:
+                    return None
+                db_user.username = str(data.username)
+                await db.commit()
+                await clear_user_cache(db_user)
+                user.username = db_user.username
                 return True
             
 
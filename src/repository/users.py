@@ -1,8 +1,10 @@
 from libgravatar import Gravatar
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import User, Role
 from src.schemas import UserModel
+from src.services import user_cache
 from src.services.auth import auth_service
 
 
@@ -14,28 +16,28 @@ def dict_not_empty(data: dict) -> bool:
     return any(v is not None for v in data.values())
 
 
-def clear_user_cache(user: User) -> None:
-    """_summary_
+async def clear_user_cache(user: User) -> None:
+    """Clear user from cached storage of all workers
 
-    :param user: Clear user from cached storage
+    :param user: Changed user
     :type user: User
     """
-    auth_service.r.delete(f"user:{user.email}")
+    await user_cache.invalidate_user(str(user.email), auth_service.r)
 
 
-async def is_present_admin(db: Session) -> bool:
+async def is_present_admin(db: AsyncSession) -> bool:
     """search if is present admin in users
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: True if any admin is
     :rtype: bool
     """
-    result = db.query(User).filter(User.role == Role.admin).first()
+    result = await db.scalar(select(User.id).where(User.role == Role.admin).limit(1))
     return result is not None
 
 
 async def get_user_by_email(
-    email: str, db: Session, active: bool | None = True
+    email: str, db: AsyncSession, active: bool | None = True
 ) -> User:
     """
     Retrieves a user by his email.
@@ -43,18 +45,18 @@ async def get_user_by_email(
     :param email: An email to get user from the database by.
     :type email: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The user.
     :rtype: User
     """
-    query = db.query(User).filter(User.email == email)
+    query = select(User).where(User.email == email)
     if active is not None:
-        query = query.filter(User.active == active)
-    return query.first()
+        query = query.where(User.active == active)
+    return await db.scalar(query)
 
 
 async def get_user_by_username(
-    username: str, db: Session, active: bool | None = True
+    username: str, db: AsyncSession, active: bool | None = True
 ) -> User:
     """
     Retrieves a user by his username.
@@ -62,24 +64,24 @@ async def get_user_by_username(
     :param username: An username to get user from the database by.
     :type username: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The user.
     :rtype: User
     """
-    query = db.query(User).filter(User.username == username)
+    query = select(User).where(User.username == username)
     if active is not None:
-        query = query.filter(User.active == active)
-    return query.first()
+        query = query.where(User.active == active)
+    return await db.scalar(query)
 
 
-async def create_user(body: UserModel, db: Session) -> User:
+async def create_user(body: UserModel, db: AsyncSession) -> User:
     """
     Creates a new user.
 
     :param body: The data for the user to create.
     :type body: UserModel
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The newly created user.
     :rtype: User
     """
@@ -95,14 +97,14 @@ async def create_user(body: UserModel, db: Session) -> User:
         new_user.role = Role.admin
     try:
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        await db.commit()
+        await db.refresh(new_user)
         return new_user
     except Exception as err:
         print(f"ERROR create_user {err}")
 
 
-async def update_token(user: User, token: str | None, db: Session) -> None:
+async def update_token(user: User, token: str | None, db: AsyncSession) -> None:
     """
     Creates an update token.
 
@@ -111,24 +113,42 @@ async def update_token(user: User, token: str | None, db: Session) -> None:
     :param token: The token.
     :type token: str | None
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: None.
     :rtype: None
     """
     if user:
         user.refresh_token = token  # type: ignore
-        db.commit()
-        clear_user_cache(user)
+        await db.commit()
+        await clear_user_cache(user)
 
 
-async def confirmed_email(email: str, db: Session) -> bool | None:
+async def update_password(user: User, password: str, db: AsyncSession) -> None:
+    """
+    Stores a new password hash of the user.
+
+    :param user: The user.
+    :type user: User
+    :param password: The hash of password.
+    :type password: str
+    :param db: The database session.
+    :type db: AsyncSession
+    :return: None.
+    :rtype: None
+    """
+    if user:
+        user.password = password  # type: ignore
+        await db.commit()
+
+
+async def confirmed_email(email: str, db: AsyncSession) -> bool | None:
     """
     Updates email confirmation status.
 
     :param email: The email.
     :type email: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: None.
     :rtype: None
     """
@@ -136,11 +156,11 @@ async def confirmed_email(email: str, db: Session) -> bool | None:
     if user:
         user.confirmed = True  # type: ignore
         user.active = True  # type: ignore
-        db.commit()
+        await db.commit()
         return True
 
 
-async def update_avatar(email: str, url: str, db: Session) -> User:
+async def update_avatar(email: str, url: str, db: AsyncSession) -> User:
     """
     Updates user's avatar.
 
@@ -149,38 +169,38 @@ async def update_avatar(email: str, url: str, db: Session) -> User:
     :param url: The url of the avatar.
     :type url: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The User with a new avatar.
     :rtype: User
     """
     user = await get_user_by_email(email, db)
     if user:
         user.avatar = url  # type: ignore
-        db.commit()
-        clear_user_cache(user)
+        await db.commit()
+        await clear_user_cache(user)
     return user
 
 
-async def get_user_by_id(id: int, db: Session, active: bool | None = True) -> User:
+async def get_user_by_id(id: int, db: AsyncSession, active: bool | None = True) -> User:
     """
     Retrieves a user by his id.
 
     :param id: An id to get user from the database by.
     :type id: int
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The user.
     :rtype: User
     """
-    query = db.query(User).filter(
+    query = select(User).where(
         User.id == id,
     )
     if active is not None:
-        query = query.filter(User.active == active)
-    return query.first()
+        query = query.where(User.active == active)
+    return await db.scalar(query)
 
 
-async def update_active(user_id: int, active: bool, db: Session) -> User:
+async def update_active(user_id: int, active: bool, db: AsyncSession) -> User:
     """
     Updates user's active state.
 
@@ -189,19 +209,19 @@ async def update_active(user_id: int, active: bool, db: Session) -> User:
     :param active: The active state of user.
     :type active: bool
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The user.
     :rtype: User
     """
     user = await get_user_by_id(user_id, active=not active, db=db)
     if user:
         user.active = active  # type: ignore
-        db.commit()
-        clear_user_cache(user)
+        await db.commit()
+        await clear_user_cache(user)
     return user
 
 
-async def update_role_user(user_id: int, role: Role, db: Session) -> User:
+async def update_role_user(user_id: int, role: Role, db: AsyncSession) -> User:
     """
     Updates user's role.
 
@@ -210,19 +230,19 @@ async def update_role_user(user_id: int, role: Role, db: Session) -> User:
     :param active: role of user.
     :type active: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The user.
     :rtype: User
     """
     user = await get_user_by_id(user_id, db)
     if user:
         user.role = role  # type: ignore
-        db.commit()
-        clear_user_cache(user)
+        await db.commit()
+        await clear_user_cache(user)
     return user
 
 
-async def update_user(user_id: int, data: dict, db: Session) -> User | None:
+async def update_user(user_id: int, data: dict, db: AsyncSession) -> User | None:
     """
     Updates user's role.
 
@@ -231,7 +251,7 @@ async def update_user(user_id: int, data: dict, db: Session) -> User | None:
     :param active: role of user.
     :type active: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The user.
     :rtype: User
     """
@@ -248,25 +268,25 @@ async def update_user(user_id: int, data: dict, db: Session) -> User | None:
             user.active = data.get("is_active")  # type: ignore
         if data.get("role") is not None:
             user.role = data.get("role")  # type: ignore
-        db.commit()
-        clear_user_cache(user)
+        await db.commit()
+        await clear_user_cache(user)
     return user
 
 
-async def delete_user(user_id: int, db: Session) -> User:
+async def delete_user(user_id: int, db: AsyncSession) -> User:
     """
     Delete user's with not active state.
 
     :param user_id:  id of user.
     :type user_id: int
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The user.
     :rtype: User
     """
     user = await get_user_by_id(user_id, active=False, db=db)
     if user:
-        db.delete(user)
-        db.commit()
-        clear_user_cache(user)
+        await db.delete(user)
+        await db.commit()
+        await clear_user_cache(user)
     return user
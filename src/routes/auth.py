@@ -14,7 +14,7 @@ from fastapi.security import (
     HTTPAuthorizationCredentials,
     HTTPBearer,
 )
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.conf import messages
 from src.database.db import get_db
@@ -27,7 +27,6 @@ from src.schemas import (
     UserModelCaptcha,
 )
 from src.repository import users as repository_users
-from src.repository import logout as repository_logout
 from src.services import hcaptcha as hcaptcha_service
 from src.services.auth import auth_service
 from src.services.emails import send_email
@@ -43,7 +42,7 @@ async def signup(
     body: UserModel,
     background_tasks: BackgroundTasks,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Signups user.
@@ -55,7 +54,7 @@ async def signup(
     :param request: The request.
     :type request: Request
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The UserResponse model with the new user and information about successful user creation.
     :rtype: dict
     """
@@ -69,7 +68,7 @@ async def signup(
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail=messages.AUTH_ALREADY_EXIST
         )
-    body.password = auth_service.get_password_hash(body.password)
+    body.password = await auth_service.get_password_hash(body.password)
     new_user = await repository_users.create_user(body, db)
     if new_user:
         background_tasks.add_task(
@@ -87,7 +86,7 @@ async def signup(
 
 @router.post("/login", response_model=TokenModel)
 async def login(
-    body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+    body: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)
 ):
     """
     Logins user.
@@ -95,7 +94,7 @@ async def login(
     :param body: The data for the user to sign up.
     :type body: OAuth2PasswordRequestForm
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The TokenModel model with the access token and refresh token.
     :rtype: dict
     """
@@ -112,10 +111,14 @@ async def login(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=messages.AUTH_EMAIL_NOT_ACTIVE
         )
-    if not auth_service.verify_password(body.password, user.password):
+    verified, new_hash = await auth_service.verify_password(body.password, user.password)  # type: ignore
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=messages.AUTH_INVALID_PASSW
         )
+    if new_hash:
+        # bcrypt cost was changed, rehash while plain password is known
+        await repository_users.update_password(user, new_hash, db)
     # Generate JWT
     access_token = await auth_service.create_access_token(data={"sub": user.email})
     refresh_token = await auth_service.create_refresh_token(data={"sub": user.email})
@@ -130,7 +133,7 @@ async def login(
 @router.get("/refresh_token", response_model=TokenModel)
 async def refresh_token(
     credentials: HTTPAuthorizationCredentials = Security(security),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Refreshes token.
@@ -138,12 +141,12 @@ async def refresh_token(
     :param credentials: Credentials.
     :type credentials: HTTPAuthorizationCredentials
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The TokenModel model with the access token and refresh token.
     :rtype: dict
     """
     token = credentials.credentials
-    token_banned_is = await repository_logout.check_token(token, db)
+    token_banned_is = await auth_service.is_token_revoked(token)
     if token_banned_is:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=messages.AUTH_INVALID_AUTH_TOKEN
@@ -167,14 +170,14 @@ async def refresh_token(
 
 
 @router.get("/confirmed_email/{token}")
-async def confirmed_email(token: str, db: Session = Depends(get_db)):
+async def confirmed_email(token: str, db: AsyncSession = Depends(get_db)):
     """
     Confirms user's email.
 
     :param token: Token.
     :type token: str
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The message about email confirmation.
     :rtype: dict
     """
@@ -198,7 +201,7 @@ async def request_email(
     body: RequestEmail,
     background_tasks: BackgroundTasks,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Requests email.
@@ -210,7 +213,7 @@ async def request_email(
     :param request: The request.
     :type request: Request
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The message about email request.
     :rtype: dict
     """
@@ -228,25 +231,20 @@ async def request_email(
 @router.get("/logout", status_code=status.HTTP_204_NO_CONTENT)
 async def logout(
     credentials: HTTPAuthorizationCredentials = Security(security),
-    db: Session = Depends(get_db),
 ):
     """
-    logout and add token token to banlist.
+    logout and add token to banlist until it expires.
 
     :param credentials: Credentials.
     :type credentials: HTTPAuthorizationCredentials
-    :param db: The database session.
-    :type db: Session
     :return: empty content. 204 status code.
     :rtype: dict
     """
     token = credentials.credentials
-    token_banned_is = await repository_logout.check_token(token, db)
-    if token_banned_is:
+    if not await auth_service.revoke_token(token):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail=messages.AUTH_INVALID_TOKEN
         )
-    await repository_logout.add_token(token, db)
     return {}
 
 
@@ -257,7 +255,7 @@ async def signup_cap(
     body: UserModelCaptcha,
     background_tasks: BackgroundTasks,
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Signups user with Captha.
@@ -269,7 +267,7 @@ async def signup_cap(
     :param request: The request.
     :type request: Request
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
     :return: The UserResponse model with the new user and information about successful user creation.
     :rtype: dict
     """
@@ -284,8 +282,8 @@ async def signup_cap(
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail=messages.AUTH_ALREADY_EXIST
         )
+    body.password = await auth_service.get_password_hash(body.password)
     try:
-        body.password = auth_service.get_password_hash(body.password)
         new_user = await repository_users.create_user(body, db)
         background_tasks.add_task(
             send_email, new_user.email, new_user.username, request.base_url # type: ignore
@@ -1,230 +1,243 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
-from starlette.responses import StreamingResponse
-import cloudinary
-from cloudinary.uploader import upload
-import cloudinary.api
-import cloudinary.utils
-import qrcode
-from io import BytesIO
+import json
+from typing import Annotated, Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.conf.config import settings
 from src.conf import messages
+from src.conf.config import settings
 from src.database.db import get_db
-from src.database.models import Image
-from src.services.cloudinary_srv import cloudinary 
-
-
-class CloudinaryService:
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True,
-    )
+from src.database.models import Image, Role
+from src.routes.static import IMMUTABLE
+from src.schemas import BulkImagesRequest, JobResponse
+from src.services import image_jobs  # noqa: F401 handlers of the jobs
+from src.services.auth import auth_service
+from src.services.bulk_images import BulkGenerator, select_images
+from src.services.jobs import IdempotencyConflict, job_queue
+from src.services.qr import QRSpec, etag_matches, qr_renderer
+from src.services.storage import StorageBackend, get_storage
+from src.services.transforms import MAX_SIZE
+from src.services.user_cache import CachedUser
 
 cloud_router = APIRouter(prefix='', tags=["Cloudinary image operations"])
 
 
-@cloud_router.get("/transformed_image/{image_id}")
-def transform_and_update_image(image_id: str, angle: int = 45, db: Session = Depends(get_db)):
+async def enqueue_job(
+    request: Request, kind: str, payload: dict, idempotency_key: str | None
+) -> JSONResponse:
     """
-    The transform_and_update_image function takes an image_id and angle as input,
-        transforms the original image by rotating it by the specified angle,
-        uploads the transformed image to Cloudinary, and updates the database with 
-        a new url for that transformed image.
-    
-    :param image_id: str: Identify the image to be transformed
-    :param angle: int: Specify the angle by which the image should be rotated
-    :param db: Session: Get the database session
-    :return: The following:
-    :doc-author: Trelent
+    Задача в черзі: 202, id задачі і адреса її статусу (заголовок Location)
     """
-    image = db.query(Image).filter(Image.id == image_id).first()
-    print("1:", image)
-    print("Start:", image_id)
-
-    if image:
-        url_original = image.url_original
-        public_id = cloudinary.utils.cloudinary_url(url_original)[0].split("/")[-1]
-        print("Start URL:", url_original)
-
-        folder_path = "transform"
-        transformation = {"angle": angle}
-
-        public_id = f"{folder_path}/{public_id}"
-
-        response = upload(url_original, transformation=transformation, public_id=public_id)
-
-        transformed_image_url = response['secure_url']
-
-        db.query(Image).filter(Image.id == image_id).update({"url_transformed": transformed_image_url})
-        db.commit()
-
-        print("1:", image_id)
-        print("Original Image URL:", url_original)
-        print("Transformed Image URL:", transformed_image_url)
-
-        return {"message": f"Image transformed and updated successfully. Rotated by {angle} degrees.",
-                "transformed_image_url": transformed_image_url}
-
-    return {"error": "Image not found."}
-
+    try:
+        job, _ = await job_queue.enqueue(auth_service.r, kind, payload, idempotency_key)
+    except IdempotencyConflict:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail=messages.JOB_IDEMPOTENCY_CONFLICT
+        )
+    status_url = request.app.url_path_for("job_status", job_id=job.id)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"job_id": job.id, "status": job.status, "status_url": status_url},
+        headers={"Location": status_url},
+    )
 
 
-@cloud_router.get("/qr_codes_image/{image_id}")
-def qr_codes_and_update_image(image_id: str, db: Session = Depends(get_db)):
+async def get_image_or_404(db: AsyncSession, image_id: int) -> Image:
+    image = await db.get(Image, image_id)
+    if image is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
+        )
+    return image
+
+
+@cloud_router.get("/transformed_image/{image_id}", status_code=status.HTTP_202_ACCEPTED)
+async def transform_and_update_image(
+    request: Request,
+    image_id: int,
+    angle: int = 45,
+    width: Annotated[int | None, Query(ge=1, le=MAX_SIZE)] = None,
+    height: Annotated[int | None, Query(ge=1, le=MAX_SIZE)] = None,
+    crop: Literal["scale", "fit", "fill", "crop"] = "scale",
+    effect: Literal["grayscale"] | None = None,
+    format: Literal["jpg", "png", "webp", "gif"] | None = None,
+    idempotency_key: str | None = Header(default=None, max_length=255),
+    db: AsyncSession = Depends(get_db),
+):
     """
-    The qr_codes_and_update_image function generates a QR code for the original image and updates the database with it.
+    The transform_and_update_image function queues a job which transforms
+        the original image (rotation by angle, resizing, cropping, grayscale,
+        format conversion) in the storage and sets url_transformed of the image.
+        The same request (or Idempotency-Key) returns the same job.
     
+    :param image_id: int: Identify the image to be transformed
+    :param angle: int: Specify the angle by which the image should be rotated,
+        a multiple of 45 for local storage
+    :param width: int | None: Width of the result
+    :param height: int | None: Height of the result
+    :param crop: str: How width and height are applied
+    :param effect: str | None: Effect, grayscale
+    :param format: str | None: Format of the result, format of the original by default
+    :param idempotency_key: str | None: Key of the request, repeated request gets the same job
+    :param db: AsyncSession: Get the database session
+    :return: Id and status url of the job, 202
+    """
+    image = await get_image_or_404(db, image_id)
+    transformation = dict(angle=angle, width=width, height=height, crop=crop, effect=effect, format=format)
+    payload = {
+        "image_id": image.id,
+        # a new original is a new job
+        "url": image.url_original,
+        "transformation": {k: v for k, v in transformation.items() if v is not None},
+    }
+    return await enqueue_job(request, "transform", payload, idempotency_key)
+
+
+@cloud_router.get("/qr_codes_image/{image_id}", status_code=status.HTTP_202_ACCEPTED)
+async def qr_codes_and_update_image(
+    request: Request,
+    image_id: int,
+    idempotency_key: str | None = Header(default=None, max_length=255),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    The qr_codes_and_update_image function queues a job which stores a QR code
+        of the original image and sets url_original_qr of the image.
     
-    :param image_id: str: Pass the image id to the function
-    :param db: Session: Access the database
-    :return: The following:
-    :doc-author: Trelent
+    :param image_id: int: Pass the image id to the function
+    :param idempotency_key: str | None: Key of the request, repeated request gets the same job
+    :param db: AsyncSession: Access the database
+    :return: Id and status url of the job, 202
     """
-    image = db.query(Image).filter(Image.id == image_id).first()
-    print("1:", image)
-    print("Start:", image_id)
-
-    if image:
-        url_original = image.url_original
-        public_id = cloudinary.utils.cloudinary_url(url_original)[0].split("/")[-1]
-        print("Start URL:", url_original)
-
-        folder_path = "qr_codes"
-
-        # Create QR 
-        qr_original = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_M,
-            box_size=10,
-            border=4,
-        )
-        qr_original.add_data(url_original)
-        qr_original.make(fit=True)
-
-        # Save QR 
-        qr_code_original_image = qr_original.make_image(fill_color="black", back_color="white")
-        qr_code_original_image_io = BytesIO()
-        qr_code_original_image.save(qr_code_original_image_io, format="PNG")
-
-        # Upload QR 
-        qr_code_original_response = upload(
-            qr_code_original_image_io.getvalue(),
-            folder=folder_path,
-            public_id=f"{folder_path}/{public_id}_qr_code",
-            format="png",
-            overwrite=True
-        )
-
-        qr_code_original_url = qr_code_original_response['secure_url']
-
-        db.query(Image).filter(Image.id == image_id).update({"url_original_qr": qr_code_original_url})
-        db.commit()
-
-        print("1:", image_id)
-        print("Original Image URL:", url_original)
-        print("QR Code URL for Original Image:", qr_code_original_url)
-
-        return {"message": f"QR Code generated and updated successfully for the original image.",
-                "url_original_qr": qr_code_original_url}
+    image = await get_image_or_404(db, image_id)
+    payload = {"image_id": image.id, "url": image.url_original}
+    return await enqueue_job(request, "qr_original", payload, idempotency_key)
 
-    return {"error": "Image not found."}
 
-
-@cloud_router.get("/qr_codes_transformed_image/{image_id}")
-def qr_codes_and_update_transformed_image(image_id: str, db: Session = Depends(get_db)):
+@cloud_router.get("/qr_codes_transformed_image/{image_id}", status_code=status.HTTP_202_ACCEPTED)
+async def qr_codes_and_update_transformed_image(
+    request: Request,
+    image_id: int,
+    idempotency_key: str | None = Header(default=None, max_length=255),
+    db: AsyncSession = Depends(get_db),
+):
     """
-    The qr_codes_and_update_transformed_image function generates a QR code for the transformed image and updates the url_transformed_qr field in the database.
+    The qr_codes_and_update_transformed_image function queues a job which stores
+        a QR code of the transformed image and sets url_transformed_qr of the image.
+        An image without url_transformed is transformed first, in the same job.
     
-    :param image_id: str: Get the image from the database
-    :param db: Session: Get the database session
-    :return: A dictionary with the url_transformed_qr key
-    :doc-author: Trelent
+    :param image_id: int: Get the image from the database
+    :param idempotency_key: str | None: Key of the request, repeated request gets the same job
+    :param db: AsyncSession: Get the database session
+    :return: Id and status url of the job, 202
     """
-    image = db.query(Image).filter(Image.id == image_id).first()
-
-    if image:
-        if not image.url_transformed:
-            # Якщо url_transformed пустий, викликаємо transform_and_update_image
-            transform_and_update_image(image_id=image_id, db=db)
-
-        url_transformed = image.url_transformed
-        public_id = cloudinary.utils.cloudinary_url(url_transformed)[0].split("/")[-1]
-
-        folder_path = "qr_codes"
+    image = await get_image_or_404(db, image_id)
+    payload = {"image_id": image.id, "url": image.url_transformed}
+    return await enqueue_job(request, "qr_transformed", payload, idempotency_key)
 
-        # Створення QR-коду
-        qr_transformed = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_M,
-            box_size=10,
-            border=4,
-        )
-        qr_transformed.add_data(url_transformed)
-        qr_transformed.make(fit=True)
-
-        # Збереження QR-коду
-        qr_code_transformed_image = qr_transformed.make_image(fill_color="navy", back_color="lightyellow")
-        qr_code_transformed_image_io = BytesIO()
-        qr_code_transformed_image.save(qr_code_transformed_image_io, format="PNG")
-
-        # Завантаження QR-коду
-        qr_code_transformed_response = upload(
-            qr_code_transformed_image_io.getvalue(),
-            folder=folder_path,
-            public_id=f"{folder_path}/{public_id}_qr_code_transformed",
-            format="png",
-            overwrite=True
-        )
 
-        qr_code_transformed_url = qr_code_transformed_response['secure_url']
+@cloud_router.get("/jobs/{job_id}", response_model=JobResponse, name="job_status")
+async def job_status(job_id: str):
+    """
+    Status of a job, result (urls of the image) when it is done.
 
-        image = db.query(Image).filter(Image.id == image_id).first()
-        # Оновлення поля url_transformed_qr у базі даних
-        db.query(Image).filter(Image.id == image_id).update({"url_transformed_qr": qr_code_transformed_url})
-        db.commit()
+    :param job_id: str: Id of the job
+    :return: The job
+    """
+    job = await job_queue.get(auth_service.r, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=messages.JOB_NOT_FOUND)
+    return job.json()
+
+
+@cloud_router.post("/bulk")
+async def bulk_generate(
+    body: BulkImagesRequest,
+    current_user: CachedUser = Depends(auth_service.get_current_user),
+    db: AsyncSession = Depends(get_db),
+    storage: StorageBackend = Depends(get_storage),
+):
+    """
+    The bulk_generate function makes transformations and QR codes of all images
+        matching the filter (owner, tag, creation date range). Images are read in
+        batches by id, rendered with bounded concurrency, and each batch is written
+        back with one UPDATE. Progress is streamed as NDJSON, a line per batch
+        and a last line with "done".
+        An admin may process any gallery, other users only their own.
+
+    :param body: BulkImagesRequest: Filter, operations and transformation
+    :param current_user: CachedUser: The user of the request
+    :param db: AsyncSession: Get the database session
+    :param storage: StorageBackend: Storage of the images
+    :return: NDJSON stream of the progress
+    """
+    owner_id = body.owner_id
+    if current_user.role != Role.admin:
+        if owner_id not in (None, current_user.id):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=messages.OPERATION_FORBIDDEN)
+        owner_id = current_user.id
+    transformation = dict(
+        angle=body.angle, width=body.width, height=body.height, crop=body.crop, effect=body.effect, format=body.format
+    )
+    generator = BulkGenerator(
+        storage,
+        auth_service.r,
+        body.operations,
+        {k: v for k, v in transformation.items() if v is not None},
+        batch_size=body.batch_size or settings.bulk_batch_size,
+        concurrency=body.concurrency or settings.bulk_concurrency,
+    )
+    stmt = select_images(owner_id, body.tag, body.created_from, body.created_to)
 
-        return {"message": f"QR Code generated and updated successfully for the transformed image.",
-                "url_transformed_qr": qr_code_transformed_url}
+    async def progress():
+        async for line in generator.run(db, stmt):
+            yield json.dumps(line) + "\n"
 
-    return {"error": "Image not found."}
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
 
 
 @cloud_router.get("/qr_load/{image_id}")
-def qr_codes_image_load(
-    image_id: str,
+async def qr_codes_image_load(
+    image_id: int,
     option: str
     | None = Query(
         title="Type of source of image to use", default="original", description="Type of source of image to use. Can be: original or transformed. By default used  original"
     ),
-    db: Session = Depends(get_db),
+    format: Literal["png", "svg"] = Query(default="png", description="png - 1-bit PNG, svg - vector image"),
+    if_none_match: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_db),
 ):
-    image: Image = db.query(Image).filter(Image.id == image_id).first()
+    """
+    QR code of the image url, from the cache of rendered codes.
+
+    ETag is known before rendering, a matching If-None-Match gets 304
+    without the image bytes. url_original never changes, so its code is
+    immutable; url_transformed may, its code is revalidated by ETag.
+
+    :param image_id: int: Id of the image
+    :param option: str: original or transformed
+    :param format: str: png or svg
+    :param if_none_match: str: ETag of the code the client has
+    :param db: AsyncSession: Get the database session
+    :return: PNG or SVG image, or 304
+    """
+    image: Image = await db.get(Image, image_id)
     if image:
-        qr_original = qrcode.QRCode( # type: ignore
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_M, # type: ignore
-            box_size=10,
-            border=4,
-        )
         url_str: str = (
             image.url_transformed if option == "transformed" else image.url_original
         ) # type: ignore
         if url_str:
-            qr_original.add_data(url_str)
-            qr_original.make(fit=True)
-
-            # Save QR
-            qr_code_original_image = qr_original.make_image(
-                fill_color="black", back_color="white"
-            )
-            qr_code_original_image_io = BytesIO()
-            qr_code_original_image.save(qr_code_original_image_io, format="PNG")
-            qr_code_original_image_io.seek(0)  # Return cursor to starting point
-            return StreamingResponse(qr_code_original_image_io, media_type="image/png")
+            spec = QRSpec(url_str, format=format)
+            headers = {
+                "ETag": spec.etag,
+                "Cache-Control": "no-cache" if option == "transformed" else IMMUTABLE,
+            }
+            if etag_matches(if_none_match, spec.etag):
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            content = await qr_renderer.image(spec, auth_service.r)
+            return Response(content=content, media_type=spec.media_type, headers=headers)
 
     raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND
-    )
\ No newline at end of file
+    )
@@ -1,7 +1,7 @@
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Depends, status, Path, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Response, status, Path, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from fastapi_limiter.depends import RateLimiter
 
@@ -12,6 +12,7 @@ from src.schemas import CommentBase, CommentResponse
 from src.repository import comments as repository_comments
 from src.conf import messages
 from src.services.roles import RoleAccess
+from src.services.pagination import NEXT_CURSOR_HEADER, next_cursor
 
 
 router = APIRouter(prefix="/comments/{image_id}", tags=["Comments by picture"])
@@ -31,21 +32,26 @@ allowed_operation_delete = RoleAccess([Role.admin, Role.moderator])
     dependencies=[Depends(allowed_operation_get), Depends(RateLimiter(times=10, seconds=60))],
 )
 async def get_comments(
+    response: Response,
     image_id: int = Path(ge=1),
     limit: int = Query(5, le=100),
     offset: int = 0,
+    cursor: str | None = Query(None, description="X-Next-Cursor of the previous page"),
     owner: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     The get_comments function returns a list of comments for the image with the given id.
-    The limit and offset parameters are used to paginate through all comments.
+    The cursor (or the limit and offset) parameters are used to paginate through all comments,
+    the cursor of the next page is returned in the X-Next-Cursor header.
 
+    :param response: Response: Set the header with the cursor of the next page
     :param image_id: int: Get the image id from the url
     :param limit: int: Limit the number of comments that are returned
     :param offset: int: Get the next set of comments
+    :param cursor: str | None: Continue after the previous page
     :param owner: User: Get the current user
-    :param db: Session: Pass the database session to the repository_comments
+    :param db: AsyncSession: Pass the database session to the repository_comments
     :return: A list of comments for a given image
     """
     image = await repository_comments.get_image_by_id(image_id, db)
@@ -53,7 +59,11 @@ async def get_comments(
     if image is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=messages.IMAGE_NOT_FOUND)
     
-    return await repository_comments.get_comments(image_id, limit, offset, db)
+    comments = await repository_comments.get_comments(image_id, limit, offset, db, cursor)
+    cursor = next_cursor(comments, limit, "created_at", "id")
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return comments
 
 
 @router.get(
@@ -67,7 +77,7 @@ async def get_comment(
     image_id: int = Path(ge=1),
     comment_id: int = Path(ge=1),
     owner: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     The get_comment function returns a comment by its id.
@@ -75,7 +85,7 @@ async def get_comment(
     :param image_id: int: Get the image id from the url
     :param comment_id: int: Get the comment id from the url
     :param owner: User: Check if the user is logged in
-    :param db: Session: Pass the database session to the repository layer
+    :param db: AsyncSession: Pass the database session to the repository layer
     :return: A comment object
     """
     image = await repository_comments.get_image_by_id(image_id, db)
@@ -106,7 +116,7 @@ async def create_comment(
     body: CommentBase,
     image_id: int = Path(ge=1),
     owner: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     The create_comment function creates a new comment in the database.
@@ -116,7 +126,7 @@ async def create_comment(
     :param body: CommentBase: Get the data from the request body
     :param image_id: int: Get the image id from the path
     :param owner: User: Get the current user
-    :param db: Session: Pass the database session to the repository layer
+    :param db: AsyncSession: Pass the database session to the repository layer
     :return: A commentbase object
     """
     image = await repository_comments.get_image_by_id(image_id, db)
@@ -146,7 +156,7 @@ async def update_comment(
     image_id: int = Path(ge=1),
     comment_id: int = Path(ge=1),
     owner: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     The update_comment function updates a comment in the database.
@@ -155,7 +165,7 @@ async def update_comment(
     :param image_id: int: Get the image id from the url
     :param comment_id: int: Identify the comment that is to be updated
     :param owner: User: Get the current user
-    :param db: Session: Get the database session
+    :param db: AsyncSession: Get the database session
     :return: A comment
     """
     image = await repository_comments.get_image_by_id(image_id, db)
@@ -187,7 +197,7 @@ async def remove_comment(
     image_id: int = Path(ge=1),
     comment_id: int = Path(ge=1),
     owner: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     The remove_comment function removes a comment from an image.
@@ -196,7 +206,7 @@ async def remove_comment(
     :param image_id: int: Get the image id from the url
     :param comment_id: int: Identify which comment to remove
     :param owner: User: Get the current user and check if they are authorized to delete the comment
-    :param db: Session: Pass the database session to the repository layer
+    :param db: AsyncSession: Pass the database session to the repository layer
     :return: A comment object
     """
     image = await repository_comments.get_image_by_id(image_id, db)
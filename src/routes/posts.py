@@ -12,16 +12,16 @@ from fastapi import (
 )
 from fastapi.responses import JSONResponse
 from pydantic import ValidationError
-import cloudinary.uploader
-import cloudinary.api
 import os
 import shutil
 import uuid
-from typing import Any, List, Optional
+from typing import Any, List, Literal, Optional
 import logging
 from datetime import datetime
 
-from sqlalchemy.orm import Session
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from starlette.requests import Request
 from starlette import status
 from starlette.status import HTTP_404_NOT_FOUND
@@ -31,26 +31,21 @@ from src.schemas import PostCreate, PostList, PostSingle, UserResponse, UserDb,
 from src.database.db import get_db
 from src.services.auth import auth_service
 from src.services.posts import PostServices
-from src.services.tags import TagServices, Tag
+from src.services.fuzzy import fuzzy_search
+from src.services.search import post_search
+from src.services.storage import StorageBackend, get_storage
+from src.services.tags import TagServices, Tag, SUGGEST_TOP, tag_suggest
+from src.services.uploads import AsyncFile
 from src.services.roles import RoleAccess
+from src.services.pagination import NEXT_CURSOR_HEADER, encode_cursor, next_cursor
+from src.services.qr_pipeline import qr_pipeline
 from src.conf.config import settings
 # from src.services.cloudinary_srv import CloudinaryService
-from cloudinary.uploader import upload, destroy
-from src.services.roles import RoleAccess
 
 allowed_operation_admin = RoleAccess([Role.admin])
 allowed_operation_search_by_user = RoleAccess([Role.admin, Role.moderator])
 
 
-class Cloudinary:
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True,
-    )
-
-
 posts_router = APIRouter(prefix="", tags=["Posts of picture"])
 tags_router = APIRouter(prefix="", tags=["Tags of picture"])
 
@@ -64,6 +59,85 @@ allowed_operation_update = RoleAccess([Role.admin, Role.moderator, Role.user])
 allowed_operation_delete = RoleAccess([Role.admin, Role.moderator, Role.user])
 
 
+def posts_response(posts: List[Image], limit: int) -> JSONResponse:
+    """
+    Список світлин, курсор наступної сторінки в заголовку X-Next-Cursor
+    """
+    cursor = next_cursor(posts, limit, "created_at", "id")
+    headers = {NEXT_CURSOR_HEADER: cursor} if cursor else None
+    return JSONResponse(content=[post.json() for post in posts], headers=headers)
+
+
+async def publish_image(
+    db: AsyncSession,
+    owner_id: int,
+    file: AsyncFile,
+    text: str,
+    tags: List[str],
+    storage: StorageBackend | None = None,
+) -> PostSingle:
+    """
+    Світлина в сховищі, запис з тегами в базі даних
+    (публікація одним запитом і завершення завантаження частинами)
+    """
+    # Розділення тегів та перевірка кількості
+    tag_names = []
+    for tags_str in tags:
+        tag_list = tags_str.split(",")
+        if len(tag_list) > 5:
+            raise HTTPException(
+                status_code=400, detail="Максимальна кількість тегів - 5"
+            )
+        tag_names.extend(tag_list)
+
+    public_id = f"image_{owner_id}_{uuid.uuid4()}"
+
+    # Завантаження в сховище частинами, файл не читається в пам'ять цілком
+    stored = await (storage or get_storage()).put(file, key=public_id, folder="publication")
+
+    # Зберігання в базі даних
+    image = Image(
+        owner_id=owner_id,
+        url_original=stored.url,
+        description=text,
+        url_original_qr="",
+        updated_at=datetime.now(),
+    )
+
+    # всі теги одним запитом, світлина і зв'язки з тегами - в тій самій транзакції
+    image.tags = await tag_services.upsert_tags(db, tag_names)
+    db.add(image)
+    await db.commit()
+    # QR-код генерує воркер після коміту, публікація його не чекає
+    try:
+        await qr_pipeline.enqueue(auth_service.r, image.id)
+    except RedisError as err:
+        logging.warning(f"QR code of image {image.id} is left for the request: {err}")
+
+    # інформація про світлину
+    item = await post_services.get_p(db=db, id=image.id)
+
+    if not item:
+        raise HTTPException(
+            status_code=HTTP_404_NOT_FOUND, detail="Запис не знайдений"
+        )
+    tag_suggest.add([tag.name for tag in item.tags])
+
+    post_data = {
+        "id": item.id,
+        "owner_id": item.owner_id,
+        "url_original": item.url_original,
+        "tags": [tag.name for tag in item.tags],
+        "description": item.description,
+        "pub_date": item.created_at,
+        "img": item.url_original,
+        "text": "",
+        "user": "",
+    }
+
+    return PostSingle(**post_data)
+
+
 # публікуємо світлину
 @posts_router.post("/publication", 
                    response_model=PostSingle, 
@@ -74,7 +148,8 @@ async def upload_images_user(
     text: str = Form(...),
     tags: List[str] = Form([]),
     current_user: UserDb = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    storage: StorageBackend = Depends(get_storage),
 ):
     """
     The upload_images_user function uploads an image to the Cloudinary cloud storage service.
@@ -85,80 +160,13 @@ async def upload_images_user(
     :param text: str: Get the description of the image
     :param tags: List[str]: Get a list of tags from the form
     :param current_user: UserDb: Get the current user
-    :param db: Session: Access the database
+    :param db: AsyncSession: Access the database
     :param : Get the current user
     :return: The following data:
     :doc-author: Trelent
     """
     try:
-        img_content = await file.read()
-        public_id = f"image_{current_user.id}_{uuid.uuid4()}"
-
-        # Завантаження на Cloudinary
-        response = cloudinary.uploader.upload(
-            img_content, public_id=public_id, overwrite=True, folder="publication"
-        )
-
-        # Зберігання в базі даних
-        image = Image(
-            owner_id=current_user.id,
-            url_original=response["secure_url"],
-            description=text,
-            url_original_qr="",
-            updated_at=datetime.now(),
-        )
-
-        # Розділення тегів та перевірка кількості
-        for tags_str in tags:
-            tag_list = tags_str.split(",")
-            tag_count = len(tag_list)
-            print(f"Кількість тегів: {tag_count}")
-
-            if tag_count > 5:
-                raise HTTPException(
-                    status_code=400, detail="Максимальна кількість тегів - 5"
-                )
-
-            for tag_name in tag_list:
-                tag_name = tag_name.strip()
-
-                # Чи існує тег з таким іменем
-                tag = db.query(Tag).filter_by(name=tag_name).first()
-                if tag is None:
-                    # Якщо тег не існує, створюємо та зберігаємо
-                    tag = Tag(name=tag_name)
-                    db.add(tag)
-                    db.commit()
-                    db.refresh(tag)
-
-                # Перевірка, чи тег вже приєднаний до світлини
-                if tag not in image.tags:
-                    image.tags.append(tag)
-
-        db.add(image)
-        db.commit()
-
-        # інформація про світлину
-        item = await post_services.get_p(db=db, id=image.id)
-
-        if not item:
-            raise HTTPException(
-                status_code=HTTP_404_NOT_FOUND, detail="Запис не знайдений"
-            )
-
-        post_data = {
-            "id": item.id,
-            "owner_id": item.owner_id,
-            "url_original": item.url_original,
-            "tags": [tag.name for tag in item.tags],
-            "description": item.description,
-            "pub_date": item.created_at,
-            "img": item.url_original,
-            "text": "",
-            "user": "",
-        }
-
-        return PostSingle(**post_data)
+        return await publish_image(db, current_user.id, file, text, tags, storage)
     except HTTPException as e:
         logging.error(f"Помилка валідації форми: {e}")
         raise
@@ -173,16 +181,17 @@ async def upload_images_user(
                   dependencies=[Depends(allowed_operation_read)])
 async def post_list_by_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(auth_service.get_current_user),
     limit: int = Query(default=10, description="Кількість елементів на сторінці", ge=1),
     offset: int = Query(default=0, description="Зміщення сторінки", ge=0),
+    cursor: str | None = Query(default=None, description="Курсор наступної сторінки (заголовок X-Next-Cursor)"),
 ):
     """
     The post_list_by_user function returns a list of posts by the user with the given id.
     
     :param user_id: int: Specify the user id of the posts we want to retrieve
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :param user: User: Get the current user
     :param limit: int: Set the number of items per page
     :param description: Describe the parameter in the api documentation
@@ -190,14 +199,17 @@ async def post_list_by_user(
     :param offset: int: Specify the offset of the page
     :param description: Describe the parameter in the documentation
     :param ge: Specify the minimum value for a parameter
+    :param cursor: str: Continue after the previous page, see X-Next-Cursor header
     :param : Get the current user
     :return: A list of posts by the user
     :doc-author: Trelent
     """
-    posts = post_services.get_post_list_by_user_paginated(db=db, user_id=user_id, limit=limit, offset=offset)
+    posts = await post_services.get_post_list_by_user_paginated(
+        db=db, user_id=user_id, limit=limit, offset=offset, cursor=cursor
+    )
     if not posts:
         raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="Записи не знайдені")
-    return JSONResponse(content=[post.json() for post in posts])
+    return posts_response(posts, limit)
 
 
 # отримувати світлину за унікальним посиланням в БД
@@ -205,13 +217,13 @@ async def post_list_by_user(
                   response_model=PostSingle, 
                   dependencies=[Depends(allowed_operation_read)])
 async def get_post(id: int, 
-                   db: Session = Depends(get_db),
+                   db: AsyncSession = Depends(get_db),
                    user: User = Depends(auth_service.get_current_user)) -> Any:
     """
     The get_post function returns a single post by id.
     
     :param id: int: Specify the type of parameter
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :param user: User: Get the current user
     :return: A postsingle object
     :doc-author: Trelent
@@ -240,7 +252,7 @@ async def get_post(id: int,
 # по аналогії пошуку за параметром в БД, але відповідь "detail": "Not Found"
 # @posts_router.get('/post-url/{url_original}', response_model=PostSingle)
 # async def get_post_by_url(url_original: str,
-#                            db: Session = Depends(get_db),
+#                            db: AsyncSession = Depends(get_db),
 #                            user: User = Depends(auth_service.get_current_user)):
 
 #     try:
@@ -278,17 +290,17 @@ async def get_post(id: int,
                   response_model=PostSingle, 
                   dependencies=[Depends(allowed_operation_read)])
 async def get_post_by_description(description: str,
-                                   db: Session = Depends(get_db),
+                                   db: AsyncSession = Depends(get_db),
                                    user: User = Depends(auth_service.get_current_user)):
     """
     The get_post_by_description function returns a post by description.
         Args:
             description (str): The post's description.
-            db (Session, optional): SQLAlchemy Session. Defaults to Depends(get_db).
+            db (AsyncSession, optional): SQLAlchemy AsyncSession. Defaults to Depends(get_db).
             user (User, optional): User object from auth_service.get_current_user(). Defaults to Depends(auth_service.get_current_user).
 
     :param description: str: Pass the description of the post to be retrieved
-    :param db: Session: Pass the database session to the function
+    :param db: AsyncSession: Pass the database session to the function
     :param user: User: Get the current user
     :return: A jsonresponse object
     :doc-author: Trelent
@@ -336,7 +348,7 @@ async def get_post_by_description(description: str,
 async def update_image_description(
     id: int, 
     description: str, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(auth_service.get_current_user),) -> Any:
     """
     The update_image_description function updates the description of an image.
@@ -346,7 +358,7 @@ async def update_image_description(
     
     :param id: int: Specify the id of the image that we want to update
     :param description: str: Pass the new description to the function
-    :param db: Session: Get the database connection
+    :param db: AsyncSession: Get the database connection
     :param user: User: Get the current user
     :return: A postsingle object
     :doc-author: Trelent
@@ -362,7 +374,7 @@ async def update_image_description(
 
     item.description = description
     item.updated_at = datetime.now()
-    db.commit()
+    await db.commit()
 
     updated_post_data = {
         "id": item.id,
@@ -387,15 +399,16 @@ async def update_image_description(
 
 async def delete_image(
     id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: User = Depends(auth_service.get_current_user),
+    storage: StorageBackend = Depends(get_storage),
 ) -> dict:
     
     """
-    The delete_image function deletes an image from the database and Cloudinary.
+    The delete_image function deletes an image from the database and the storage.
     
     :param id: int: Specify the id of the image to be deleted
-    :param db: Session: Access the database
+    :param db: AsyncSession: Access the database
     :param user: User: Get the current user from the database
     :return: A dictionary with a message
     :doc-author: Trelent
@@ -409,32 +422,54 @@ async def delete_image(
     if not item:
         raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="Запис не знайдений")
 
-    try:
-        destroy_result = destroy(public_id=item.public_id)
-        print("Cloudinary Destroy Result:", destroy_result)
-    except Exception as e:
-        print("Error during Cloudinary destroy:", str(e))
+    url = item.url_original
+    await db.delete(item)
+    await db.commit()
 
-    db.delete(item)
-    db.commit()
+    # файл зі сховища, що адресує за вмістом, може належати й іншим світлинам
+    key = storage.key_from_url(url)
+    shared = storage.content_addressed and await db.scalar(
+        select(Image.id).where(Image.url_original == url).limit(1)
+    )
+    if key and not shared:
+        try:
+            await storage.delete(key)
+        except Exception as e:
+            logging.error(f"Помилка видалення файлу зі сховища: {e}")
 
     return {"message": "Запис видалено успішно"}
 
 
 @posts_router.get("/tags/")
 async def get_tags(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     limit: int = Query(
         default=50, description="Кількість елементів на сторінці", ge=1, le=200
     ),
     offset: int = Query(default=0, description="Зміщення сторінки", ge=0),
+    cursor: str | None = Query(default=None, description="Курсор наступної сторінки (заголовок X-Next-Cursor)"),
 ):
-    tags = post_services.get_tags_paginated(db=db, limit=limit, offset=offset)
+    tags = await post_services.get_tags_paginated(
+        db=db, limit=limit, offset=offset, cursor=cursor
+    )
     if tags:
-        return tags
+        headers = {NEXT_CURSOR_HEADER: encode_cursor(tags[-1])} if len(tags) == limit else None
+        return JSONResponse(content=tags, headers=headers)
     raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="Записи не знайдені")
 
 
+# підказки тегів за префіксом під час введення, найпопулярніші спочатку
+# (окремий роутер: запит на кожне натискання клавіші, свій ліміт)
+@tags_router.get("/tags/suggest")
+async def suggest_tags(
+    prefix: str = Query(default="", max_length=25, description="Початок імені тегу"),
+    limit: int = Query(default=10, description="Кількість підказок", ge=1, le=SUGGEST_TOP),
+    db: AsyncSession = Depends(get_db),
+):
+    suggestions = await tag_suggest.get(db, prefix.strip(), limit)
+    return [{"name": name, "count": count} for name, count in suggestions]
+
+
 # отримувати світлину за параметрами в БД - працює та повертає значення
 @posts_router.get("/search/", response_model=list[PostList])
 async def search_post(
@@ -445,23 +480,69 @@ async def search_post(
     tag: str | None = Query(default=None, description="Пошук за тегом"),
     sort: str
     | None = Query(default=None, description="Сортування за датою створення: +, -"),
-    db: Session = Depends(get_db),
+    mode: Literal["contains", "fulltext"] = Query(
+        default="contains",
+        description="contains - входження тексту в опис, "
+        "fulltext - повнотекстовий пошук за описом і тегами, за релевантністю",
+    ),
+    tags: List[str] = Query(default=[], description="fulltext: всі вказані теги"),
+    db: AsyncSession = Depends(get_db),
     limit: int = Query(
         default=10, description="Кількість елементів на сторінці", ge=1, le=100
     ),
     offset: int = Query(default=0, description="Зміщення сторінки", ge=0),
+    cursor: str | None = Query(default=None, description="Курсор наступної сторінки (заголовок X-Next-Cursor)"),
 ):
-    if description or tag:
-        posts = post_services.search_posts_paginated(
+    if mode == "fulltext":
+        found = await post_search.search(
+            db=db,
+            query=description,
+            tags=[*tags, tag] if tag else tags,
+            limit=limit,
+            cursor=cursor,
+        )
+        if found:
+            headers = None
+            if len(found) == limit:
+                image, rank = found[-1]
+                headers = {NEXT_CURSOR_HEADER: encode_cursor(rank, image.id)}
+            content = [{**image.json(), "rank": rank} for image, rank in found]
+            return JSONResponse(content=content, headers=headers)
+    elif description or tag:
+        posts = await post_services.search_posts_paginated(
             db=db,
             description=description,
             tag=tag,
             sort=sort,
             limit=limit,
             offset=offset,
+            cursor=cursor,
         )
         if posts:
-            return JSONResponse(content=[post.json() for post in posts])
+            return posts_response(posts, limit)
+    raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="Записи не знайдені")
+
+
+# нечіткий пошук: частина слова, помилки в написанні
+@posts_router.get("/search/fuzzy", response_model=list[PostList])
+async def search_post_fuzzy(
+    q: str = Query(min_length=1, max_length=255, description="Текст або його частина"),
+    field: Literal["description", "username"] = Query(
+        default="description", description="Пошук в описі або в імені автора"
+    ),
+    threshold: float = Query(
+        default=settings.fuzzy_threshold, ge=0.1, le=1, description="Мінімальна схожість"
+    ),
+    limit: int = Query(default=10, description="Кількість найбільш схожих", ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+):
+    found = await fuzzy_search.search(
+        db=db, query=q, field=field, threshold=threshold, limit=limit
+    )
+    if found:
+        return JSONResponse(
+            content=[{**image.json(), "similarity": score} for image, score in found]
+        )
     raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="Записи не знайдені")
 
 
@@ -484,14 +565,15 @@ async def search_post_by_user_id(
     tag: str | None = Query(default=None, description="Пошук за тегом"),
     sort: str
     | None = Query(default=None, description="Сортування за датою створення: +, -"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     limit: int = Query(
         default=10, description="Кількість елементів на сторінці", ge=1, le=100
     ),
     offset: int = Query(default=0, description="Зміщення сторінки", ge=0),
+    cursor: str | None = Query(default=None, description="Курсор наступної сторінки (заголовок X-Next-Cursor)"),
 ):
     if user_id or description or tag:
-        posts = post_services.search_posts_paginated(
+        posts = await post_services.search_posts_paginated(
             db=db,
             description=description,
             tag=tag,
@@ -499,7 +581,8 @@ async def search_post_by_user_id(
             sort=sort,
             limit=limit,
             offset=offset,
+            cursor=cursor,
         )
         if posts:
-            return JSONResponse(content=[post.json() for post in posts])
+            return posts_response(posts, limit)
     raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="Записи не знайдені")
@@ -1,16 +1,20 @@
 import pathlib
 
-from fastapi import Response
+from fastapi import Depends, HTTPException, Response, status
+from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 
 from src.conf.config import settings
+from src.services.storage import LocalStorage, StorageBackend, get_storage
+
+IMMUTABLE = "public, max-age=31536000, s-maxage=31536000, immutable"
 
 
 class StaticFilesCache(StaticFiles):
     def __init__(
         self,
         *args,
-        cachecontrol="public, max-age=31536000, s-maxage=31536000, immutable",
+        cachecontrol=IMMUTABLE,
         **kwargs
     ):
         self.cachecontrol = cachecontrol
@@ -22,6 +26,21 @@ class StaticFilesCache(StaticFiles):
         return resp
 
 
+async def derived_file(
+    source: str, name: str, storage: StorageBackend = Depends(get_storage)
+) -> FileResponse:
+    """
+    Derived image of local storage, rendered again if it was evicted from the cache.
+    """
+    if isinstance(storage, LocalStorage):
+        try:
+            path = await storage.derived(f"derived/{source}/{name}")
+            return FileResponse(path, headers={"Cache-Control": IMMUTABLE})
+        except (ValueError, FileNotFoundError):
+            pass
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+
 def add_static(_app):
     _app.mount(
         path="/static",
@@ -35,6 +54,25 @@ def add_static(_app):
         app=StaticFilesCache(directory=settings.SPHINX_DIRECTORY, html=True),
         name="sphinx",
     )
+    if settings.storage_backend == "local":
+        add_media(_app)
+
+
+def add_media(_app):
+    # content addressed files never change, default Cache-Control is immutable
+    pathlib.Path(settings.storage_local_dir).mkdir(parents=True, exist_ok=True)
+    # before the mount, so a derived file evicted from the cache is rendered again
+    _app.add_api_route(
+        f"{settings.storage_local_url}/derived/{{source}}/{{name}}",
+        derived_file,
+        methods=["GET"],
+        include_in_schema=False,
+    )
+    _app.mount(
+        path=settings.storage_local_url,
+        app=StaticFilesCache(directory=settings.storage_local_dir),
+        name="media",
+    )
 
 
 static_dir: pathlib.Path = pathlib.Path(settings.STATIC_DIRECTORY)
@@ -1,18 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import text
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
-from src.database.db import get_db
+from src.database.db import get_db, get_pool_status
+from src.services import user_cache
+from src.services.hashing import password_hasher
+from src.services.auth import auth_service
+from src.services.qr import qr_renderer
+from src.services.qr_pipeline import qr_pipeline
+from src.services.storage import LocalStorage, StorageBackend, get_storage
 
 
 router = APIRouter(prefix="", tags=["Tools"])
 
 @router.get("/healthchecker")
-def healthchecker(db: Session = Depends(get_db)):
+async def healthchecker(db: AsyncSession = Depends(get_db)):
     try:
         # Make request
-        result = db.execute(text("SELECT 1")).fetchone()
+        result = (await db.execute(text("SELECT 1"))).fetchone()
         if result is None:
             raise HTTPException(status_code=500, detail="Database is not configured correctly")
         return {"message": f"Welcome to PIXEL PROJECT!"}
@@ -21,4 +27,76 @@ def healthchecker(db: Session = Depends(get_db)):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error connecting to the database",
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/healthchecker/pool")
+async def healthchecker_pool():
+    """
+    Live statistics of database connection pool.
+
+    :return: Checked-out and overflow connections, time of waiting for connection.
+    :rtype: dict
+    """
+    status_pool = get_pool_status()
+    if not status_pool:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database is not configured",
+        )
+    return status_pool
+
+
+@router.get("/healthchecker/user-cache")
+async def healthchecker_user_cache():
+    """
+    Statistics of in-process user cache of this worker.
+
+    :return: Hits, misses, evictions and size of cache.
+    :rtype: dict
+    """
+    return user_cache.local_cache.stats()
+
+
+@router.get("/healthchecker/hasher")
+async def healthchecker_hasher():
+    """
+    Statistics of password hashing pool: time in queue versus time of bcrypt.
+
+    :return: Busy and rejected calls, average and max wait and hash time.
+    :rtype: dict
+    """
+    return password_hasher.stats()
+
+
+@router.get("/healthchecker/transforms")
+async def healthchecker_transforms(storage: StorageBackend = Depends(get_storage)):
+    """
+    Statistics of local image transformations: renders and derived image cache.
+
+    :return: Renders, render time, hits, misses and evictions of cache, None for Cloudinary storage.
+    :rtype: dict | None
+    """
+    return storage.engine.stats() if isinstance(storage, LocalStorage) else None
+
+
+@router.get("/healthchecker/qr")
+async def healthchecker_qr():
+    """
+    Statistics of QR code rendering of this worker: cache tiers and renders.
+
+    :return: Local and Redis hits, renders, hit ratio, evictions and size of cache.
+    :rtype: dict
+    """
+    return qr_renderer.stats()
+
+
+@router.get("/healthchecker/qr-pipeline")
+async def healthchecker_qr_pipeline():
+    """
+    QR codes of new posts made by the workers: queue and time from publish to QR ready.
+
+    :return: Pending, ready, failed and retried images, p50, p95 and max of latency in seconds.
+    :rtype: dict
+    """
+    return await qr_pipeline.stats(auth_service.r)
@@ -0,0 +1,150 @@
+from fastapi import APIRouter, Depends, Header, Request, Response, UploadFile, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.db import get_db
+from src.database.models import Role
+from src.routes.posts import publish_image
+from src.schemas import PostSingle, UploadCreate, UploadFinalize, UploadStatus
+from src.services.auth import auth_service
+from src.services.resumable import resumable_uploads
+from src.services.roles import RoleAccess
+from src.services.storage import StorageBackend, get_storage
+from src.services.user_cache import CachedUser
+
+# resumable upload of big photos (tus-like): create, PUT chunks at Upload-Offset,
+# HEAD for progress, finalize into a post
+router = APIRouter(prefix="/uploads", tags=["Resumable uploads"])
+
+allowed_operation_create = RoleAccess([Role.admin, Role.moderator, Role.user])
+
+OFFSET_HEADER = "Upload-Offset"
+
+
+def upload_status(session) -> UploadStatus:
+    return UploadStatus(id=session.id, size=session.size, offset=session.offset)
+
+
+@router.post(
+    "/",
+    response_model=UploadStatus,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(allowed_operation_create)],
+)
+async def create_upload(
+    body: UploadCreate,
+    request: Request,
+    response: Response,
+    current_user: CachedUser = Depends(auth_service.get_current_user),
+):
+    """
+    Creates an upload session for a file of body.size bytes.
+
+    :param body: Size and name of the file.
+    :type body: UploadCreate
+    :return: Id of the upload, Location header points to it.
+    :rtype: UploadStatus
+    """
+    session = await resumable_uploads.create(
+        auth_service.r, current_user.id, body.size, body.filename
+    )
+    response.headers["Location"] = str(request.url_for("upload_progress", upload_id=session.id))
+    response.headers[OFFSET_HEADER] = "0"
+    return upload_status(session)
+
+
+@router.head("/{upload_id}", name="upload_progress")
+@router.get("/{upload_id}", response_model=UploadStatus)
+async def upload_progress(
+    upload_id: str,
+    response: Response,
+    current_user: CachedUser = Depends(auth_service.get_current_user),
+):
+    """
+    Progress of the upload: the client resumes from Upload-Offset.
+
+    :param upload_id: Id of the upload.
+    :type upload_id: str
+    :return: Size and received offset.
+    :rtype: UploadStatus
+    """
+    session = await resumable_uploads.get(auth_service.r, upload_id, current_user.id)
+    response.headers[OFFSET_HEADER] = str(session.offset)
+    return upload_status(session)
+
+
+@router.put("/{upload_id}", response_model=UploadStatus)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: int = Header(ge=0, alias=OFFSET_HEADER),
+    current_user: CachedUser = Depends(auth_service.get_current_user),
+):
+    """
+    Writes the request body at Upload-Offset, which must equal the received size.
+
+    :param upload_id: Id of the upload.
+    :type upload_id: str
+    :param upload_offset: Offset of the chunk.
+    :type upload_offset: int
+    :return: Size and new offset.
+    :rtype: UploadStatus
+    """
+    session = await resumable_uploads.append(
+        auth_service.r, upload_id, current_user.id, upload_offset, request.stream()
+    )
+    response.headers[OFFSET_HEADER] = str(session.offset)
+    return upload_status(session)
+
+
+@router.post(
+    "/{upload_id}/finalize",
+    response_model=PostSingle,
+    response_model_exclude_unset=True,
+    dependencies=[Depends(allowed_operation_create)],
+)
+async def finalize_upload(
+    upload_id: str,
+    body: UploadFinalize,
+    current_user: CachedUser = Depends(auth_service.get_current_user),
+    db: AsyncSession = Depends(get_db),
+    storage: StorageBackend = Depends(get_storage),
+):
+    """
+    Publishes the complete upload as a post, the same way as /posts/publication.
+
+    :param upload_id: Id of the upload.
+    :type upload_id: str
+    :param body: Description and tags.
+    :type body: UploadFinalize
+    :return: The post.
+    :rtype: PostSingle
+    """
+    r = auth_service.r
+    async with resumable_uploads.lock(r, upload_id):
+        session, path = await resumable_uploads.complete(r, upload_id, current_user.id)
+        file = UploadFile(open(path, "rb"), filename=session.filename)
+        try:
+            post = await publish_image(db, current_user.id, file, body.text, body.tags, storage)
+        finally:
+            await file.close()
+        await resumable_uploads.remove(r, upload_id, current_user.id)
+    return post
+
+
+@router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_upload(
+    upload_id: str,
+    current_user: CachedUser = Depends(auth_service.get_current_user),
+):
+    """
+    Cancels the upload and removes received bytes.
+
+    :param upload_id: Id of the upload.
+    :type upload_id: str
+    """
+    r = auth_service.r
+    await resumable_uploads.get(r, upload_id, current_user.id)
+    # not while a chunk is written
+    async with resumable_uploads.lock(r, upload_id):
+        await resumable_uploads.remove(r, upload_id, current_user.id)
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, File, Form, HTTPException, Path, UploadFile, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.conf import messages
 from src.database.db import get_db
@@ -10,6 +10,7 @@ from src.services.auth import auth_service
 from src.schemas import UpdateFullProfile, UpdateProfile, UserDb
 from src.services.roles import RoleAccess
 from src.services import cloudinary_avatar
+from src.services.storage import StorageBackend, get_storage
 
 
 router = APIRouter(prefix="/users", tags=["Users"])
@@ -43,7 +44,7 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
 # async def ban_user(
 #     user_id: int,
 #     owner: User = Depends(auth_service.get_current_user),
-#     db: Session = Depends(get_db),
+#     db: AsyncSession = Depends(get_db),
 # ):
 #     """Ban user by their ID, does not allow users to log in.  Allowed for roles: admin.
 
@@ -52,7 +53,7 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
 #     :param owner: _description_, defaults to Depends(auth_service.get_current_user)
 #     :type owner: User, optional
 #     :param db: _description_, defaults to Depends(get_db)
-#     :type db: Session, optional
+#     :type db: AsyncSession, optional
 #     """
 
 #     # if str(owner.role) != "Role.admin":
@@ -83,7 +84,7 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
 # async def unban_user(
 #     user_id: int,
 #     owner: User = Depends(auth_service.get_current_user),
-#     db: Session = Depends(get_db),
+#     db: AsyncSession = Depends(get_db),
 # ):
 #     """Unban user by their ID, allow users to log in.  Allowed for roles: admin.
 
@@ -92,7 +93,7 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
 #     :param owner: _description_, defaults to Depends(auth_service.get_current_user)
 #     :type owner: User, optional
 #     :param db: _description_, defaults to Depends(get_db)
-#     :type db: Session, optional
+#     :type db: AsyncSession, optional
 #     """
 #     # if str(owner.role) != "Role.admin":
 #     #     raise HTTPException(
@@ -122,7 +123,7 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
 #     user_id: int,
 #     user_role: UserRole,
 #     owner: User = Depends(auth_service.get_current_user),
-#     db: Session = Depends(get_db),
+#     db: AsyncSession = Depends(get_db),
 # ):
 #     """Unban user by their ID, allow users to log in..
 
@@ -131,7 +132,7 @@ async def read_users_me(current_user: User = Depends(auth_service.get_current_us
 #     :param owner: _description_, defaults to Depends(auth_service.get_current_user)
 #     :type owner: User, optional
 #     :param db: _description_, defaults to Depends(get_db)
-#     :type db: Session, optional
+#     :type db: AsyncSession, optional
 #     """
 #     # if str(owner.role) != "Role.admin":
 #     #     raise HTTPException(
@@ -161,7 +162,7 @@ async def update_user(
     data: UpdateFullProfile,
     user_id: int = Path(gt=0),
     owner: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Update user data by their ID, Allowed only for Admin.
 
@@ -170,7 +171,7 @@ async def update_user(
     :param owner: _description_, defaults to Depends(auth_service.get_current_user)
     :type owner: User, optional
     :param db: _description_, defaults to Depends(get_db)
-    :type db: Session, optional
+    :type db: AsyncSession, optional
     """
     # if str(owner.role) != "Role.admin":
     #     raise HTTPException(
@@ -203,7 +204,7 @@ async def update_user(
 async def update_user_me(
     data: UpdateProfile,
     owner: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Update current user data .
 
@@ -212,7 +213,7 @@ async def update_user_me(
     :param owner: _description_, defaults to Depends(auth_service.get_current_user)
     :type owner: User, optional
     :param db: _description_, defaults to Depends(get_db)
-    :type db: Session, optional
+    :type db: AsyncSession, optional
     """
     data_dict = data.model_dump()
     if repository_users.dict_not_empty(data_dict):
@@ -239,7 +240,7 @@ async def update_user_me(
 async def delete_user(
     user_id: int = Path(gt=0),
     owner: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Delete user by their ID, with not active state.  Allowed for roles: admin.
 
@@ -248,7 +249,7 @@ async def delete_user(
     :param owner: _description_, defaults to Depends(auth_service.get_current_user)
     :type owner: User, optional
     :param db: _description_, defaults to Depends(get_db)
-    :type db: Session, optional
+    :type db: AsyncSession, optional
     """
     if owner.id == user_id:  # type: ignore
         raise HTTPException(
@@ -272,7 +273,8 @@ async def update_avatar(
     user_id: int = Path(gt=0),
     file: UploadFile = File(description="Upload image file for user's avatar"),
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    storage: StorageBackend = Depends(get_storage),
 ):
     """
     Updates user's avatar by their id. Allowed only for Admin.
@@ -282,14 +284,16 @@ async def update_avatar(
     :param current_user: The current user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param storage: Storage of the avatar image.
+    :type storage: StorageBackend
     :return: The User with a new avatar.
     :rtype: UserDb
     """
     target_user = await repository_users.get_user_by_id(id=user_id, db=db, active=None)
     if target_user:
-        src_url = cloudinary_avatar.build_avatar_cloudinary_url(
-            file, str(target_user.email)
+        src_url = await cloudinary_avatar.build_avatar_cloudinary_url(
+            file, str(target_user.email), storage
         )
         user = await repository_users.update_avatar(target_user.email, src_url, db)  # type: ignore
         return user
@@ -302,7 +306,8 @@ async def update_avatar(
 async def update_avatar_me(
     file: UploadFile = File(description="Upload image file for your avatar"),
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
+    storage: StorageBackend = Depends(get_storage),
 ):
     """
     Updates user's avatar.
@@ -312,12 +317,14 @@ async def update_avatar_me(
     :param current_user: The current user.
     :type current_user: User
     :param db: The database session.
-    :type db: Session
+    :type db: AsyncSession
+    :param storage: Storage of the avatar image.
+    :type storage: StorageBackend
     :return: The User with a new avatar.
     :rtype: UserDb
     """
-    src_url = cloudinary_avatar.build_avatar_cloudinary_url(
-        file, str(current_user.email)
+    src_url = await cloudinary_avatar.build_avatar_cloudinary_url(
+        file, str(current_user.email), storage
     )
     user = await repository_users.update_avatar(current_user.email, src_url, db)  # type: ignore
     return user
@@ -326,7 +333,7 @@ async def update_avatar_me(
 @router.get("/profile/", status_code=status.HTTP_200_OK)
 async def read_profile(
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Get profile of current user
@@ -344,7 +351,7 @@ async def read_profile(
 async def update_profile(
     data: UpdateProfile,
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Get profile of current user
@@ -368,7 +375,7 @@ async def update_profile(
 async def read_profile_user(
     username: str = Path(min_length=5, max_length=16),
     current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Get profile of selected user by their username
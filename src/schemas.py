@@ -1,6 +1,6 @@
 from datetime import datetime
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Union
+from typing import List, Literal, Optional, Union
 from fastapi import UploadFile
 
 from src.database.models import Role
@@ -160,3 +160,61 @@ class UpdateProfile(BaseModel):
 class UpdateFullProfile(UpdateProfile):
     is_active: bool | None = None
     role: Role | None = None
+
+
+class UploadCreate(BaseModel):
+    """
+    Нове завантаження частинами: розмір файлу в байтах
+    """
+    size: int = Field(gt=0)
+    filename: str = Field(default="file", max_length=255)
+
+
+class UploadStatus(BaseModel):
+    id: str
+    size: int
+    offset: int
+
+
+class UploadFinalize(BaseModel):
+    """
+    Публікація завантаженого файлу: опис і теги як у /publication
+    """
+    text: str
+    tags: List[str] = []
+
+
+class JobResponse(BaseModel):
+    """
+    Фонова задача: status - queued, running, retrying, done або failed
+    """
+    id: str
+    kind: str
+    status: str
+    attempts: int
+    result: dict | None = None
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class BulkImagesRequest(BaseModel):
+    """
+    Масова генерація для світлин, що підходять під фільтр:
+    operations - transform, qr_original, qr_transformed
+    """
+    owner_id: int | None = None
+    tag: str | None = Field(default=None, max_length=25)
+    created_from: datetime | None = None
+    created_to: datetime | None = None
+    operations: List[Literal["transform", "qr_original", "qr_transformed"]] = Field(
+        default=["qr_original"], min_length=1
+    )
+    angle: int = 45
+    width: int | None = Field(default=None, ge=1, le=4096)
+    height: int | None = Field(default=None, ge=1, le=4096)
+    crop: Literal["scale", "fit", "fill", "crop"] = "scale"
+    effect: Literal["grayscale"] | None = None
+    format: Literal["jpg", "png", "webp", "gif"] | None = None
+    batch_size: int | None = Field(default=None, ge=1, le=1000)
+    concurrency: int | None = Field(default=None, ge=1, le=32)
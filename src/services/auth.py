@@ -1,39 +1,70 @@
-import pickle
-import redis
+import hashlib
+import time
+import uuid
+import redis.asyncio as redis
 
+from dataclasses import dataclass
 from typing import Optional
 
 from jose import JWTError, jwt
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, Request, status, Depends
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.conf import messages
 from src.database.db import get_db
 from src.repository import users as repository_users
 from src.repository import logout as repository_logout
 from src.conf.config import settings
+from src.services import user_cache
+from src.services.hashing import HasherBusy, PasswordHasher, password_hasher
+from src.services.user_cache import CachedUser
+
+
+@dataclass(slots=True)
+class AuthContext:
+    """Authentication of current request: the token, its claims and the user."""
+
+    token: str
+    payload: dict
+    user: CachedUser
 
 
 class Auth:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     SECRET_KEY = "secret_key"
     ALGORITHM = "HS256"
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    r = redis.Redis(
-        host=settings.redis_host,
-        port=settings.redis_port,
-        password=settings.redis_password,
-        db=0,
-    )
+    # shared client of redis_pool, assigned in the app lifespan
+    r: redis.Redis | None = None
 
-    def verify_password(self, plain_password, hashed_password):
-        return self.pwd_context.verify(plain_password, hashed_password)
+    hasher: PasswordHasher = password_hasher
 
-    def get_password_hash(self, password: str):
-        return self.pwd_context.hash(password)
+    @staticmethod
+    def busy_exception() -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=messages.AUTH_BUSY,
+            headers={"Retry-After": str(settings.bcrypt_retry_after)},
+        )
+
+    async def verify_password(
+        self, plain_password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        """
+        Check password out of the event loop.
+        Second item is a new hash when stored one uses old bcrypt cost, save it.
+        """
+        try:
+            return await self.hasher.verify_and_update(plain_password, hashed_password)
+        except HasherBusy:
+            raise self.busy_exception()
+
+    async def get_password_hash(self, password: str) -> str:
+        try:
+            return await self.hasher.hash(password)
+        except HasherBusy:
+            raise self.busy_exception()
 
     # define a function to generate a new access token
     async def create_access_token(
@@ -45,7 +76,12 @@ class Auth:
         else:
             expire = datetime.utcnow() + timedelta(minutes=15)
         to_encode.update(
-            {"iat": datetime.utcnow(), "exp": expire, "scope": "access_token"}
+            {
+                "iat": datetime.utcnow(),
+                "exp": expire,
+                "scope": "access_token",
+                "jti": uuid.uuid4().hex,
+            }
         )
         encoded_access_token = jwt.encode(
             to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM
@@ -62,7 +98,12 @@ class Auth:
         else:
             expire = datetime.utcnow() + timedelta(days=7)
         to_encode.update(
-            {"iat": datetime.utcnow(), "exp": expire, "scope": "refresh_token"}
+            {
+                "iat": datetime.utcnow(),
+                "exp": expire,
+                "scope": "refresh_token",
+                "jti": uuid.uuid4().hex,
+            }
         )
         encoded_refresh_token = jwt.encode(
             to_encode, self.SECRET_KEY, algorithm=self.ALGORITHM
@@ -87,18 +128,24 @@ class Auth:
                 detail=messages.AUTH_NOT_VALID_CRED,
             )
 
-    async def get_current_user(
-        self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-    ):
+    async def get_auth_context(
+        self,
+        request: Request,
+        token: str = Depends(oauth2_scheme),
+        db: AsyncSession = Depends(get_db),
+    ) -> AuthContext:
+        """
+        Decode JWT, check black list and load user once per request.
+        Result is kept in request.state, next calls in the same request do no I/O.
+        """
+        context = getattr(request.state, "auth", None)
+        if context is not None and context.token == token:
+            return context
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=messages.AUTH_NOT_VALID_CRED,
             headers={"WWW-Authenticate": "Bearer"},
         )
-        # check user token is banned
-        token_banned_is = await repository_logout.check_token(token, db)
-        if token_banned_is:
-            raise credentials_exception
         try:
             # Decode JWT
             payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
@@ -110,19 +157,77 @@ class Auth:
                 raise credentials_exception
         except JWTError as e:
             raise credentials_exception
-        user = self.r.get(f"user:{email}")
+        # check user token is banned
+        if await self.is_token_revoked(token, payload):
+            raise credentials_exception
+        user = await user_cache.get_user(email, self.r)
         if user is None:
-            user = await repository_users.get_user_by_email(email, db)
-            if user is None:
+            db_user = await repository_users.get_user_by_email(email, db)
+            if db_user is None:
                 raise credentials_exception
-            self.r.set(f"user:{email}", pickle.dumps(user))
-            self.r.expire(f"user:{email}", 900)
-        else:
-            user = pickle.loads(user)
+            user = CachedUser.from_user(db_user)
+            await user_cache.set_user(user, self.r)
         # check user is active and confirmed
         if not user.active or not user.confirmed:
             raise credentials_exception
-        return user
+        context = AuthContext(token=token, payload=payload, user=user)
+        request.state.auth = context
+        return context
+
+    async def get_current_user(
+        self,
+        request: Request,
+        token: str = Depends(oauth2_scheme),
+        db: AsyncSession = Depends(get_db),
+    ) -> CachedUser:
+        context = await self.get_auth_context(request, token, db)
+        return context.user
+
+    @staticmethod
+    def token_key(token: str, payload: dict) -> str:
+        """
+        Key of token in black list: jti claim, or hash for tokens issued without jti.
+        """
+        return payload.get("jti") or hashlib.sha256(token.encode()).hexdigest()
+
+    async def is_token_revoked(self, token: str, payload: Optional[dict] = None) -> bool:
+        if payload is None:
+            try:
+                payload = jwt.decode(
+                    token, self.SECRET_KEY, algorithms=[self.ALGORITHM]
+                )
+            except JWTError:
+                return False
+        return await repository_logout.check_token(
+            self.token_key(token, payload), self.r
+        )
+
+    async def revoke_token(self, token: str) -> bool:
+        """
+        Add token to black list until it expires.
+        Returns False for invalid, expired or already revoked token.
+        """
+        try:
+            payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
+        except JWTError:
+            return False
+        token_key = self.token_key(token, payload)
+        if await repository_logout.check_token(token_key, self.r):
+            return False
+        ttl = int(payload["exp"] - time.time())
+        return await repository_logout.add_token(token_key, ttl, self.r)
+
+    async def migrate_banned_tokens(self, db: AsyncSession) -> int:
+        """
+        One-time move of tokens from legacy SQL table bannedlist to Redis.
+        Rows are deleted after move, so next call does nothing.
+        """
+        tokens = await repository_logout.get_tokens(db)
+        moved = 0
+        for token in tokens:
+            moved += await self.revoke_token(token)
+        await repository_logout.delete_tokens(db, tokens)
+        return moved
 
     def create_email_token(self, data: dict):
         to_encode = data.copy()
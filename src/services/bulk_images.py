@@ -0,0 +1,157 @@
+# pixels_project\src\services\bulk_images.py
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Sequence
+
+from redis.asyncio import Redis
+from sqlalchemy import Select, case, column, select, update, values as sql_values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import Image, Tag
+from src.services.cloudinary_srv import CloudinaryClient, CloudinaryError
+from src.services.image_jobs import qr_url, transformed_url
+from src.services.jobs import JobFailed
+from src.services.storage import StorageBackend
+
+# columns written by each operation, url_transformed of qr_transformed may be a new transformation
+COLUMNS = {
+    "transform": ("url_transformed",),
+    "qr_original": ("url_original_qr",),
+    "qr_transformed": ("url_transformed", "url_transformed_qr"),
+}
+
+
+def retryable(error: Exception) -> bool:
+    """
+    Чи може повтор вдатися: так - мережа, сховище, Redis;
+    ні - поганий вихідний файл, невірні параметри, 4xx Cloudinary
+    """
+    if isinstance(error, (JobFailed, ValueError)):
+        return False
+    if isinstance(error, CloudinaryError) and error.status is not None:
+        return error.status in CloudinaryClient.RETRY_STATUSES or error.status >= 500
+    return True
+
+
+async def update_images(db: AsyncSession, values: Sequence[dict]) -> None:
+    """
+    Нові url світлин одним UPDATE: PostgreSQL - FROM (VALUES ...),
+    інші бази - CASE id WHEN ... для кожної колонки.
+    У всіх словниках values - id і ті самі колонки.
+    """
+    columns = [name for name in values[0] if name != "id"]
+    if db.get_bind().dialect.name == "postgresql":
+        rows = sql_values(
+            column("id", Image.id.type), *(column(name, getattr(Image, name).type) for name in columns), name="v"
+        ).data([tuple(item[name] for name in ("id", *columns)) for item in values])
+        stmt = update(Image).where(Image.id == rows.c.id).values({name: rows.c[name] for name in columns})
+    else:
+        stmt = (
+            update(Image)
+            .where(Image.id.in_([item["id"] for item in values]))
+            .values({name: case({item["id"]: item[name] for item in values}, value=Image.id) for name in columns})
+        )
+    await db.execute(stmt, execution_options={"synchronize_session": False})
+
+
+def select_images(
+    owner_id: int | None = None,
+    tag: str | None = None,
+    created_from: datetime | None = None,
+    created_to: datetime | None = None,
+) -> Select:
+    """
+    Світлини за власником, тегом і датою створення, лише колонки з url
+    """
+    stmt = select(
+        Image.id, Image.url_original, Image.url_transformed, Image.url_original_qr, Image.url_transformed_qr
+    )
+    if owner_id is not None:
+        stmt = stmt.where(Image.owner_id == owner_id)
+    if tag:
+        stmt = stmt.where(Image.tags.any(Tag.name == tag))
+    if created_from is not None:
+        stmt = stmt.where(Image.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(Image.created_at <= created_to)
+    return stmt
+
+
+@dataclass
+class BulkGenerator:
+    """
+    Transformations and QR codes for many images: keyset batches by id,
+    at most `concurrency` images rendered at once, one UPDATE per batch.
+    """
+    storage: StorageBackend
+    r: Redis
+    operations: Sequence[str]
+    transformation: dict
+    batch_size: int = 100
+    concurrency: int = 8
+    columns: tuple = field(init=False)
+
+    def __post_init__(self):
+        self.columns = tuple(dict.fromkeys(c for op in self.operations for c in COLUMNS[op]))
+
+    async def process(self, row) -> dict:
+        """
+        Нові url світлини для UPDATE: id і всі колонки операцій
+        """
+        values = dict(row._mapping)
+        if "transform" in self.operations or (
+            "qr_transformed" in self.operations and not values["url_transformed"]
+        ):
+            values["url_transformed"] = await transformed_url(
+                self.storage, values["url_original"], self.transformation
+            )
+        if "qr_original" in self.operations:
+            values["url_original_qr"] = await qr_url(self.storage, self.r, values["url_original"], "original")
+        if "qr_transformed" in self.operations:
+            values["url_transformed_qr"] = await qr_url(
+                self.storage, self.r, values["url_transformed"], "transformed"
+            )
+        return {"id": values["id"], **{c: values[c] for c in self.columns}}
+
+    async def batch(self, rows) -> tuple[list[dict], list[dict]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(row):
+            async with semaphore:
+                return await self.process(row)
+
+        results = await asyncio.gather(*(bounded(row) for row in rows), return_exceptions=True)
+        values, failed = [], []
+        for row, result in zip(rows, results):
+            if isinstance(result, Exception):
+                logging.warning(f"Bulk generation of image {row.id} failed: {result}")
+                failed.append({"id": row.id, "error": str(result), "retry": retryable(result)})
+            else:
+                values.append(result)
+        return values, failed
+
+    async def run(self, db: AsyncSession, stmt: Select) -> AsyncIterator[dict]:
+        """
+        Обробляє світлини пакетами, після кожного пакета - стан обробки
+        """
+        last_id, number = 0, 0
+        total = {"processed": 0, "updated": 0, "failed": 0}
+        while True:
+            rows = (
+                await db.execute(stmt.where(Image.id > last_id).order_by(Image.id).limit(self.batch_size))
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            number += 1
+            values, failed = await self.batch(rows)
+            if values:
+                await update_images(db, values)
+                await db.commit()
+            total["processed"] += len(rows)
+            total["updated"] += len(values)
+            total["failed"] += len(failed)
+            yield {"batch": number, "last_id": last_id, "updated": len(values), "failed": failed, **total}
+        yield {"done": True, "batches": number, **total}
@@ -1,19 +1,8 @@
 import hashlib
 
-import cloudinary
-import cloudinary.uploader
-
 from fastapi import UploadFile
 
-from src.conf.config import settings
-
-
-cloudinary.config(
-    cloud_name=settings.cloudinary_name,
-    api_key=settings.cloudinary_api_key,
-    api_secret=settings.cloudinary_api_secret,
-    secure=True,
-)
+from src.services.storage import StorageBackend, get_storage
 
 app_name = "PixelApp"
 
@@ -24,12 +13,10 @@ def build_public_id(email: str) -> str:
     return public_id
 
 
-def build_avatar_cloudinary_url(file: UploadFile, email: str) -> str:
-    public_id = build_public_id(email)
-    r = cloudinary.uploader.upload(
-        file.file, public_id=public_id, overwrite=True
-    )
-    src_url = cloudinary.CloudinaryImage(public_id).build_url(
-        width=250, height=250, crop="fill", version=r.get("version")
-    )
-    return src_url
+async def build_avatar_cloudinary_url(
+    file: UploadFile, email: str, storage: StorageBackend | None = None
+) -> str:
+    storage = storage or get_storage()
+    stored = await storage.put(file, key=build_public_id(email))
+    avatar = await storage.transform(stored, width=250, height=250, crop="fill")
+    return avatar.url
@@ -1,36 +1,219 @@
 import hashlib
+import json
 import logging
 import asyncio
+import random
+from typing import Callable
+
 import aiohttp
 import cloudinary
 import cloudinary.uploader
-from cloudinary.uploader import upload
+import cloudinary.utils
 from fastapi import HTTPException, APIRouter
 from concurrent.futures import ThreadPoolExecutor
 
 
 from src.conf.config import settings
+from src.services.uploads import AsyncFile, UploadTooLarge, iter_upload
 
 cloud_router = APIRouter(prefix='/cloudinary')
 
+# єдине налаштування SDK (url доставки, підписи) для всього застосунку
+cloudinary.config(
+    cloud_name=settings.cloudinary_name,
+    api_key=settings.cloudinary_api_key,
+    api_secret=settings.cloudinary_api_secret,
+    secure=True,
+)
+
 # пул потоків
 thread_pool_executor = ThreadPoolExecutor()
 
-class CloudinaryService:
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True,
-    )
 
+class CloudinaryError(Exception):
+    """
+    Помилка Upload API Cloudinary (status - HTTP статус, None - мережа або таймаут)
+    """
+
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message)
+        self.status = status
+
+
+class CloudinaryClient:
+    """
+    Асинхронний клієнт Upload API Cloudinary.
+
+    Одна aiohttp.ClientSession з пулом з'єднань на воркер, підписані запити
+    (параметри і підпис як у cloudinary.uploader), таймаути, повтори з
+    експоненційною затримкою і випадковим розкидом (мережа, 408, 429, 5xx),
+    не більше concurrency одночасних завантажень. Файли передаються
+    частинами, більші за max_size обриваються з 413.
+    """
+
+    RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+    def __init__(
+        self,
+        cloud_name: str,
+        api_key: str,
+        api_secret: str,
+        timeout: float = 60,
+        connect_timeout: float = 10,
+        retries: int = 3,
+        backoff: float = 0.5,
+        concurrency: int = 8,
+        max_size: int = settings.upload_max_size,
+        upload_prefix: str | None = None,
+    ):
+        self.cloud_name = cloud_name
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.concurrency = concurrency
+        self.max_size = max_size
+        self.upload_prefix = upload_prefix
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._session: aiohttp.ClientSession | None = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=self.timeout,
+                connector=aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def signed_params(self, **options) -> dict:
+        """
+        Параметри завантаження з timestamp, api_key і signature
+        """
+        params = cloudinary.utils.cleanup_params(cloudinary.utils.build_upload_params(**options))
+        return cloudinary.utils.sign_request(
+            params, {"api_key": self.api_key, "api_secret": self.api_secret}
+        )
+
+    def _form(self, file: bytes | str | AsyncFile | None, params: dict) -> aiohttp.FormData:
+        form = aiohttp.FormData()
+        for key, value in params.items():
+            for item in value if isinstance(value, list) else [value]:
+                form.add_field(f"{key}[]" if isinstance(value, list) else key, str(item))
+        if file is None:
+            pass
+        elif isinstance(file, str):
+            # remote URL, Cloudinary fetches it
+            form.add_field("file", file)
+        elif hasattr(file, "read"):
+            # streamed in chunks (chunked transfer encoding), from the start on every attempt
+            form.add_field(
+                "file",
+                iter_upload(file, max_size=self.max_size),
+                filename=getattr(file, "filename", None) or "file",
+                content_type="application/octet-stream",
+            )
+        else:
+            form.add_field("file", file, filename="file", content_type="application/octet-stream")
+        return form
+
+    async def _call(self, action: str, resource_type: str, form: Callable[[], aiohttp.FormData]) -> dict:
+        """
+        Підписаний POST до Upload API з повторами, form будує тіло для кожної спроби
+        """
+        url = cloudinary.utils.cloudinary_api_url(
+            action,
+            cloud_name=self.cloud_name,
+            resource_type=resource_type,
+            upload_prefix=self.upload_prefix,
+        )
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                try:
+                    async with self.session.post(url, data=form()) as response:
+                        body = await response.text()
+                    try:
+                        result = json.loads(body)
+                    except ValueError:
+                        result = {"error": {"message": body[:200]}}
+                    if response.status < 400 and "error" not in result:
+                        return result
+                    error = CloudinaryError(
+                        result.get("error", {}).get("message", f"HTTP {response.status}"),
+                        response.status,
+                    )
+                    if response.status not in self.RETRY_STATUSES:
+                        raise error
+                except UploadTooLarge:
+                    raise
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = CloudinaryError(str(e) or type(e).__name__)
+                if attempt < self.retries:
+                    delay = self.backoff * 2**attempt * random.uniform(0.5, 1.5)
+                    logging.warning(f"Cloudinary {action} failed ({error}), retry in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+        raise error
+
+    async def upload(
+        self, file: bytes | str | AsyncFile, resource_type: str = "image", **options
+    ) -> dict:
+        """
+        Завантажує файл (байти, URL або UploadFile - частинами, без читання
+        в пам'ять) на Cloudinary, повертає відповідь API (secure_url, public_id, version, ...)
+        """
+        params = self.signed_params(**options)
+        return await self._call("upload", resource_type, lambda: self._form(file, params))
+
+    async def destroy(self, public_id: str, resource_type: str = "image") -> dict:
+        """
+        Видаляє файл з Cloudinary і з кешу CDN
+        """
+        params = cloudinary.utils.sign_request(
+            {"public_id": public_id, "invalidate": True, "timestamp": cloudinary.utils.now()},
+            {"api_key": self.api_key, "api_secret": self.api_secret},
+        )
+        return await self._call("destroy", resource_type, lambda: self._form(None, params))
+
+    async def download(self, url: str) -> bytes:
+        """
+        Файл за URL доставки
+        """
+        async with self._semaphore:
+            try:
+                async with self.session.get(url) as response:
+                    if response.status >= 400:
+                        raise CloudinaryError(f"HTTP {response.status}", response.status)
+                    return await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise CloudinaryError(str(e) or type(e).__name__)
+
+
+cloudinary_client = CloudinaryClient(
+    cloud_name=settings.cloudinary_name,
+    api_key=settings.cloudinary_api_key,
+    api_secret=settings.cloudinary_api_secret,
+    timeout=settings.cloudinary_timeout,
+    connect_timeout=settings.cloudinary_connect_timeout,
+    retries=settings.cloudinary_retries,
+    backoff=settings.cloudinary_backoff,
+    concurrency=settings.cloudinary_concurrency,
+    max_size=settings.upload_max_size,
+)
+
+class CloudinaryService:
 
     @staticmethod
     @cloud_router.post("/transform-image")
     async def transform_image(image: bytes):
-        original_image = await cloudinary.uploader.upload(image)
+        original_image = await cloudinary_client.upload(image)
 
-        transformed_image = await cloudinary.uploader.upload(
+        transformed_image = await cloudinary_client.upload(
             original_image["url"],
             width=100,
             height=50,
@@ -49,7 +232,7 @@ class CloudinaryService:
     @classmethod
     async def upload_and_transform_image_async(cls, image_url, transformation_params):
         try:
-            result = await upload(
+            result = await cloudinary_client.upload(
                 image_url,
                 transformation=transformation_params
             )
@@ -73,14 +256,10 @@ class CloudinaryService:
     @staticmethod
     async def upload_async(file_content, public_id: str, folder="publication"):
         try:
-            async with aiohttp.ClientSession() as session:
-                # Відправка файлу на сервер Cloudinary
-                async with session.post(
-                    f"https://api.cloudinary.com/v1_1/{settings.cloudinary_name}/upload",
-                    data={"file": file_content, "public_id": public_id, "overwrite": "true"},
-                ) as response:
-                    return await response.json()
-        except Exception as e:
+            return await cloudinary_client.upload(
+                file_content, public_id=public_id, folder=folder, overwrite=True
+            )
+        except CloudinaryError as e:
             logging.error(f"Error uploading file to Cloudinary: {e}")
             raise
 
@@ -95,7 +274,7 @@ class CloudinaryService:
 
 
     @staticmethod
-    def upload_image(image_data: bytes, public_id: str):
+    async def upload_image(image_data: bytes, public_id: str):
         """
         Завантажує зображення на Cloudinary.
 
@@ -106,7 +285,7 @@ class CloudinaryService:
         Returns:
             Відповідь від Cloudinary.
         """
-        return cloudinary.uploader.upload(
+        return await cloudinary_client.upload(
             image_data,
             public_id=public_id,
             overwrite=True,
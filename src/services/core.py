@@ -1,7 +1,8 @@
 # pixels_project\src\services\core.py
 from typing import Any, Generic, TypeVar, Type, Optional, Union
 
-from sqlalchemy.orm import Session
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 
@@ -17,48 +18,58 @@ class BaseServices(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         self.model = model
 
 
-    async def get_all_p(self, db: Session, *, skip: int = 0, limit: int = 100) -> list[ModelType]:
-        return db.query(self.model).offset(skip).limit(limit).all()
+    def select_p(self) -> Select:
+        """
+        Base SELECT of model, override to add loader options (eager loading etc.)
+        """
+        return select(self.model)
 
 
-    async def get_p(self, db: Session, id: int) -> Optional[ModelType]:
-        return db.query(self.model).filter(self.model.id == id).first()
+    async def get_all_p(self, db: AsyncSession, *, skip: int = 0, limit: int = 100) -> list[ModelType]:
+        result = await db.scalars(self.select_p().offset(skip).limit(limit))
+        return list(result.all())
 
 
-    async def get_p_owner_id(self, db: Session, id: int, owner_id: int) -> Optional[ModelType]:
-        return db.query(self.model).filter(self.model.owner_id == owner_id, self.model.id == id).first()
+    async def get_p(self, db: AsyncSession, id: int) -> Optional[ModelType]:
+        return await db.scalar(self.select_p().where(self.model.id == id))
 
 
-    async def get_p_url(db: Session, id: int = None, url_original: str = None) -> Image:
+    async def get_p_owner_id(self, db: AsyncSession, id: int, owner_id: int) -> Optional[ModelType]:
+        return await db.scalar(
+            self.select_p().where(self.model.owner_id == owner_id, self.model.id == id)
+        )
+
+
+    async def get_p_url(db: AsyncSession, id: int = None, url_original: str = None) -> Image:
         if id is not None:
-            return db.query(Image).filter(Image.id == id).first()
+            return await db.scalar(select(Image).where(Image.id == id))
         elif url_original is not None:
-            return db.query(Image).filter(Image.url_original == url_original).first()
+            return await db.scalar(select(Image).where(Image.url_original == url_original))
         else:
             return None
 
 
 
-    async def create_p(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
+    async def create_p(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
         obj_in_data = jsonable_encoder(obj_in)
         db_obj = self.model(**obj_in_data)  # type: ignore
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
         return db_obj
 
 
-    async def create(self, db: Session, obj_in: CreateSchemaType) -> ModelType:
+    async def create(self, db: AsyncSession, obj_in: CreateSchemaType) -> ModelType:
         obj_in_data = jsonable_encoder(obj_in)
         db_obj = self.model(**obj_in_data)
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
         return db_obj
 
     async def update_p(
         self,
-        db: Session,
+        db: AsyncSession,
         *,
         db_obj: ModelType,
         obj_in: Union[UpdateSchemaType, dict[str, Any]],
@@ -72,13 +83,13 @@ class BaseServices(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
         db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+        await db.commit()
+        await db.refresh(db_obj)
         return db_obj
 
 
-    async def remove_p(self, db: Session, *, id: int) -> ModelType:
-        obj = db.query(self.model).get(id)
-        db.delete(obj)
-        db.commit()
-        return obj
\ No newline at end of file
+    async def remove_p(self, db: AsyncSession, *, id: int) -> ModelType:
+        obj = await db.get(self.model, id)
+        await db.delete(obj)
+        await db.commit()
+        return obj
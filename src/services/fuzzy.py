@@ -0,0 +1,301 @@
+# pixels_project\src\services\fuzzy.py
+import asyncio
+import heapq
+import logging
+import math
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Literal, Set, Tuple
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import Select, case, event, func, inspect, literal, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session, object_session, raiseload, selectinload
+
+from src.conf.config import settings
+from src.database.models import Image, User
+
+Field = Literal["description", "username"]
+
+WORD = re.compile(r"[^\W_]+")
+# users with similar name, their posts are returned
+MAX_USERS = 100
+
+
+def trigrams(value: str | None) -> Set[str]:
+    """
+    Триграми слів як у pg_trgm: слово доповнене двома пробілами на початку
+    і одним у кінці
+    """
+    grams: Set[str] = set()
+    for word in WORD.findall((value or "").lower()):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """
+    Інвертований індекс триграм у пам'яті: триграма -> id рядків.
+
+    Схожість - частка триграм запиту, які є в тексті (верхня межа
+    word_similarity з pg_trgm), тож підрядок тексту має схожість 1.
+    """
+
+    __slots__ = ("postings", "values")
+
+    def __init__(self):
+        self.postings: Dict[str, Set[int]] = defaultdict(set)
+        self.values: Dict[int, str | None] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.values)
+
+    def add(self, id: int, value: str | None) -> None:
+        """
+        Рядок з текстом value, попередній текст рядка id замінюється
+        """
+        if id in self.values:
+            self.remove(id)
+        for gram in trigrams(value):
+            self.postings[gram].add(id)
+        self.values[id] = value
+
+    def remove(self, id: int) -> None:
+        if id not in self.values:
+            return
+        for gram in trigrams(self.values.pop(id)):
+            posting = self.postings.get(gram)
+            if posting is not None:
+                posting.discard(id)
+                if not posting:
+                    del self.postings[gram]
+
+    def search(self, query: str, threshold: float, limit: int) -> List[Tuple[int, float]]:
+        """
+        До limit пар (id, схожість) зі схожістю не менше threshold, найкращі спочатку
+        """
+        grams = sorted(trigrams(query), key=lambda g: len(self.postings.get(g, ())))
+        if not grams:
+            return []
+        need = max(1, math.ceil(threshold * len(grams) - 1e-9))
+        # a row with `need` common trigrams has at least one of the rarest len - need + 1
+        candidates = set().union(*(self.postings.get(g, ()) for g in grams[: len(grams) - need + 1]))
+        postings = [self.postings.get(g, ()) for g in grams]
+        scored = []
+        for id in candidates:
+            score = sum(id in posting for posting in postings) / len(grams)
+            if score >= threshold:
+                scored.append((score, id))
+        return [(id, score) for score, id in heapq.nlargest(limit, scored)]
+
+
+def build_index(rows) -> TrigramIndex:
+    index = TrigramIndex()
+    for id, value in rows:
+        index.add(id, value)
+    return index
+
+
+@dataclass
+class IndexState:
+    index: TrigramIndex | None = None
+    built_at: float = 0.0
+    rebuild: asyncio.Task | None = None
+    # changes committed while a rebuild reads the table, applied to the new index too
+    replay: List[Tuple[int, str | None]] | None = None
+
+
+class FuzzySearch:
+    """
+    Нечіткий пошук світлин за описом або за іменем автора.
+
+    PostgreSQL - pg_trgm (word_similarity, оператор <% з GIN індексом),
+    інші бази - TrigramIndex у пам'яті воркера. Зміни описів та імен через
+    ORM цього воркера вносяться в індекс після коміту; зміни інших воркерів -
+    перебудовою через ttl секунд (фонова задача run_refresh, або перший пошук
+    після ttl). Перебудова (триграми) - у потоці, до її кінця пошук іде за
+    старим індексом.
+    """
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._indexes: WeakKeyDictionary = WeakKeyDictionary()
+
+    def invalidate(self) -> None:
+        """
+        Наступний пошук перебудує індекси (старі діють до кінця перебудови)
+        """
+        for states in list(self._indexes.values()):
+            for state in states.values():
+                state.built_at = 0.0
+
+    def apply(self, field: Field, changes: List[Tuple[int, str | None]]) -> None:
+        """
+        Закомічені зміни: (id, текст), None - рядок видалено.
+        У процесі одна база, тож зміни вносяться в індекси всіх рушіїв.
+        """
+        for states in list(self._indexes.values()):
+            state = states.get(field)
+            if state is None:
+                continue
+            if state.replay is not None:
+                state.replay.extend(changes)
+            if state.index is not None:
+                apply_changes(state.index, changes)
+
+    def refresh(self) -> List[asyncio.Task]:
+        """
+        Починає перебудову застарілих індексів, повертає задачі перебудови
+        """
+        tasks = []
+        for engine, states in list(self._indexes.items()):
+            for field, state in states.items():
+                if state.rebuild is None and time.monotonic() - state.built_at > self.ttl:
+                    state.rebuild = asyncio.create_task(self._rebuild(engine, field, state))
+                    tasks.append(state.rebuild)
+        return tasks
+
+    async def run_refresh(self, interval: float) -> None:
+        """
+        Періодична перебудова індексів, запускається фоновою задачею
+        """
+        while True:
+            await asyncio.sleep(interval)
+            self.refresh()
+
+    async def _rebuild(self, engine: Engine, field: Field, state: IndexState) -> None:
+        state.replay = []
+        try:
+            column = Image.description if field == "description" else User.username
+            # own session: the rebuild may outlive the request which started it
+            async with AsyncSession(AsyncEngine(engine)) as session:
+                rows = (await session.execute(select(column.class_.id, column))).all()
+            index = await asyncio.to_thread(build_index, rows)
+            apply_changes(index, state.replay)
+            state.index, state.built_at = index, time.monotonic()
+        except Exception as e:
+            # the old index is served, the next search tries again
+            logging.warning(f"Fuzzy index of {field} was not rebuilt: {e}")
+            if state.index is None:
+                raise
+        finally:
+            state.replay = None
+            state.rebuild = None
+
+    @staticmethod
+    def select_images() -> Select:
+        return select(Image).options(selectinload(Image.tags), raiseload("*"))
+
+    async def _postgresql(
+        self, db: AsyncSession, query: str, field: Field, threshold: float, limit: int
+    ) -> List[Tuple[Image, float]]:
+        await db.execute(
+            select(func.set_config("pg_trgm.word_similarity_threshold", str(threshold), True))
+        )
+        column = Image.description if field == "description" else User.username
+        similarity = func.word_similarity(query, column)
+        stmt = self.select_images().add_columns(similarity.label("similarity"))
+        if field == "username":
+            stmt = stmt.join(User, User.id == Image.owner_id)
+        stmt = (
+            stmt.where(literal(query).op("<%")(column))
+            .order_by(similarity.desc(), Image.id.desc())
+            .limit(limit)
+        )
+        result = await db.execute(stmt)
+        return [(image, float(score)) for image, score in result.all()]
+
+    async def _index(self, db: AsyncSession, field: Field) -> TrigramIndex:
+        engine: Engine = db.get_bind()
+        state = self._indexes.setdefault(engine, {}).setdefault(field, IndexState())
+        if state.rebuild is None and time.monotonic() - state.built_at > self.ttl:
+            state.rebuild = asyncio.create_task(self._rebuild(engine, field, state))
+        if state.index is None:
+            # the first search waits, the loop serves other requests meanwhile
+            await asyncio.shield(state.rebuild)
+        return state.index
+
+    async def _memory(
+        self, db: AsyncSession, query: str, field: Field, threshold: float, limit: int
+    ) -> List[Tuple[Image, float]]:
+        index = await self._index(db, field)
+        hits = dict(index.search(query, threshold, limit if field == "description" else MAX_USERS))
+        if not hits:
+            return []
+        key = Image.id if field == "description" else Image.owner_id
+        similarity = case(hits, value=key)
+        result = await db.execute(
+            self.select_images()
+            .add_columns(similarity.label("similarity"))
+            .where(key.in_(hits))
+            .order_by(similarity.desc(), Image.id.desc())
+            .limit(limit)
+        )
+        return [(image, float(score)) for image, score in result.all()]
+
+    async def search(
+        self,
+        db: AsyncSession,
+        query: str,
+        field: Field = "description",
+        threshold: float = 0.3,
+        limit: int = 10,
+    ) -> List[Tuple[Image, float]]:
+        """
+        Світлини зі схожістю (0..1) опису або імені автора до запиту, найкращі спочатку
+        """
+        if not trigrams(query):
+            return []
+        if db.get_bind().dialect.name == "postgresql":
+            return await self._postgresql(db, query, field, threshold, limit)
+        return await self._memory(db, query, field, threshold, limit)
+
+
+fuzzy_search = FuzzySearch(ttl=settings.fuzzy_index_ttl)
+
+CHANGES = "fuzzy_changes"
+
+
+def apply_changes(index: TrigramIndex, changes: List[Tuple[int, str | None]]) -> None:
+    for id, value in changes:
+        if value is None:
+            index.remove(id)
+        else:
+            index.add(id, value)
+
+
+def _record(field: Field, attribute: str, deleted: bool = False):
+    def listener(mapper, connection, target) -> None:
+        if not deleted and not inspect(target).attrs[attribute].history.has_changes():
+            return
+        # NULL text has no trigrams, the row is as good as removed
+        value = None if deleted else getattr(target, attribute)
+        session = object_session(target)
+        if session is None:
+            fuzzy_search.apply(field, [(target.id, value)])
+        else:
+            session.info.setdefault(CHANGES, {}).setdefault(field, []).append((target.id, value))
+
+    return listener
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session: Session) -> None:
+    for field, changes in session.info.pop(CHANGES, {}).items():
+        fuzzy_search.apply(field, changes)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_rolled_back(session: Session, previous_transaction) -> None:
+    session.info.pop(CHANGES, None)
+
+
+for model, field, attribute in ((Image, "description", "description"), (User, "username", "username")):
+    event.listen(model, "after_insert", _record(field, attribute))
+    event.listen(model, "after_update", _record(field, attribute))
+    event.listen(model, "after_delete", _record(field, attribute, deleted=True))
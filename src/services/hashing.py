@@ -0,0 +1,105 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+from src.conf.config import settings
+
+
+class HasherBusy(Exception):
+    """All workers are busy and the queue is full, caller should retry later."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a bounded thread pool, out of the event loop.
+
+    bcrypt releases the GIL, so threads hash in parallel without the cost
+    of a process pool. At most workers + queue_size calls are accepted,
+    the next one fails at once with HasherBusy.
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = 4, queue_size: int = 32) -> None:
+        # hashes with other cost are reported by needs_update / verify_and_update
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        self.workers = workers
+        self.limit = workers + queue_size
+        self._executor: ThreadPoolExecutor | None = None
+        self.in_flight = 0
+        self.rejected = 0
+        self.calls = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hash_total = 0.0
+        self.hash_max = 0.0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="bcrypt"
+            )
+        return self._executor
+
+    @staticmethod
+    def _timed(submitted: float, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        return result, started - submitted, time.perf_counter() - started
+
+    async def _run(self, func, *args):
+        if self.in_flight >= self.limit:
+            self.rejected += 1
+            raise HasherBusy()
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, wait, spent = await loop.run_in_executor(
+                self.executor, self._timed, time.perf_counter(), func, *args
+            )
+        finally:
+            self.in_flight -= 1
+        self.calls += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.hash_total += spent
+        self.hash_max = max(self.hash_max, spent)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(self.context.verify, password, hashed)
+
+    async def verify_and_update(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        """
+        Verify password, second item is a new hash when hashed uses old cost parameters.
+        """
+        return await self._run(self.context.verify_and_update, password, hashed)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "calls": self.calls,
+            "wait_avg_ms": round(self.wait_total / self.calls * 1000, 3) if self.calls else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "hash_avg_ms": round(self.hash_total / self.calls * 1000, 3) if self.calls else 0.0,
+            "hash_max_ms": round(self.hash_max * 1000, 3),
+        }
+
+
+password_hasher = PasswordHasher(
+    rounds=settings.bcrypt_rounds,
+    workers=settings.bcrypt_workers,
+    queue_size=settings.bcrypt_queue_size,
+)
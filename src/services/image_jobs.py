@@ -0,0 +1,101 @@
+# pixels_project\src\services\image_jobs.py
+from redis.asyncio import Redis
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import Image
+from src.services.jobs import JobContext, JobFailed, job_queue
+from src.services.qr import QRSpec, qr_renderer
+from src.services.storage import StorageBackend, StoredFile
+
+# angle of the transformation made for a QR code of a post without one
+DEFAULT_TRANSFORMATION = {"angle": 45}
+
+QR_COLORS = {
+    "original": {},
+    "transformed": {"fill": "navy", "back": "lightyellow"},
+}
+
+
+async def transformed_url(storage: StorageBackend, url_original: str, transformation: dict) -> str:
+    """
+    Трансформує оригінал у сховищі, повертає url результату
+    """
+    key = storage.key_from_url(url_original)
+    if key is None:
+        raise JobFailed(f"{url_original} is not a file of the storage")
+    try:
+        transformed = await storage.transform(StoredFile(key, url_original), **transformation)
+    except ValueError as e:
+        raise JobFailed(str(e))
+    return transformed.url
+
+
+async def qr_url(storage: StorageBackend, r: Redis, url: str, source: str) -> str:
+    """
+    Зберігає в сховищі QR-код url оригіналу або трансформованої світлини
+    """
+    public_id = url.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+    suffix = "_qr_code_transformed" if source == "transformed" else "_qr_code"
+    png = await qr_renderer.image(QRSpec(url, **QR_COLORS[source]), r)
+    stored = await storage.put(png, key=f"qr_codes/{public_id}{suffix}", folder="qr_codes", format="png")
+    return stored.url
+
+
+async def transform_image(
+    db: AsyncSession, storage: StorageBackend, image: Image, transformation: dict
+) -> str:
+    """
+    Трансформує оригінал світлини, зберігає url_transformed
+    """
+    url = await transformed_url(storage, image.url_original, transformation)
+    if image.url_transformed != url:
+        await db.execute(update(Image).where(Image.id == image.id).values(url_transformed=url))
+        await db.commit()
+        image.url_transformed = url
+    return url
+
+
+async def store_qr(db: AsyncSession, storage: StorageBackend, r: Redis, image: Image, source: str) -> str:
+    """
+    QR-код url оригіналу або трансформованої світлини в сховищі,
+    зберігає url_original_qr або url_transformed_qr
+    """
+    url = await qr_url(storage, r, image.url_transformed if source == "transformed" else image.url_original, source)
+    column = "url_transformed_qr" if source == "transformed" else "url_original_qr"
+    await db.execute(update(Image).where(Image.id == image.id).values({column: url}))
+    await db.commit()
+    return url
+
+
+async def load_image(db: AsyncSession, image_id: int) -> Image:
+    image = await db.get(Image, image_id)
+    if image is None:
+        raise JobFailed(f"image {image_id} not found")
+    return image
+
+
+@job_queue.handler("transform")
+async def transform_job(ctx: JobContext, payload: dict) -> dict:
+    async with ctx.session_factory() as db:
+        image = await load_image(db, payload["image_id"])
+        return {"url_transformed": await transform_image(db, ctx.storage, image, payload["transformation"])}
+
+
+@job_queue.handler("qr_original")
+async def qr_original_job(ctx: JobContext, payload: dict) -> dict:
+    async with ctx.session_factory() as db:
+        image = await load_image(db, payload["image_id"])
+        return {"url_original_qr": await store_qr(db, ctx.storage, ctx.r, image, "original")}
+
+
+@job_queue.handler("qr_transformed")
+async def qr_transformed_job(ctx: JobContext, payload: dict) -> dict:
+    async with ctx.session_factory() as db:
+        image = await load_image(db, payload["image_id"])
+        if not image.url_transformed:
+            await transform_image(db, ctx.storage, image, DEFAULT_TRANSFORMATION)
+        return {
+            "url_transformed": image.url_transformed,
+            "url_transformed_qr": await store_qr(db, ctx.storage, ctx.r, image, "transformed"),
+        }
@@ -0,0 +1,68 @@
+# pixels_project\src\services\imaging.py
+from io import BytesIO
+from typing import Tuple
+
+from PIL import Image as PILImage, ImageOps
+
+# transformation names are the ones of Cloudinary (angle, width, height, crop, effect, format)
+CROPS = ("scale", "fit", "fill", "crop")
+EFFECTS = ("grayscale",)
+FORMATS = {"jpg": "JPEG", "jpeg": "JPEG", "png": "PNG", "webp": "WEBP", "gif": "GIF"}
+
+
+def render(
+    data: bytes,
+    angle: int = 0,
+    width: int | None = None,
+    height: int | None = None,
+    crop: str = "scale",
+    effect: str | None = None,
+    format: str | None = None,
+) -> Tuple[bytes, str]:
+    """
+    Трансформує зображення, повертає байти і розширення файлу.
+
+    crop: scale - точно width x height, fit - вписати зі збереженням пропорцій,
+    fill - заповнити і обрізати по центру, crop - вирізати з центру без масштабу.
+    """
+    if crop not in CROPS:
+        raise ValueError(f"crop must be one of {CROPS}")
+    if effect is not None and effect not in EFFECTS:
+        raise ValueError(f"effect must be one of {EFFECTS}")
+    with PILImage.open(BytesIO(data)) as source:
+        ext = (format or (source.format or "png")).lower()
+        if ext not in FORMATS:
+            raise ValueError(f"format must be one of {tuple(FORMATS)}")
+        image = ImageOps.exif_transpose(source)
+        if angle % 360:
+            # clockwise as in Cloudinary
+            image = image.rotate(-angle, expand=True)
+        if width or height:
+            size = (
+                width or round(image.width * height / image.height),
+                height or round(image.height * width / image.width),
+            )
+            if crop == "scale":
+                image = image.resize(size)
+            elif crop == "fit":
+                image = ImageOps.contain(image, size)
+            elif crop == "fill":
+                image = ImageOps.fit(image, size)
+            else:
+                left, top = (image.width - size[0]) // 2, (image.height - size[1]) // 2
+                image = image.crop((max(left, 0), max(top, 0), left + size[0], top + size[1]))
+        if effect == "grayscale":
+            image = ImageOps.grayscale(image)
+        if FORMATS[ext] == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        out = BytesIO()
+        image.save(out, format=FORMATS[ext])
+    return out.getvalue(), "jpg" if ext == "jpeg" else ext
+
+
+def render_file(path: str, **transformation) -> Tuple[bytes, str]:
+    """
+    render для файлу: у процес пулу передається шлях, а не байти зображення
+    """
+    with open(path, "rb") as f:
+        return render(f.read(), **transformation)
@@ -0,0 +1,309 @@
+# pixels_project\src\services\jobs.py
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, WatchError
+
+from src.conf.config import settings
+
+JOB_PREFIX = "job:"
+QUEUE = "jobs:queue"
+# job ids waiting for a retry, score - time of the retry
+DELAYED = "jobs:delayed"
+# ids taken by a worker and not finished yet, one list per worker name
+PROCESSING_PREFIX = "jobs:processing:"
+
+QUEUED, RUNNING, RETRYING, DONE, FAILED = "queued", "running", "retrying", "done", "failed"
+
+
+class JobFailed(Exception):
+    """Permanent failure of a job, it is not retried."""
+
+
+class IdempotencyConflict(Exception):
+    """Idempotency key was used with another payload."""
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    payload: dict
+    status: str = QUEUED
+    attempts: int = 0
+    result: dict | None = None
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def payload_hash(self) -> str:
+        return payload_hash(self.kind, self.payload)
+
+    def to_redis(self) -> dict[str, str]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "payload": json.dumps(self.payload, sort_keys=True),
+            "payload_hash": self.payload_hash,
+            "status": self.status,
+            "attempts": str(self.attempts),
+            "result": json.dumps(self.result),
+            "error": self.error or "",
+            "created_at": repr(self.created_at),
+            "updated_at": repr(self.updated_at),
+        }
+
+    @classmethod
+    def from_redis(cls, data: dict) -> "Job | None":
+        data = {
+            (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+            for k, v in data.items()
+        }
+        if "kind" not in data:
+            return None
+        return cls(
+            id=data["id"],
+            kind=data["kind"],
+            payload=json.loads(data["payload"]),
+            status=data["status"],
+            attempts=int(data["attempts"]),
+            result=json.loads(data["result"]),
+            error=data["error"] or None,
+            created_at=float(data["created_at"]),
+            updated_at=float(data["updated_at"]),
+        )
+
+    def json(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "attempts": self.attempts,
+            "result": self.result,
+            "error": self.error,
+            "created_at": datetime.fromtimestamp(self.created_at),
+            "updated_at": datetime.fromtimestamp(self.updated_at),
+        }
+
+
+def payload_hash(kind: str, payload: dict) -> str:
+    raw = json.dumps([kind, payload], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+@dataclass
+class JobContext:
+    """
+    Те, що потрібно обробникам задач: фабрика сесій бази даних, сховище, Redis
+    """
+
+    session_factory: Callable
+    storage: Any
+    r: Redis
+
+
+Handler = Callable[[JobContext, dict], Awaitable[dict]]
+
+
+class JobQueue:
+    """
+    Черга фонових задач у Redis.
+
+    Задача - хеш job:<id>, id - хеш ключа ідемпотентності, тож повторний
+    запит з тим самим ключем (або тими самими даними, якщо ключа немає)
+    повертає ту саму задачу, а не ставить нову. Провалена задача ставиться знову.
+    """
+
+    def __init__(self, max_attempts: int = 5, backoff: float = 2, result_ttl: int = 24 * 3600) -> None:
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.result_ttl = result_ttl
+        self.handlers: dict[str, Handler] = {}
+
+    def handler(self, kind: str) -> Callable[[Handler], Handler]:
+        """
+        Декоратор обробника задач kind
+        """
+
+        def register(func: Handler) -> Handler:
+            self.handlers[kind] = func
+            return func
+
+        return register
+
+    @staticmethod
+    def job_id(kind: str, payload: dict, idempotency_key: str | None = None) -> str:
+        key = f"key:{idempotency_key}" if idempotency_key else f"payload:{payload_hash(kind, payload)}"
+        return hashlib.sha256(f"{kind}:{key}".encode()).hexdigest()[:32]
+
+    async def get(self, r: Redis, job_id: str) -> Job | None:
+        return Job.from_redis(await r.hgetall(f"{JOB_PREFIX}{job_id}"))
+
+    async def save(self, r: Redis, job: Job, **changes) -> Job:
+        for name, value in changes.items():
+            setattr(job, name, value)
+        job.updated_at = time.time()
+        await r.hset(f"{JOB_PREFIX}{job.id}", mapping=job.to_redis())
+        return job
+
+    async def enqueue(
+        self, r: Redis, kind: str, payload: dict, idempotency_key: str | None = None
+    ) -> tuple[Job, bool]:
+        """
+        Ставить задачу в чергу, повертає задачу і True, якщо вона нова
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"unknown job {kind}")
+        job = Job(id=self.job_id(kind, payload, idempotency_key), kind=kind, payload=payload)
+        key = f"{JOB_PREFIX}{job.id}"
+        # the job and its place in the queue are written in one MULTI: a job is never
+        # saved without being queued; a concurrent request for the same id retries the read
+        async with r.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(key)
+                    # a hash without kind is not a job (partial write of an older version)
+                    existing = Job.from_redis(await pipe.hgetall(key))
+                    if existing is not None:
+                        if existing.payload_hash != job.payload_hash:
+                            raise IdempotencyConflict(job.id)
+                        if existing.status != FAILED:
+                            return existing, False
+                        job.created_at = existing.created_at
+                    job.updated_at = time.time()
+                    pipe.multi()
+                    # also drops the ttl of a failed job
+                    pipe.delete(key)
+                    pipe.hset(key, mapping=job.to_redis())
+                    pipe.lpush(QUEUE, job.id)
+                    await pipe.execute()
+                    return job, True
+                except WatchError:
+                    continue
+
+
+class JobWorker:
+    """
+    Виконує задачі черги, concurrency задач одночасно.
+
+    Узята задача лежить у jobs:processing:<name> до завершення, тож після
+    падіння воркер з тим самим ім'ям при старті повертає її в чергу.
+    Помилка - повтор через backoff * 2^(спроба - 1) секунд (з jitter)
+    до max_attempts спроб; JobFailed - одразу failed.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        context: JobContext,
+        name: str = "worker",
+        concurrency: int = 4,
+        poll_timeout: float = 1,
+    ) -> None:
+        self.queue = queue
+        self.context = context
+        self.r = context.r
+        self.name = name
+        self.concurrency = concurrency
+        self.poll_timeout = poll_timeout
+        self.processing = f"{PROCESSING_PREFIX}{name}"
+        self.done = 0
+        self.failed = 0
+        self.retried = 0
+
+    async def recover(self) -> int:
+        """
+        Задачі, не завершені попереднім запуском воркера, - назад у чергу
+        """
+        count = 0
+        while await self.r.lmove(self.processing, QUEUE, "RIGHT", "RIGHT"):
+            count += 1
+        return count
+
+    async def promote_delayed(self) -> None:
+        due = await self.r.zrangebyscore(DELAYED, 0, time.time())
+        for job_id in due:
+            # only the worker which removed it queues it
+            if await self.r.zrem(DELAYED, job_id):
+                await self.r.lpush(QUEUE, job_id)
+
+    async def run_once(self, timeout: float | None = None) -> bool:
+        """
+        Виконує одну задачу, False - черга порожня
+        """
+        await self.promote_delayed()
+        job_id = await self.r.blmove(
+            QUEUE, self.processing, self.poll_timeout if timeout is None else timeout, "RIGHT", "LEFT"
+        )
+        if job_id is None:
+            return False
+        try:
+            await self.process(job_id.decode() if isinstance(job_id, bytes) else job_id)
+        finally:
+            await self.r.lrem(self.processing, 1, job_id)
+        return True
+
+    async def process(self, job_id: str) -> None:
+        queue = self.queue
+        job = await queue.get(self.r, job_id)
+        if job is None or job.status in (DONE, FAILED):
+            return
+        handler = queue.handlers.get(job.kind)
+        await queue.save(self.r, job, status=RUNNING, attempts=job.attempts + 1)
+        try:
+            if handler is None:
+                raise JobFailed(f"unknown job {job.kind}")
+            result = await handler(self.context, job.payload)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if isinstance(e, JobFailed) or job.attempts >= queue.max_attempts:
+                logging.error(f"Job {job.kind} {job.id} failed: {error}")
+                await queue.save(self.r, job, status=FAILED, error=error)
+                await self.r.expire(f"{JOB_PREFIX}{job.id}", queue.result_ttl)
+                self.failed += 1
+                return
+            delay = queue.backoff * 2 ** (job.attempts - 1) * random.uniform(0.5, 1.5)
+            logging.warning(f"Job {job.kind} {job.id} failed ({error}), retry in {delay:.1f}s")
+            await queue.save(self.r, job, status=RETRYING, error=error)
+            await self.r.zadd(DELAYED, {job.id: time.time() + delay})
+            self.retried += 1
+            return
+        await queue.save(self.r, job, status=DONE, result=result, error=None)
+        await self.r.expire(f"{JOB_PREFIX}{job.id}", queue.result_ttl)
+        self.done += 1
+
+    async def _loop(self) -> None:
+        delay = 1
+        while True:
+            try:
+                await self.run_once()
+                delay = 1
+            except RedisError as err:
+                logging.warning(f"Job worker {self.name}: {err}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    async def run(self) -> None:
+        """
+        Виконує задачі, доки його не скасують
+        """
+        recovered = await self.recover()
+        if recovered:
+            logging.info(f"Job worker {self.name}: {recovered} unfinished jobs queued again")
+        await asyncio.gather(*(self._loop() for _ in range(self.concurrency)))
+
+
+job_queue = JobQueue(
+    max_attempts=settings.job_max_attempts,
+    backoff=settings.job_backoff,
+    result_ttl=settings.job_result_ttl,
+)
@@ -0,0 +1,135 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import DateTime, Select, String, literal, tuple_
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.orm import InstrumentedAttribute
+
+from src.conf import messages
+
+# cursor of the next page is sent in this header, body of list endpoints stays a list
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class CursorDateTime(TypeDecorator):
+    """
+    DateTime of cursor compared with the stored value.
+
+    SQLite keeps datetime as text: rows with default=func.now() have no
+    fraction of second, so the value is bound in the same shape there.
+    """
+
+    impl = DateTime
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(String())
+        return dialect.type_descriptor(DateTime())
+
+    def process_bind_param(self, value, dialect):
+        if dialect.name == "sqlite" and isinstance(value, datetime):
+            return value.isoformat(" ", "microseconds" if value.microsecond else "seconds")
+        return value
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Opaque cursor from sort key values of the last row on a page.
+
+    :param values: Values of sort key columns, e.g. created_at and id.
+    :type values: Any
+    :return: Cursor for the next page.
+    :rtype: str
+    """
+    raw = json.dumps(
+        [v.isoformat() if isinstance(v, datetime) else v for v in values],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[InstrumentedAttribute]) -> list:
+    """
+    Values of sort key columns from cursor.
+
+    :param cursor: Cursor made by encode_cursor.
+    :type cursor: str
+    :param columns: Sort key columns, to restore value types.
+    :type columns: Sequence[InstrumentedAttribute]
+    :return: Values in order of columns.
+    :rtype: list
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        return [
+            datetime.fromisoformat(v) if isinstance(c.type, DateTime) else v
+            for c, v in zip(columns, values)
+        ]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=messages.PAGINATION_INVALID_CURSOR,
+        )
+
+
+def keyset(
+    query: Select,
+    columns: Sequence[InstrumentedAttribute],
+    cursor: str | None = None,
+    descending: bool = False,
+) -> Select:
+    """
+    Order query by columns and continue after the row of cursor.
+
+    Unlike OFFSET the database seeks straight to the cursor by index,
+    so a deep page costs the same as the first one.
+
+    :param query: The query.
+    :type query: Select
+    :param columns: Unique sort key, e.g. (created_at, id).
+    :type columns: Sequence[InstrumentedAttribute]
+    :param cursor: Cursor of previous page, None for the first page.
+    :type cursor: str | None
+    :param descending: Newest first.
+    :type descending: bool
+    :return: The query.
+    :rtype: Select
+    """
+    query = query.order_by(*(c.desc() if descending else c.asc() for c in columns))
+    if cursor:
+        values = tuple_(
+            *(
+                literal(v, CursorDateTime()) if isinstance(v, datetime) else v
+                for v in decode_cursor(cursor, columns)
+            )
+        )
+        key = tuple_(*columns)
+        query = query.where(key < values if descending else key > values)
+    return query
+
+
+def next_cursor(items: Sequence[Any], limit: int, *attrs: str) -> str | None:
+    """
+    Cursor after the last item of a full page, None when there are no more pages.
+
+    :param items: Items of the page.
+    :type items: Sequence[Any]
+    :param limit: Size of page.
+    :type limit: int
+    :param attrs: Names of sort key attributes of item.
+    :type attrs: str
+    :return: Cursor for the next page.
+    :rtype: str | None
+    """
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(*(getattr(last, attr) for attr in attrs))
@@ -1,7 +1,10 @@
 # pixels_project\src\services\posts.py
 from typing import List, Any
-from sqlalchemy.orm import Session, Query
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload, selectinload
 from src.services.core import BaseServices, ModelType
+from src.services.pagination import keyset
 from src.database.models import Image, Tag
 from src.schemas import PostCreate, PostUpdate
 
@@ -14,9 +17,22 @@ class PostServices(BaseServices[Image, PostCreate, PostUpdate]):
     def __init__(self, model: Image):
         self.model = model
 
+    def select_p(self) -> Select:
+        """
+        Світлини завжди разом з тегами (потрібні для серіалізації)
+        """
+        return select(self.model).options(selectinload(self.model.tags))
+
+    def select_list(self) -> Select:
+        """
+        Світлини для списків: теги одним запитом на сторінку (selectinload),
+        будь-яке інше ліниве завантаження (owner, comments) - помилка, а не N+1 запитів
+        """
+        return self.select_p().options(raiseload("*"))
+
     async def create_post(
         self,
-        db: Session,
+        db: AsyncSession,
         post_data: PostCreate,
         file_path: str,
     ) -> ModelType:
@@ -36,7 +52,7 @@ class PostServices(BaseServices[Image, PostCreate, PostUpdate]):
 
     async def update_post_image_url(
         self,
-        db: Session,
+        db: AsyncSession,
         post_id: int,
         url: str,
     ) -> ModelType:
@@ -46,96 +62,117 @@ class PostServices(BaseServices[Image, PostCreate, PostUpdate]):
         post = await self.get_p(db, id=post_id)
         if post:
             post.url_original = url
-            db.commit()
-            db.refresh(post)
+            await db.commit()
+            await db.refresh(post)
         return post
 
-    def post_list_by_user(self, db: Session, user_id: int) -> List[Image]:
+    async def post_list_by_user(self, db: AsyncSession, user_id: int) -> List[Image]:
         """
         Отримання списку світлин за ID користувача
         """
-        return db.query(self.model).filter(self.model.owner_id == user_id).all()
+        result = await db.scalars(self.select_list().where(self.model.owner_id == user_id))
+        return list(result.all())
 
-    def get_post_list_by_user_paginated(
-        self, db: Session, user_id: int, limit: int, offset: int
+    async def get_post_list_by_user_paginated(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        limit: int,
+        offset: int = 0,
+        cursor: str | None = None,
     ) -> List[Image]:
         """
         Отримання списку світлин за ID користувача з пагінацією
+        (курсор за (created_at, id) або offset для сумісності)
         """
-        query: Query = db.query(self.model).filter(self.model.owner_id == user_id)
-        return query.limit(limit).offset(offset).all()
+        query: Select = self.select_list().where(self.model.owner_id == user_id)
+        query = keyset(query, (self.model.created_at, self.model.id), cursor)
+        result = await db.scalars(query.limit(limit).offset(offset))
+        return list(result.all())
 
-    def get_p_by_unique_identifier(self, db: Session, unique_identifier: str) -> Any:
-        return (
-            db.query(Image).filter(Image.url_original_qr == unique_identifier).first()
+    async def get_p_by_unique_identifier(self, db: AsyncSession, unique_identifier: str) -> Any:
+        return await db.scalar(
+            self.select_p().where(Image.url_original_qr == unique_identifier)
         )
 
     async def get_post_by_url_original(
         self,
-        db: Session,
+        db: AsyncSession,
         url_original: str,
     ) -> ModelType:
         """
         Отримання запису за url_original
         """
-        return db.query(self.model).filter_by(url_original=url_original).first()
+        return await db.scalar(self.select_p().filter_by(url_original=url_original))
 
     @staticmethod
-    async def get_post_url(db: Session, url_original: str) -> Image:
+    async def get_post_url(db: AsyncSession, url_original: str) -> Image:
         """
         Отримання запису за url_original
         """
-        return db.query(Image).filter(Image.url_original == url_original).first()
+        return await db.scalar(
+            select(Image)
+            .options(selectinload(Image.tags))
+            .where(Image.url_original == url_original)
+        )
 
     @staticmethod
-    async def get_post_by_description(db: Session, description: str) -> Image:
+    async def get_post_by_description(db: AsyncSession, description: str) -> Image:
         """
         Отримання запису за параметром бази даних (description)
         """
-        return db.query(Image).filter(Image.description == description).first()
+        return await db.scalar(
+            select(Image)
+            .options(selectinload(Image.tags))
+            .where(Image.description == description)
+        )
     
 
-    def get_tags_paginated(
+    async def get_tags_paginated(
         self,
-        db: Session,
+        db: AsyncSession,
         limit: int = 100,
         offset: int = 0,
+        cursor: str | None = None,
     ) -> List[Image]:
         """
-        Отримання списку тегів з пагінацією
+        Отримання списку тегів з пагінацією (курсор за name, ім'я тегу унікальне)
         """
-        query: Query = db.query(Tag).order_by(Tag.name)
-        result = query.limit(limit).offset(offset).all()
+        query: Select = keyset(select(Tag), (Tag.name,), cursor)
+        result = (await db.scalars(query.limit(limit).offset(offset))).all()
         if result:
             return [tag.name for tag in result if tag.name]
 
 
 
 
-    def search_posts_paginated(
+    async def search_posts_paginated(
         self,
-        db: Session,
+        db: AsyncSession,
         description: str | None = None,
         tag: str | None = None,
         sort: str | None = None,
         user_id: int | None = None,
         limit: int = 100,
         offset: int = 0,
+        cursor: str | None = None,
     ) -> List[Image]:
         """
         Отримання списку світлин за пошуком з пагінацією
+        (курсор за (created_at, id), sort="-" - нові спочатку)
         """
-        query: Query = db.query(self.model)
+        query: Select = self.select_list()
         if user_id:
-            query = query.filter(self.model.owner_id == user_id)
+            query = query.where(self.model.owner_id == user_id)
         if description:
-            query = query.filter(self.model.description.contains(description))
+            query = query.where(self.model.description.contains(description))
         if tag:
-            query = query.join(self.model.tags).filter(Tag.name == tag)
-        if sort:
-            orderby = self.model.created_at.desc() if sort == "-" else self.model.created_at
-            query = query.order_by(orderby)
-        return query.limit(limit).offset(offset).all()
+            query = query.join(self.model.tags).where(Tag.name == tag)
+        query = keyset(
+            query, (self.model.created_at, self.model.id), cursor, descending=sort == "-"
+        )
+        result = await db.scalars(query.limit(limit).offset(offset))
+        return list(result.all())
 
 
 post = PostServices(Image)
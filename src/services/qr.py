@@ -0,0 +1,242 @@
+# pixels_project\src\services\qr.py
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from html import escape
+from io import BytesIO
+
+import numpy as np
+import qrcode
+from PIL import Image as PILImage, ImageColor
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+
+QR_PREFIX = "qr:"
+# bump it when rendering changes, old cache entries and ETags are not reused
+QR_VERSION = 2
+
+MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+ERROR_LEVELS = {
+    "L": qrcode.constants.ERROR_CORRECT_L,
+    "M": qrcode.constants.ERROR_CORRECT_M,
+    "Q": qrcode.constants.ERROR_CORRECT_Q,
+    "H": qrcode.constants.ERROR_CORRECT_H,
+}
+
+
+@dataclass(frozen=True, slots=True)
+class QRSpec:
+    """
+    QR-код: дані, вигляд і формат (png, svg); однаковий spec - однакові байти
+    """
+
+    data: str
+    fill: str = "black"
+    back: str = "white"
+    box_size: int = 10
+    border: int = 4
+    error: str = "M"
+    format: str = "png"
+
+    @property
+    def key(self) -> str:
+        raw = json.dumps(
+            [QR_VERSION, self.data, self.fill, self.back, self.box_size, self.border, self.error, self.format],
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    @property
+    def etag(self) -> str:
+        # strong: the bytes are a function of the spec, known before rendering
+        return f'"{self.key}"'
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES[self.format]
+
+
+def qr_matrix(spec: QRSpec) -> np.ndarray:
+    """
+    Модулі QR-коду з рамкою border, True - темний модуль
+    """
+    qr = qrcode.QRCode(version=1, error_correction=ERROR_LEVELS[spec.error], border=spec.border)
+    qr.add_data(spec.data)
+    qr.make(fit=True)
+    return np.array(qr.get_matrix(), dtype=bool)
+
+
+def render_png(spec: QRSpec, matrix: np.ndarray) -> bytes:
+    """
+    1-bit PNG з палітрою двох кольорів: кожен модуль - квадрат box_size пікселів
+    """
+    pixels = np.repeat(np.repeat(matrix, spec.box_size, axis=0), spec.box_size, axis=1)
+    height, width = pixels.shape
+    # 8 pixels per byte, rows padded to a byte: the raw layout of "P;1"
+    image = PILImage.frombytes("P", (width, height), np.packbits(pixels, axis=1).tobytes(), "raw", "P;1")
+    image.putpalette([*ImageColor.getrgb(spec.back)[:3], *ImageColor.getrgb(spec.fill)[:3]])
+    out = BytesIO()
+    # optimize=True saves a few bytes for 3x the time of the whole rasterization
+    image.save(out, format="PNG", bits=1)
+    return out.getvalue()
+
+
+def render_svg(spec: QRSpec, matrix: np.ndarray) -> bytes:
+    """
+    SVG: фон і один path, темні модулі рядка злиті в смуги
+    """
+    size = matrix.shape[0]
+    # +1 where a run of dark modules starts, -1 after it ends
+    edges = np.diff(np.pad(matrix.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    path = "".join(f"M{x},{y}h{w}v1h-{w}z" for y, x, w in zip(rows, starts, ends - starts))
+    pixels = size * spec.box_size
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{pixels}" height="{pixels}" '
+        f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="{escape(spec.back)}"/>'
+        f'<path d="{path}" fill="{escape(spec.fill)}"/></svg>'
+    )
+    return svg.encode()
+
+
+def render_qr(spec: QRSpec) -> bytes:
+    matrix = qr_matrix(spec)
+    return render_svg(spec, matrix) if spec.format == "svg" else render_png(spec, matrix)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    If-None-Match відповідає etag (слабке порівняння, як вимагає RFC 9110)
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class QRRenderer:
+    """
+    Images of QR codes: per-worker LRU (bounded in bytes), then Redis, then render.
+
+    Rendering is CPU work of qrcode and Pillow, it runs in a thread pool
+    out of the event loop; concurrent requests of one spec wait one render.
+    Redis errors are logged and the code is rendered, the cache is optional.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ttl: int = 7 * 24 * 3600, workers: int = 4) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.workers = workers
+        self._data: OrderedDict[str, bytes] = OrderedDict()
+        self._pending: dict[str, asyncio.Future] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        self.size = 0
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.renders = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.render_total = 0.0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="qr")
+        return self._executor
+
+    def _get_local(self, key: str) -> bytes | None:
+        png = self._data.get(key)
+        if png is not None:
+            self._data.move_to_end(key)
+        return png
+
+    def _set_local(self, key: str, png: bytes) -> None:
+        if len(png) > self.max_bytes:
+            return
+        self.size += len(png) - len(self._data.pop(key, b""))
+        self._data[key] = png
+        while self.size > self.max_bytes:
+            _, evicted = self._data.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    async def _render(self, spec: QRSpec, r: Redis | None) -> bytes:
+        if r is not None:
+            try:
+                png = await r.get(f"{QR_PREFIX}{spec.key}")
+            except RedisError as err:
+                logging.warning(f"QR cache read failed: {err}")
+                png = None
+            if png:
+                self.redis_hits += 1
+                self._set_local(spec.key, png)
+                return png
+        started = time.perf_counter()
+        png = await asyncio.get_running_loop().run_in_executor(self.executor, render_qr, spec)
+        self.renders += 1
+        self.render_total += time.perf_counter() - started
+        self._set_local(spec.key, png)
+        if r is not None:
+            try:
+                await r.set(f"{QR_PREFIX}{spec.key}", png, ex=self.ttl)
+            except RedisError as err:
+                logging.warning(f"QR cache write failed: {err}")
+        return png
+
+    async def image(self, spec: QRSpec, r: Redis | None = None) -> bytes:
+        """
+        Зображення QR-коду spec з кешу або відрендероване
+        """
+        png = self._get_local(spec.key)
+        if png is not None:
+            self.local_hits += 1
+            return png
+        task = self._pending.get(spec.key)
+        if task is None:
+            task = asyncio.ensure_future(self._render(spec, r))
+            self._pending[spec.key] = task
+            task.add_done_callback(lambda _: self._pending.pop(spec.key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.size = 0
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        lookups = self.local_hits + self.redis_hits + self.renders + self.coalesced
+        hits = self.local_hits + self.redis_hits + self.coalesced
+        return {
+            "entries": len(self._data),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "renders": self.renders,
+            "coalesced": self.coalesced,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "render_avg_ms": round(self.render_total / self.renders * 1000, 3) if self.renders else 0.0,
+        }
+
+
+qr_renderer = QRRenderer(
+    max_bytes=settings.qr_cache_local_bytes, ttl=settings.qr_cache_ttl, workers=settings.qr_workers
+)
@@ -0,0 +1,209 @@
+# pixels_project\src\services\qr_pipeline.py
+import asyncio
+import logging
+import random
+import time
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from src.conf.config import settings
+from src.database.models import Image
+from src.services.bulk_images import BulkGenerator, select_images, update_images
+from src.services.jobs import JobContext
+
+# ids of published images without a QR code, score - time of publish, oldest first
+PENDING = "qr:pending"
+# ids waiting for a retry, score - time of the retry
+DELAYED = "qr:delayed"
+# ids taken by a worker and not finished yet, one zset per worker name
+PROCESSING_PREFIX = "qr:processing:"
+# id -> time of publish and failed attempts, kept until the id leaves the pipeline
+PUBLISHED = "qr:published"
+ATTEMPTS = "qr:attempts"
+# publish to QR ready, seconds of the last images
+LATENCY = "qr:pipeline:latency"
+COUNTERS = "qr:pipeline:counters"
+
+
+def percentile(values: list[float], p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class QRPipeline:
+    """
+    Post-commit stage of a publication: QR codes of new images.
+
+    Publish adds the image id to a Redis zset, a second publish of the same
+    id keeps the first time. A worker moves the oldest ids to its own
+    processing zset in one transaction, so workers never take the same
+    batch, renders with bounded concurrency and sets url_original_qr with
+    one UPDATE. An id leaves the processing zset only after its row is
+    written; a restarted worker queues its unfinished ids again.
+    Retryable failures wait with exponential backoff, up to max_attempts.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        concurrency: int,
+        interval: float,
+        samples: int,
+        max_attempts: int,
+        backoff: float,
+    ):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.interval = interval
+        self.samples = samples
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+
+    async def enqueue(self, r: Redis, image_id: int, published_at: float | None = None) -> None:
+        published_at = published_at or time.time()
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.zadd(PENDING, {str(image_id): published_at}, nx=True)
+            pipe.hsetnx(PUBLISHED, str(image_id), published_at)
+            await pipe.execute()
+
+    async def promote_delayed(self, r: Redis) -> int:
+        """
+        Id, час повтору яких настав, - знову в черзі
+        """
+        due = await r.zrangebyscore(DELAYED, "-inf", time.time())
+        promoted = 0
+        for image_id in due:
+            # the worker which removes the id queues it
+            if await r.zrem(DELAYED, image_id):
+                published = await r.hget(PUBLISHED, image_id)
+                await r.zadd(PENDING, {image_id: float(published or time.time())}, nx=True)
+                promoted += 1
+        return promoted
+
+    async def claim(self, r: Redis, name: str) -> dict[int, float]:
+        """
+        Бере найстаріші id у свій processing, повертає id і час публікації
+        """
+        processing = f"{PROCESSING_PREFIX}{name}"
+        # left by a failed round of this worker, finished first
+        if not await r.zcard(processing):
+            async with r.pipeline(transaction=True) as pipe:
+                pipe.zrangestore(processing, PENDING, 0, self.batch_size - 1)
+                pipe.zremrangebyrank(PENDING, 0, self.batch_size - 1)
+                await pipe.execute()
+        return {int(image_id): score for image_id, score in await r.zrange(processing, 0, -1, withscores=True)}
+
+    async def recover(self, r: Redis, name: str) -> int:
+        """
+        Id, які взяв і не закінчив воркер з цим ім'ям, - знову в черзі
+        """
+        processing = f"{PROCESSING_PREFIX}{name}"
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.zcard(processing)
+            pipe.zunionstore(PENDING, [PENDING, processing], aggregate="MIN")
+            pipe.delete(processing)
+            recovered, *_ = await pipe.execute()
+        return recovered
+
+    async def run_once(self, ctx: JobContext, name: str = "worker") -> int:
+        """
+        Обробляє один пакет, повертає кількість взятих id
+        """
+        await self.promote_delayed(ctx.r)
+        published = await self.claim(ctx.r, name)
+        if not published:
+            return 0
+        generator = BulkGenerator(
+            ctx.storage, ctx.r, ["qr_original"], {}, batch_size=self.batch_size, concurrency=self.concurrency
+        )
+        async with ctx.session_factory() as db:
+            # deleted posts and posts which got a QR code on request are skipped
+            stmt = select_images().where(Image.id.in_(published), Image.url_original_qr == "")
+            rows = (await db.execute(stmt)).all()
+            values, failed = await generator.batch(rows)
+            if values:
+                await update_images(db, values)
+                await db.commit()
+
+        retry = [item["id"] for item in failed if item["retry"]]
+        attempts = {}
+        if retry:
+            async with ctx.r.pipeline(transaction=False) as pipe:
+                for image_id in retry:
+                    pipe.hincrby(ATTEMPTS, str(image_id), 1)
+                attempts = dict(zip(retry, await pipe.execute()))
+        delayed = {image_id: n for image_id, n in attempts.items() if n < self.max_attempts}
+        given_up = len(failed) - len(delayed)
+        now = time.time()
+        latencies = [now - published[item["id"]] for item in values]
+
+        processing = f"{PROCESSING_PREFIX}{name}"
+        finished = [str(image_id) for image_id in published if image_id not in delayed]
+        async with ctx.r.pipeline(transaction=True) as pipe:
+            if delayed:
+                pipe.zadd(DELAYED, {
+                    str(image_id): now + self.backoff * 2 ** (n - 1) * (1 + random.random() / 2)
+                    for image_id, n in delayed.items()
+                })
+            if finished:
+                pipe.hdel(PUBLISHED, *finished)
+                pipe.hdel(ATTEMPTS, *finished)
+            pipe.delete(processing)
+            if latencies:
+                pipe.lpush(LATENCY, *latencies)
+                pipe.ltrim(LATENCY, 0, self.samples - 1)
+                pipe.hincrby(COUNTERS, "ready", len(latencies))
+            pipe.hincrby(COUNTERS, "failed", given_up)
+            pipe.hincrby(COUNTERS, "retried", len(delayed))
+            await pipe.execute()
+        return len(published)
+
+    async def run(self, ctx: JobContext, name: str = "worker") -> None:
+        """
+        Обробляє пакети, доки його не скасують.
+
+        Помилка пакета (Redis, БД, сховище) - пауза backoff, взяті id лишаються
+        у processing і обробляються в наступному раунді.
+        """
+        recovered = await self.recover(ctx.r, name)
+        if recovered:
+            logging.info(f"QR pipeline {name}: {recovered} unfinished images queued again")
+        while True:
+            try:
+                if await self.run_once(ctx, name) < self.batch_size:
+                    await asyncio.sleep(self.interval)
+            except RedisError as err:
+                logging.warning(f"QR pipeline {name}: {err}")
+                await asyncio.sleep(self.backoff)
+            except Exception:
+                logging.exception(f"QR pipeline {name}: batch failed")
+                await asyncio.sleep(self.backoff)
+
+    async def stats(self, r: Redis) -> dict:
+        latencies = sorted(float(value) for value in await r.lrange(LATENCY, 0, -1))
+        counters = await r.hgetall(COUNTERS)
+        result = {
+            "pending": await r.zcard(PENDING),
+            "delayed": await r.zcard(DELAYED),
+            **{name: int(counters.get(name.encode(), 0)) for name in ("ready", "failed", "retried")},
+            "publish_to_ready_p50": None,
+            "publish_to_ready_p95": None,
+            "publish_to_ready_max": None,
+        }
+        if latencies:
+            result.update(
+                publish_to_ready_p50=round(percentile(latencies, 0.5), 3),
+                publish_to_ready_p95=round(percentile(latencies, 0.95), 3),
+                publish_to_ready_max=round(latencies[-1], 3),
+            )
+        return result
+
+
+qr_pipeline = QRPipeline(
+    batch_size=settings.qr_pipeline_batch_size,
+    concurrency=settings.bulk_concurrency,
+    interval=settings.qr_pipeline_interval,
+    samples=settings.qr_pipeline_samples,
+    max_attempts=settings.qr_pipeline_max_attempts,
+    backoff=settings.qr_pipeline_backoff,
+)
@@ -0,0 +1,256 @@
+# pixels_project\src\services\resumable.py
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterable
+
+import aiofiles
+from fastapi import HTTPException, status
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, WatchError
+
+from src.conf import messages
+from src.conf.config import settings
+from src.services.uploads import UploadTooLarge
+
+UPLOAD_PREFIX = "upload:"
+# ids of open uploads of a user
+OWNER_PREFIX = "uploads:"
+
+
+@dataclass(slots=True)
+class UploadSession:
+    id: str
+    owner_id: int
+    size: int
+    offset: int
+    filename: str
+
+    @property
+    def complete(self) -> bool:
+        return self.offset == self.size
+
+
+class UploadLock:
+    """
+    Lock of an upload with a random token: SET NX PX, the TTL is refreshed
+    while the holder works, it is released only by its holder.
+    Compare and act is a WATCH/MULTI transaction on the lock key.
+    """
+
+    def __init__(self, r: Redis, key: str, ttl: float):
+        self.r = r
+        self.key = key
+        self.ttl_ms = int(ttl * 1000)
+        self.token = uuid.uuid4().hex
+        self._refresh: asyncio.Task | None = None
+
+    async def acquire(self) -> bool:
+        if not await self.r.set(self.key, self.token, nx=True, px=self.ttl_ms):
+            return False
+        self._refresh = asyncio.create_task(self._keep())
+        return True
+
+    async def if_held(self, command) -> bool:
+        """
+        Виконує command(pipe) в транзакції, лише якщо замок ще наш
+        """
+        async with self.r.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(self.key)
+                if await pipe.get(self.key) != self.token.encode():
+                    return False
+                pipe.multi()
+                command(pipe)
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    async def _keep(self) -> None:
+        while True:
+            await asyncio.sleep(self.ttl_ms / 3000)
+            try:
+                if not await self.if_held(lambda pipe: pipe.pexpire(self.key, self.ttl_ms)):
+                    return
+            except RedisError as err:
+                logging.warning(f"Upload lock {self.key} was not refreshed: {err}")
+
+    async def release(self) -> None:
+        if self._refresh is not None:
+            self._refresh.cancel()
+        await self.if_held(lambda pipe: pipe.delete(self.key))
+
+
+class ResumableUploads:
+    """
+    Завантаження частинами з докачуванням (як у tus).
+
+    Стан сесії - хеш upload:<id> в Redis з TTL, що подовжується кожною
+    частиною; байти - файл <id>.part у staging_dir. Частина пишеться з
+    Upload-Offset, що дорівнює вже отриманому розміру; обірвана частина
+    зараховується на стільки байт, скільки встигло дійти. Файли сесій,
+    що спливли, прибирає cleanup.
+    """
+
+    def __init__(
+        self, staging_dir: str, ttl: int, max_size: int, lock_ttl: float = 30, max_sessions: int = 5
+    ):
+        self.staging_dir = Path(staging_dir)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.lock_ttl = lock_ttl
+        self.max_sessions = max_sessions
+
+    def path(self, upload_id: str) -> Path:
+        return self.staging_dir / f"{upload_id}.part"
+
+    async def create(self, r: Redis, owner_id: int, size: int, filename: str) -> UploadSession:
+        if size > self.max_size:
+            raise UploadTooLarge()
+        session = UploadSession(uuid.uuid4().hex, owner_id, size, 0, filename)
+        # these routes are not under the rate limiter: staged files of a user are bounded
+        owner_key = f"{OWNER_PREFIX}{owner_id}"
+        for upload_id in await r.smembers(owner_key):
+            if not await r.exists(f"{UPLOAD_PREFIX}{upload_id.decode()}"):
+                await r.srem(owner_key, upload_id)
+        await r.sadd(owner_key, session.id)
+        if await r.scard(owner_key) > self.max_sessions:
+            await r.srem(owner_key, session.id)
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=messages.UPLOAD_TOO_MANY)
+        await r.expire(owner_key, self.ttl)
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        self.path(session.id).touch()
+        key = f"{UPLOAD_PREFIX}{session.id}"
+        await r.hset(
+            key, mapping={"owner_id": owner_id, "size": size, "offset": 0, "filename": filename}
+        )
+        await r.expire(key, self.ttl)
+        return session
+
+    async def get(self, r: Redis, upload_id: str, owner_id: int) -> UploadSession:
+        data = await r.hgetall(f"{UPLOAD_PREFIX}{upload_id}") if upload_id.isalnum() else {}
+        data = {k.decode(): v.decode() for k, v in data.items()}
+        if not data or int(data["owner_id"]) != owner_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=messages.UPLOAD_NOT_FOUND)
+        return UploadSession(
+            upload_id, int(data["owner_id"]), int(data["size"]), int(data["offset"]), data["filename"]
+        )
+
+    @asynccontextmanager
+    async def lock(self, r: Redis, upload_id: str):
+        """
+        Одна частина або завершення сесії водночас, інакше 409.
+        Замок живий, доки запит працює, хоч би як довго йшла частина.
+        """
+        lock = UploadLock(r, f"{UPLOAD_PREFIX}{upload_id}:lock", self.lock_ttl)
+        if not await lock.acquire():
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=messages.UPLOAD_LOCKED)
+        try:
+            yield lock
+        finally:
+            await lock.release()
+
+    async def append(
+        self, r: Redis, upload_id: str, owner_id: int, offset: int, chunks: AsyncIterable[bytes]
+    ) -> UploadSession:
+        """
+        Дописує частину з позиції offset, повертає сесію з новим offset
+        """
+        session = await self.get(r, upload_id, owner_id)
+        async with self.lock(r, upload_id) as lock:
+            # offset of the session read under the lock
+            session = await self.get(r, upload_id, owner_id)
+            if offset != session.offset:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=messages.UPLOAD_OFFSET_MISMATCH,
+                    headers={"Upload-Offset": str(session.offset)},
+                )
+            written = 0
+            try:
+                async with aiofiles.open(self.path(upload_id), "r+b") as f:
+                    await f.seek(offset)
+                    try:
+                        async for chunk in chunks:
+                            room = session.size - offset - written
+                            await f.write(chunk[:room])
+                            written += min(len(chunk), room)
+                            if len(chunk) > room:
+                                raise UploadTooLarge()
+                    finally:
+                        await f.truncate()
+            finally:
+                # bytes of a broken chunk count, the client resumes after them
+                session.offset = offset + written
+                key = f"{UPLOAD_PREFIX}{upload_id}"
+
+                def save(pipe):
+                    pipe.hset(key, "offset", session.offset)
+                    pipe.expire(key, self.ttl)
+
+                # a holder which lost the lock must not move the offset of the next one
+                saved = await lock.if_held(save)
+            if not saved:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=messages.UPLOAD_LOCKED)
+        return session
+
+    async def complete(self, r: Redis, upload_id: str, owner_id: int) -> tuple[UploadSession, Path]:
+        """
+        Сесія і файл завершеного завантаження
+        """
+        session = await self.get(r, upload_id, owner_id)
+        if not session.complete:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=messages.UPLOAD_INCOMPLETE,
+                headers={"Upload-Offset": str(session.offset)},
+            )
+        return session, self.path(upload_id)
+
+    async def remove(self, r: Redis, upload_id: str, owner_id: int) -> None:
+        await r.delete(f"{UPLOAD_PREFIX}{upload_id}")
+        await r.srem(f"{OWNER_PREFIX}{owner_id}", upload_id)
+        self.path(upload_id).unlink(missing_ok=True)
+
+    async def cleanup(self, r: Redis) -> int:
+        """
+        Видаляє файли сесій, яких вже немає в Redis, повертає їх кількість
+        """
+        if not self.staging_dir.is_dir():
+            return 0
+        removed = 0
+        for path in self.staging_dir.glob("*.part"):
+            # a session being created right now has its file before its key
+            if time.time() - path.stat().st_mtime < 60:
+                continue
+            if not await r.exists(f"{UPLOAD_PREFIX}{path.stem}"):
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    async def run_cleanup(self, r: Redis, interval: float) -> None:
+        """
+        Періодичне прибирання, запускається фоновою задачею
+        """
+        while True:
+            try:
+                removed = await self.cleanup(r)
+                if removed:
+                    logging.info(f"Removed {removed} expired uploads")
+            except (RedisError, OSError) as err:
+                logging.warning(f"Upload cleanup failed: {err}")
+            await asyncio.sleep(interval)
+
+
+resumable_uploads = ResumableUploads(
+    staging_dir=settings.upload_staging_dir,
+    ttl=settings.upload_session_ttl,
+    max_size=settings.upload_max_size,
+    lock_ttl=settings.upload_lock_ttl,
+    max_sessions=settings.upload_max_sessions,
+)
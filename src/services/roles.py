@@ -1,9 +1,10 @@
 from typing import Any, List
 
-from fastapi import Depends, HTTPException, status, Request
+from fastapi import Depends, HTTPException, status
 
-from src.database.models import User, Role
+from src.database.models import Role
 from src.services.auth import auth_service
+from src.services.user_cache import CachedUser
 from src.conf import messages
 
 
@@ -21,23 +22,16 @@ class RoleAccess:
 
     async def __call__(
         self,
-        request: Request,
-        current_user: User = Depends(auth_service.get_current_user),
+        current_user: CachedUser = Depends(auth_service.get_current_user),
     ) -> Any:
         """
         The __call__ function is the actual decorator (async functor).
-        It takes in a function, adds some code before and after it runs, then returns all of that as a function.
-        
-        
+        User is resolved once per request by the auth context, so the check does no I/O.
+
         :param self: Access the class attributes
-        :param request: Request: Get the request method and url
-        :param current_user: User: Get the current user from the database
-        :param : Get the current user from the database
-        :return: The decorated function
+        :param current_user: CachedUser: The current user of request
+        :return: None
         """
-        print(request.method, request.url)
-        print(f"User role {current_user.role}")
-        print(f"Allowed roles: {self.allowed_roles}")
         if current_user.role not in self.allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
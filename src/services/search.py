@@ -0,0 +1,96 @@
+# pixels_project\src\services\search.py
+import re
+from typing import List, Sequence
+
+from sqlalchemy import Select, and_, column, func, literal, literal_column, select, table
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload, selectinload
+
+from src.database.models import Image, Tag
+from src.database.search import TS_CONFIG
+from src.services.pagination import keyset
+
+WORD = re.compile(r"\w+")
+MAX_TERMS = 8
+
+images_fts = table("images_fts", column("rowid"))
+
+
+def search_terms(query: str | None) -> List[str]:
+    """
+    Слова запиту (букви та цифри), не більше MAX_TERMS
+    """
+    terms = [t for t in WORD.findall((query or "").lower()) if any(ch.isalnum() for ch in t)]
+    return terms[:MAX_TERMS]
+
+
+class PostSearch:
+    """
+    Повнотекстовий пошук світлин за описом і тегами.
+
+    PostgreSQL - tsvector з GIN індексом, SQLite - FTS5 (src/database/search.py).
+    Кожне слово шукається за префіксом, всі слова обов'язкові,
+    результати відсортовані за релевантністю.
+    """
+
+    def __init__(self, model=Image):
+        self.model = model
+
+    def _postgresql(self, terms: List[str]) -> tuple[Select, object]:
+        tsquery = func.to_tsquery(TS_CONFIG, " & ".join(f"{t}:*" for t in terms))
+        vector = literal_column("images.search_vector")
+        rank = func.ts_rank_cd(vector, tsquery)
+        return select(self.model, rank.label("rank")).where(vector.op("@@")(tsquery)), rank
+
+    def _sqlite(self, terms: List[str]) -> tuple[Select, object]:
+        match = " AND ".join(f'"{t}"*' for t in terms)
+        # bm25 is lower for better match, description weighs more than tags
+        rank = -func.bm25(literal_column("images_fts"), 1.0, 0.4)
+        query = (
+            select(self.model, rank.label("rank"))
+            .join(images_fts, images_fts.c.rowid == self.model.id)
+            .where(literal_column("images_fts").op("MATCH")(match))
+        )
+        return query, rank
+
+    def _contains(self, terms: List[str]) -> tuple[Select, object]:
+        rank = literal(0.0)
+        query = select(self.model, rank.label("rank")).where(
+            and_(*(self.model.description.contains(t) for t in terms))
+        )
+        return query, rank
+
+    async def search(
+        self,
+        db: AsyncSession,
+        query: str | None,
+        tags: Sequence[str] = (),
+        owner_id: int | None = None,
+        limit: int = 10,
+        cursor: str | None = None,
+    ) -> List[tuple[Image, float]]:
+        """
+        Світлини з рангом, курсор за (rank, id).
+        Без слів запиту - світлини з усіма тегами, новіші спочатку.
+        """
+        terms = search_terms(query)
+        if not terms and not tags:
+            return []
+        if terms:
+            builders = {"postgresql": self._postgresql, "sqlite": self._sqlite}
+            build = builders.get(db.get_bind().dialect.name, self._contains)
+            stmt, rank = build(terms)
+        else:
+            rank = literal(0.0)
+            stmt = select(self.model, rank.label("rank"))
+        for tag in tags:
+            stmt = stmt.where(self.model.tags.any(Tag.name == tag))
+        if owner_id:
+            stmt = stmt.where(self.model.owner_id == owner_id)
+        stmt = stmt.options(selectinload(self.model.tags), raiseload("*"))
+        stmt = keyset(stmt, (rank, self.model.id), cursor, descending=True)
+        result = await db.execute(stmt.limit(limit))
+        return [(image, float(score)) for image, score in result.all()]
+
+
+post_search = PostSearch(Image)
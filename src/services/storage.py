@@ -0,0 +1,264 @@
+# pixels_project\src\services\storage.py
+import asyncio
+import hashlib
+import hmac
+import os
+import re
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator
+
+import aiofiles
+import cloudinary
+
+from src.conf.config import settings
+from src.services.cloudinary_srv import CloudinaryClient, cloudinary_client
+from src.services.transforms import (
+    TransformEngine, build_engine, local_spec, normalize, parse_token, spec_token
+)
+from src.services.uploads import AsyncFile, iter_upload
+
+MAGIC = {
+    b"\x89PNG": "png",
+    b"\xff\xd8\xff": "jpg",
+    b"GIF8": "gif",
+    b"RIFF": "webp",
+}
+
+SOURCE_KEY = re.compile(r"^(?P<digest>[0-9a-f]{2}/[0-9a-f]{64})\.(?P<ext>\w+)$")
+DERIVED_KEY = re.compile(
+    r"^derived/(?P<digest>[0-9a-f]{64})/(?P<token>[\w,]+)\.(?P<signature>[0-9a-f]{16})\.(?P<ext>\w+)$"
+)
+
+
+async def chunks(file: bytes | AsyncFile) -> AsyncIterator[bytes]:
+    if isinstance(file, bytes):
+        yield file
+    else:
+        async for chunk in iter_upload(file):
+            yield chunk
+
+
+@dataclass(slots=True, frozen=True)
+class StoredFile:
+    """
+    Файл у сховищі: key - ідентифікатор у сховищі, url - адреса для клієнтів
+    """
+
+    key: str
+    url: str
+    version: str | None = None
+
+
+class StorageBackend(ABC):
+    """
+    Сховище світлин, QR-кодів і аватарів.
+
+    Трансформації (angle, width, height, crop, effect, format) - як у Cloudinary.
+    """
+
+    # the same bytes are stored once, a key can be shared by several posts
+    content_addressed = False
+
+    @abstractmethod
+    async def put(
+        self, file: bytes | AsyncFile, key: str | None = None, folder: str = "", format: str | None = None
+    ) -> StoredFile:
+        """
+        Зберігає файл, key і folder - побажання, сховище може обрати свій ключ
+        """
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        ...
+
+    @abstractmethod
+    async def transform(self, file: StoredFile, **transformation) -> StoredFile:
+        """
+        Трансформоване зображення file
+        """
+
+    @abstractmethod
+    def key_from_url(self, url: str) -> str | None:
+        """
+        Ключ файлу за його url, None - url не цього сховища
+        """
+
+
+class CloudinaryStorage(StorageBackend):
+    """
+    Cloudinary: трансформації виконуються CDN за url доставки, без завантаження
+    """
+
+    # transformations go before the version, the key follows it
+    URL = re.compile(r"/image/upload/(?:.*?/)?v(?P<version>\d+)/(?P<key>.+?)(?:\.\w+)?$")
+
+    def __init__(self, client: CloudinaryClient):
+        self.client = client
+
+    async def put(
+        self, file: bytes | AsyncFile, key: str | None = None, folder: str = "", format: str | None = None
+    ) -> StoredFile:
+        response = await self.client.upload(
+            file, public_id=key, folder=folder or None, format=format, overwrite=True
+        )
+        version = response.get("version")
+        return StoredFile(response.get("public_id", key), response["secure_url"], str(version) if version else None)
+
+    async def get(self, key: str) -> bytes:
+        return await self.client.download(self.url(key))
+
+    async def delete(self, key: str) -> None:
+        await self.client.destroy(key)
+
+    def url(self, key: str, version: str | None = None, **transformation) -> str:
+        return cloudinary.CloudinaryImage(key).build_url(
+            secure=True, cloud_name=self.client.cloud_name, version=version, **transformation
+        )
+
+    async def transform(self, file: StoredFile, **transformation) -> StoredFile:
+        spec = normalize(**transformation)
+        return StoredFile(file.key, self.url(file.key, file.version, **spec), file.version)
+
+    def key_from_url(self, url: str) -> str | None:
+        match = self.URL.search(url or "")
+        return match["key"] if match and "res.cloudinary.com" in url else None
+
+
+class LocalStorage(StorageBackend):
+    """
+    Локальний диск, адресація за вмістом: ключ - sha256 файлу,
+    тож файл ніколи не змінюється і віддається з Cache-Control immutable
+    (StaticFilesCache за адресою base_url).
+
+    Трансформації - derived/<sha256 оригіналу>/<токен трансформації>.<підпис>.<ext>,
+    підпис - HMAC storage_local_secret, ключ, якого не видав transform, не рендериться;
+    рендер у пулі процесів, файли в LRU кеші (src/services/transforms.py);
+    витіснений з кешу файл рендериться знову при запиті (derived).
+    """
+
+    content_addressed = True
+
+    def __init__(
+        self,
+        root: str,
+        base_url: str,
+        engine: TransformEngine | None = None,
+        secret: str | None = None,
+        tmp_dir: str | None = None,
+    ):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+        # files being written are not served: next to root (os.replace needs the same disk), not in it
+        self.tmp_dir = Path(tmp_dir) if tmp_dir else self.root.with_name(f"{self.root.name}_tmp")
+        self.engine = engine or build_engine(self.root / "derived")
+        self.secret = (secret or settings.storage_local_secret).encode()
+
+    def path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root.resolve()):
+            raise ValueError(key)
+        return path
+
+    async def put(
+        self, file: bytes | AsyncFile, key: str | None = None, folder: str = "", format: str | None = None
+    ) -> StoredFile:
+        tmp = self.tmp_dir / uuid.uuid4().hex
+        tmp.parent.mkdir(parents=True, exist_ok=True)
+        digest, head = hashlib.sha256(), b""
+        try:
+            async with aiofiles.open(tmp, "wb") as f:
+                async for chunk in chunks(file):
+                    digest.update(chunk)
+                    head = head or chunk[:8]
+                    await f.write(chunk)
+            ext = format or next((e for magic, e in MAGIC.items() if head.startswith(magic)), "bin")
+            hexdigest = digest.hexdigest()
+            key = f"{hexdigest[:2]}/{hexdigest}.{ext}"
+            path = self.path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(os.replace, tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return StoredFile(key, self.url(key))
+
+    async def get(self, key: str) -> bytes:
+        async with aiofiles.open(self.path(key), "rb") as f:
+            return await f.read()
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self.path(key).unlink, missing_ok=True)
+        source = SOURCE_KEY.match(key)
+        if source:
+            self.engine.cache.drop(source["digest"][3:])
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    def signature(self, digest: str, token: str, ext: str) -> str:
+        return hmac.new(self.secret, f"{digest}/{token}.{ext}".encode(), hashlib.sha256).hexdigest()[:16]
+
+    async def transform(self, file: StoredFile, **transformation) -> StoredFile:
+        source = SOURCE_KEY.match(file.key)
+        if not source:
+            raise ValueError(f"only original files are transformed: {file.key}")
+        spec = local_spec(**transformation)
+        if spec.get("format") == source["ext"]:
+            del spec["format"]
+        if not spec:
+            return file
+        digest, token, ext = source["digest"][3:], spec_token(spec), spec.get("format", source["ext"])
+        key = f"derived/{digest}/{token}.{self.signature(digest, token, ext)}.{ext}"
+        await self.derived(key)
+        return StoredFile(key, self.url(key))
+
+    async def derived(self, key: str) -> Path:
+        """
+        Файл похідного зображення, рендер - якщо його немає в кеші.
+
+        Ключ не похідного файлу або не виданий transform (підпис) - ValueError,
+        немає оригіналу - FileNotFoundError.
+        """
+        match = DERIVED_KEY.match(key)
+        if not match:
+            raise ValueError(key)
+        digest, token, ext = match["digest"], match["token"], match["ext"]
+        if not hmac.compare_digest(match["signature"], self.signature(digest, token, ext)):
+            raise ValueError(key)
+        spec = parse_token(token)
+        source = next(self.path(digest[:2]).glob(f"{digest}.*"), None)
+        if source is None:
+            raise FileNotFoundError(key)
+        if spec.get("format", source.suffix[1:]) != ext or spec.get("format") == source.suffix[1:]:
+            raise ValueError(key)
+        return await self.engine.derive(source, f"{digest}/{token}.{match['signature']}.{ext}", spec)
+
+    def key_from_url(self, url: str) -> str | None:
+        prefix = f"{self.base_url}/"
+        return url[len(prefix):] if url and url.startswith(prefix) else None
+
+
+def build_storage() -> StorageBackend:
+    if settings.storage_backend == "local":
+        return LocalStorage(settings.storage_local_dir, settings.storage_local_url)
+    return CloudinaryStorage(cloudinary_client)
+
+
+storage = build_storage()
+
+
+def get_storage() -> StorageBackend:
+    """
+    Сховище як залежність FastAPI (у тестах - app.dependency_overrides)
+    """
+    return storage
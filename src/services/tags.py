@@ -1,48 +1,225 @@
-from typing import List
+import asyncio
+import heapq
+import logging
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Tuple
 
-from sqlalchemy.orm import Session
-from src.database.models import Tag
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.conf.config import settings
+from src.database.models import Tag, image_m2m_tag
 from src.schemas import TagModel
 
+# most popular tags kept for every prefix asked
+SUGGEST_TOP = 20
+
+
+class TagSuggestIndex:
+    """
+    Індекс імен тегів у пам'яті воркера для підказок під час введення.
+
+    Відсортований масив (ім'я в нижньому регістрі, ім'я) дає діапазон за
+    префіксом, топ за кількістю світлин запам'ятовується для memo_size
+    останніх префіксів (LRU).
+    Зміни цього воркера вносяться одразу (add, remove), зміни інших
+    воркерів - повною перебудовою з бази через settings.tag_suggest_ttl секунд.
+    Перебудова - одна задача на воркер, до її кінця підказки йдуть за старим
+    індексом; чекає лише перший запит, коли індексу ще немає.
+    """
+
+    def __init__(self, ttl: float = 300, memo_size: int = 1024):
+        self.ttl = ttl
+        self.memo_size = memo_size
+        self.keys: List[Tuple[str, str]] = []
+        self.counts: Dict[str, int] = {}
+        self.top: OrderedDict[str, List[Tuple[str, int]]] = OrderedDict()
+        self.built_at: float | None = None
+        self.rebuild: asyncio.Task | None = None
+        # changes made while a rebuild reads the table, applied to the new index too
+        self.replay: List[Callable[[], None]] | None = None
+
+    def clear(self) -> None:
+        """
+        Наступний запит перебудує індекс з бази
+        """
+        self.keys, self.counts, self.top = [], {}, OrderedDict()
+        self.built_at = None
+        self.rebuild, self.replay = None, None
+
+    @property
+    def stale(self) -> bool:
+        return self.built_at is None or time.monotonic() - self.built_at > self.ttl
+
+    async def build(self, db: AsyncSession) -> None:
+        """
+        Імена всіх тегів з кількістю світлин
+        """
+        rows = await db.execute(
+            select(Tag.name, func.count(image_m2m_tag.c.image_id))
+            .outerjoin(image_m2m_tag, image_m2m_tag.c.tag_id == Tag.id)
+            .group_by(Tag.id, Tag.name)
+        )
+        counts = {name: count for name, count in rows}
+        self.keys = sorted((name.lower(), name) for name in counts)
+        self.counts, self.top = counts, OrderedDict()
+        self.built_at = time.monotonic()
+        replay, self.replay = self.replay or [], None
+        for change in replay:
+            change()
+
+    async def _rebuild(self, db: AsyncSession) -> None:
+        self.replay = []
+        try:
+            # own session: the rebuild may outlive the request which started it
+            async with AsyncSession(db.bind) as session:
+                await self.build(session)
+        except Exception as e:
+            # the old index is served, the next request tries again
+            logging.warning(f"Tag suggestions were not rebuilt: {e}")
+            if self.built_at is None:
+                raise
+        finally:
+            self.replay = None
+            self.rebuild = None
+
+    def _forget(self, name: str) -> None:
+        key = name.lower()
+        for i in range(len(key) + 1):
+            self.top.pop(key[:i], None)
+
+    def add(self, names: Iterable[str], images: int = 1) -> None:
+        """
+        Нові теги або ще images світлин з тегами
+        """
+        names = list(names)
+        if self.replay is not None:
+            self.replay.append(lambda: self.add(names, images))
+        if self.built_at is None:
+            return
+        for name in names:
+            if name not in self.counts:
+                self.counts[name] = 0
+                insort(self.keys, (name.lower(), name))
+            self.counts[name] += images
+            self._forget(name)
+
+    def remove(self, name: str) -> None:
+        if self.replay is not None:
+            self.replay.append(lambda: self.remove(name))
+        if self.counts.pop(name, None) is None:
+            return
+        i = bisect_left(self.keys, (name.lower(), name))
+        del self.keys[i]
+        self._forget(name)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """
+        До limit (не більше SUGGEST_TOP) тегів з префіксом, найпопулярніші спочатку
+        """
+        key = prefix.lower()
+        top = self.top.get(key)
+        if top is not None:
+            self.top.move_to_end(key)
+        else:
+            start = bisect_left(self.keys, (key,))
+            end = bisect_left(self.keys, (key + "\U0010ffff",), start)
+            top = heapq.nsmallest(
+                SUGGEST_TOP,
+                ((name, self.counts[name]) for _, name in self.keys[start:end]),
+                key=lambda item: (-item[1], item[0].lower()),
+            )
+            self.top[key] = top
+            if len(self.top) > self.memo_size:
+                self.top.popitem(last=False)
+        return top[:limit]
+
+    async def get(self, db: AsyncSession, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        if self.rebuild is None and self.stale:
+            self.rebuild = asyncio.create_task(self._rebuild(db))
+        if self.built_at is None:
+            # the first request waits, the loop serves other requests meanwhile
+            await asyncio.shield(self.rebuild)
+        return self.suggest(prefix, limit)
+
+
+tag_suggest = TagSuggestIndex(ttl=settings.tag_suggest_ttl, memo_size=settings.tag_suggest_memo_size)
+
 
 class TagServices:
     def __init__(self, model: Tag):
         self.model = model
 
-    # async def get_tags(skip: int, limit: int, db: Session) -> List[Tag]:
+    # async def get_tags(skip: int, limit: int, db: AsyncSession) -> List[Tag]:
     #     return db.query(Tag).offset(skip).limit(limit).all()
 
 
-    async def get_tag_by_name(self, db: Session, tag_name: str) -> Tag:
-        return db.query(Tag).filter(Tag.name == tag_name).first()
+    async def get_tag_by_name(self, db: AsyncSession, tag_name: str) -> Tag:
+        return await db.scalar(select(Tag).where(Tag.name == tag_name))
     
+    async def upsert_tags(self, db: AsyncSession, names: Iterable[str]) -> list[Tag]:
+        """
+        Теги за іменами одним запитом INSERT ... ON CONFLICT ... RETURNING,
+        відсутні створюються. Без commit - теги зберігаються в транзакції
+        разом зі світлиною.
+
+        ON CONFLICT DO UPDATE (а не DO NOTHING) повертає і наявні рядки,
+        і рядок, щойно вставлений паралельним завантаженням: запит чекає
+        на його транзакцію замість того, щоб пропустити тег.
+        """
+        names = list(dict.fromkeys(name.strip() for name in names if name.strip()))
+        if not names:
+            return []
+        dialects = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+        insert = dialects.get(db.get_bind().dialect.name)
+        if insert is None:
+            tags = {tag.name: tag for tag in await db.scalars(select(Tag).where(Tag.name.in_(names)))}
+            for name in names:
+                if name not in tags:
+                    tags[name] = Tag(name=name)
+                    db.add(tags[name])
+            await db.flush()
+        else:
+            # the same order of row locks in every upload, no deadlock between two of them
+            stmt = insert(Tag).values([{"name": name} for name in sorted(names)])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Tag.name], set_={"name": stmt.excluded.name}
+            ).returning(Tag)
+            result = await db.scalars(stmt, execution_options={"populate_existing": True})
+            tags = {tag.name: tag for tag in result}
+        return [tags[name] for name in names]
+
     # перевіряє існування тега і створює його при відсутності
-    async def create_or_get_tags(self, db: Session, tag_data: list[TagModel]) -> list[Tag]:
-        created_tags = []
-        for tag_model in tag_data:
-            tag = await self.get_tag_by_name(db, tag_model.name)
-            if not tag:
-                tag = await self.create_tag(db, tag_model)
-            created_tags.append(tag)
-        return created_tags
-
-    async def create_tag(self, db: Session, tag_model: TagModel) -> Tag:
+    async def create_or_get_tags(self, db: AsyncSession, tag_data: list[TagModel]) -> list[Tag]:
+        tags = await self.upsert_tags(db, [tag_model.name for tag_model in tag_data])
+        await db.commit()
+        tag_suggest.add([tag.name for tag in tags], images=0)
+        return tags
+
+    async def create_tag(self, db: AsyncSession, tag_model: TagModel) -> Tag:
         tag = Tag(name=tag_model.name)
         db.add(tag)
-        db.commit()
-        db.refresh(tag)
+        await db.commit()
+        await db.refresh(tag)
+        tag_suggest.add([tag.name], images=0)
         return tag
 
-    async def update_tag(self, tag_id: int, tag_model: TagModel, db: Session) -> Tag | None:
-        tag = db.query(Tag).filter(Tag.id == tag_id).first()
+    async def update_tag(self, tag_id: int, tag_model: TagModel, db: AsyncSession) -> Tag | None:
+        tag = await db.get(Tag, tag_id)
         if tag:
+            old_name, images = tag.name, tag_suggest.counts.get(tag.name, 0)
             tag.name = tag_model.name
-            db.commit()
+            await db.commit()
+            tag_suggest.remove(old_name)
+            tag_suggest.add([tag.name], images=images)
         return tag
 
-    async def remove_tag(self, tag_id: int, db: Session) -> Tag | None:
-        tag = db.query(Tag).filter(Tag.id == tag_id).first()
+    async def remove_tag(self, tag_id: int, db: AsyncSession) -> Tag | None:
+        tag = await db.get(Tag, tag_id)
         if tag:
-            db.delete(tag)
-            db.commit()
+            await db.delete(tag)
+            await db.commit()
+            tag_suggest.remove(tag.name)
         return tag
@@ -0,0 +1,254 @@
+# pixels_project\src\services\transforms.py
+import asyncio
+import multiprocessing
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+from src.conf.config import settings
+from src.services.imaging import CROPS, EFFECTS, FORMATS, render_file
+
+# short names of Cloudinary, they make the token of a derived file: a_90,c_fill,w_250
+ABBREVIATIONS = {"angle": "a", "crop": "c", "effect": "e", "format": "f", "height": "h", "width": "w"}
+NAMES = {v: k for k, v in ABBREVIATIONS.items()}
+
+# derived files are rendered on a request without auth: sizes are bounded, so a token
+# can not make a huge image; Pillow renders (not Cloudinary) take angles by this step only
+MAX_SIZE = 4096
+ANGLE_STEP = 45
+
+
+def normalize(**transformation) -> dict:
+    """
+    Трансформація без значень за замовчуванням, однакові трансформації - однаковий словник.
+
+    Невідома назва або значення - ValueError.
+    """
+    spec = {}
+    angle = int(transformation.pop("angle", None) or 0) % 360
+    if angle:
+        spec["angle"] = angle
+    for name in ("width", "height"):
+        value = transformation.pop(name, None)
+        if value is not None:
+            if not 1 <= int(value) <= MAX_SIZE:
+                raise ValueError(f"{name} must be from 1 to {MAX_SIZE}")
+            spec[name] = int(value)
+    crop = transformation.pop("crop", None) or "scale"
+    if crop not in CROPS:
+        raise ValueError(f"crop must be one of {CROPS}")
+    # without size crop does nothing
+    if crop != "scale" and ("width" in spec or "height" in spec):
+        spec["crop"] = crop
+    effect = transformation.pop("effect", None)
+    if effect is not None:
+        if effect not in EFFECTS:
+            raise ValueError(f"effect must be one of {EFFECTS}")
+        spec["effect"] = effect
+    format = transformation.pop("format", None)
+    if format is not None:
+        format = str(format).lower().replace("jpeg", "jpg")
+        if format not in FORMATS:
+            raise ValueError(f"format must be one of {tuple(FORMATS)}")
+        spec["format"] = format
+    if transformation:
+        raise ValueError(f"unknown transformation {sorted(transformation)}")
+    return spec
+
+
+def local_spec(**transformation) -> dict:
+    """
+    Трансформація для рендеру Pillow: normalize, кут - кратний ANGLE_STEP
+    """
+    spec = normalize(**transformation)
+    if spec.get("angle", 0) % ANGLE_STEP:
+        raise ValueError(f"angle must be a multiple of {ANGLE_STEP}")
+    return spec
+
+
+def spec_token(spec: dict) -> str:
+    return ",".join(f"{ABBREVIATIONS[name]}_{spec[name]}" for name in sorted(spec))
+
+
+def parse_token(token: str) -> dict:
+    """
+    Трансформація з токена spec_token, ValueError - токен не нормалізований
+    """
+    transformation = {}
+    for part in token.split(","):
+        short, _, value = part.partition("_")
+        if short not in NAMES or not value:
+            raise ValueError(token)
+        name = NAMES[short]
+        transformation[name] = int(value) if name in ("angle", "width", "height") else value
+    spec = local_spec(**transformation)
+    if spec_token(spec) != token:
+        raise ValueError(token)
+    return spec
+
+
+class DerivedCache:
+    """
+    Похідні зображення на диску, LRU за сумарним розміром файлів.
+
+    Ім'я файлу - <source>/<token>.<signature>.<ext>: source - sha256 оригіналу,
+    token - нормалізована трансформація, signature - підпис LocalStorage. Індекс у пам'яті будується
+    з каталогу при першому зверненні; файл, видалений іншим процесом, - промах.
+    """
+
+    def __init__(self, root: str | Path, max_bytes: int) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, int] | None = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def entries(self) -> OrderedDict[str, int]:
+        if self._entries is None:
+            files = sorted(
+                (p.stat().st_mtime, p.relative_to(self.root).as_posix(), p.stat().st_size)
+                for p in self.root.glob("*/*")
+                if p.is_file() and not p.name.startswith(".")
+            )
+            self._entries = OrderedDict((name, size) for _, name, size in files)
+            self.size = sum(self._entries.values())
+        return self._entries
+
+    def path(self, name: str) -> Path:
+        return self.root / name
+
+    def get(self, name: str) -> Path | None:
+        entries = self.entries
+        path = self.path(name)
+        if name in entries and path.exists():
+            entries.move_to_end(name)
+            self.hits += 1
+            return path
+        if name in entries:
+            self.size -= entries.pop(name)
+        self.misses += 1
+        return None
+
+    def write(self, name: str, data: bytes) -> Path:
+        """
+        Запис файлу (у потоці), індекс оновлює add
+        """
+        path = self.path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{time.monotonic_ns()}")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+        return path
+
+    def add(self, name: str, size: int) -> None:
+        entries = self.entries
+        self.size += size - entries.pop(name, 0)
+        entries[name] = size
+        while self.size > self.max_bytes and len(entries) > 1:
+            evicted, evicted_size = entries.popitem(last=False)
+            self.size -= evicted_size
+            self.path(evicted).unlink(missing_ok=True)
+            self.evictions += 1
+
+    def drop(self, source: str) -> None:
+        """
+        Всі похідні оригіналу source (оригінал видалено)
+        """
+        for name in [n for n in self.entries if n.startswith(f"{source}/")]:
+            self.size -= self.entries.pop(name)
+            self.path(name).unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+class TransformEngine:
+    """
+    Трансформації Pillow в пулі процесів з кешем похідних зображень.
+
+    Повторний запит тієї самої трансформації - файл з кешу без рендеру,
+    одночасні однакові запити чекають один рендер.
+    """
+
+    def __init__(self, cache: DerivedCache, workers: int = 2) -> None:
+        self.cache = cache
+        self.workers = workers
+        self._executor: ProcessPoolExecutor | None = None
+        self._pending: dict[str, asyncio.Future] = {}
+        self.renders = 0
+        self.coalesced = 0
+        self.render_total = 0.0
+        self.render_max = 0.0
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: a fork of the server process would copy its threads and sockets
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def _render(self, source: Path, name: str, spec: dict) -> Path:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        data, _ = await loop.run_in_executor(self.executor, partial(render_file, str(source), **spec))
+        path = await asyncio.to_thread(self.cache.write, name, data)
+        self.cache.add(name, len(data))
+        spent = time.perf_counter() - started
+        self.renders += 1
+        self.render_total += spent
+        self.render_max = max(self.render_max, spent)
+        return path
+
+    async def derive(self, source: Path, name: str, spec: dict) -> Path:
+        """
+        Файл похідного зображення name з оригіналу source
+        """
+        path = self.cache.get(name)
+        if path is not None:
+            return path
+        task = self._pending.get(name)
+        if task is None:
+            task = asyncio.ensure_future(self._render(source, name, spec))
+            self._pending[name] = task
+            task.add_done_callback(lambda _: self._pending.pop(name, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "in_flight": len(self._pending),
+            "renders": self.renders,
+            "coalesced": self.coalesced,
+            "render_avg_ms": round(self.render_total / self.renders * 1000, 3) if self.renders else 0.0,
+            "render_max_ms": round(self.render_max * 1000, 3),
+            "cache": self.cache.stats(),
+        }
+
+
+def build_engine(root: str | Path) -> TransformEngine:
+    return TransformEngine(
+        DerivedCache(root, settings.transform_cache_max_bytes), workers=settings.transform_workers
+    )
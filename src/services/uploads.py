@@ -0,0 +1,83 @@
+# pixels_project\src\services\uploads.py
+from typing import AsyncIterator, Protocol
+
+from fastapi import HTTPException, status
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.conf import messages
+from src.conf.config import settings
+
+
+class UploadTooLarge(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=messages.UPLOAD_TOO_LARGE,
+        )
+
+
+class AsyncFile(Protocol):
+    async def read(self, size: int = -1) -> bytes: ...
+
+    async def seek(self, offset: int) -> None: ...
+
+
+async def iter_upload(
+    file: AsyncFile,
+    chunk_size: int = settings.upload_chunk_size,
+    max_size: int = settings.upload_max_size,
+) -> AsyncIterator[bytes]:
+    """
+    Файл від початку частинами по chunk_size байт, UploadTooLarge після max_size байт
+    """
+    await file.seek(0)
+    size = 0
+    while chunk := await file.read(chunk_size):
+        size += len(chunk)
+        if size > max_size:
+            raise UploadTooLarge()
+        yield chunk
+
+
+class BodySizeLimitMiddleware:
+    """
+    Обмеження розміру тіла запиту.
+
+    Content-Length більше max_size - 413 одразу, до читання тіла; тіло без
+    Content-Length (chunked) рахується під час читання і обривається з 413,
+    щойно перевищить max_size. Starlette зберігає файли форми в
+    SpooledTemporaryFile, тож у пам'яті лишається не більше 1 МБ на файл.
+    """
+
+    def __init__(self, app: ASGIApp, max_size: int = settings.upload_max_size):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        length = headers.get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_size:
+            response = JSONResponse(
+                {"detail": messages.UPLOAD_TOO_LARGE},
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                headers={"Connection": "close"},
+            )
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_size:
+                    raise UploadTooLarge()
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,257 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import msgpack
+from redis.asyncio import Redis
+
+from src.conf.config import settings
+from src.database.models import Role, User
+from src.database.redis_pool import listen_channel
+
+# bump it when fields of CachedUser change, old entries are treated as cache miss
+SCHEMA_VERSION = 1
+
+USER_PREFIX = "user:"
+USER_CHANNEL = "user_invalidate"
+
+
+class CachedUser:
+    """
+    Snapshot of authenticated user kept in cache instead of ORM object.
+    It is detached from database session, use id to load User for changes.
+    """
+
+    __slots__ = (
+        "id",
+        "email",
+        "username",
+        "role",
+        "active",
+        "confirmed",
+        "avatar",
+        "created_at",
+    )
+
+    def __init__(
+        self,
+        id: int,
+        email: str,
+        username: str,
+        role: Role,
+        active: bool,
+        confirmed: bool,
+        avatar: str | None,
+        created_at: datetime | None,
+    ) -> None:
+        self.id = id
+        self.email = email
+        self.username = username
+        self.role = role
+        self.active = active
+        self.confirmed = confirmed
+        self.avatar = avatar
+        self.created_at = created_at
+
+    @classmethod
+    def from_user(cls, user: User) -> "CachedUser":
+        return cls(
+            id=user.id,  # type: ignore
+            email=user.email,  # type: ignore
+            username=user.username,  # type: ignore
+            role=user.role or Role.user,  # type: ignore
+            active=bool(user.active),
+            confirmed=bool(user.confirmed),
+            avatar=user.avatar,  # type: ignore
+            created_at=user.created_at,  # type: ignore
+        )
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CachedUser):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"CachedUser(id={self.id}, email={self.email!r}, role={self.role})"
+
+
+def encode_user(user: CachedUser) -> bytes:
+    """Serialize user to bytes: schema version byte + msgpack array of fields
+
+    :param user: The user.
+    :type user: CachedUser
+    :return: Payload for cache.
+    :rtype: bytes
+    """
+    fields = (
+        user.id,
+        user.email,
+        user.username,
+        user.role.value,
+        user.active,
+        user.confirmed,
+        user.avatar,
+        user.created_at.isoformat() if user.created_at else None,
+    )
+    return bytes((SCHEMA_VERSION,)) + msgpack.packb(fields)
+
+
+def decode_user(data: bytes | None) -> CachedUser | None:
+    """Deserialize user from cache payload
+
+    :param data: Payload from cache.
+    :type data: bytes | None
+    :return: The user, None for empty, broken or other schema version payload.
+    :rtype: CachedUser | None
+    """
+    if not data or data[0] != SCHEMA_VERSION:
+        return None
+    try:
+        id, email, username, role, active, confirmed, avatar, created_at = msgpack.unpackb(
+            data[1:]
+        )
+        return CachedUser(
+            id=id,
+            email=email,
+            username=username,
+            role=Role(role),
+            active=active,
+            confirmed=confirmed,
+            avatar=avatar,
+            created_at=datetime.fromisoformat(created_at) if created_at else None,
+        )
+    except (ValueError, TypeError, msgpack.UnpackException):
+        return None
+
+
+class LocalUserCache:
+    """
+    Per-worker LRU of users in front of Redis, entries live at most ttl seconds.
+    Short ttl bounds staleness if an invalidation message was missed.
+    maxsize=0 disables the cache.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, CachedUser]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    def get(self, email: str) -> CachedUser | None:
+        entry = self._data.get(email)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires, user = entry
+        if expires <= time.monotonic():
+            del self._data[email]
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(email)
+        self.hits += 1
+        return user
+
+    def set(self, email: str, user: CachedUser) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[email] = (time.monotonic() + self.ttl, user)
+        self._data.move_to_end(email)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, email: str) -> None:
+        if self._data.pop(email, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "invalidations": self.invalidations,
+        }
+
+
+local_cache = LocalUserCache(
+    maxsize=settings.user_cache_local_size, ttl=settings.user_cache_local_ttl
+)
+
+
+async def get_user(email: str, r: Redis) -> CachedUser | None:
+    """Look user up in local cache, then in Redis
+
+    :param email: Email of user.
+    :type email: str
+    :param r: Redis connection
+    :type r: Redis
+    :return: The user, None on miss in both tiers.
+    :rtype: CachedUser | None
+    """
+    user = local_cache.get(email)
+    if user is None:
+        user = decode_user(await r.get(f"{USER_PREFIX}{email}"))
+        if user is not None:
+            local_cache.set(email, user)
+    return user
+
+
+async def set_user(user: CachedUser, r: Redis) -> None:
+    """Store user in both tiers
+
+    :param user: The user.
+    :type user: CachedUser
+    :param r: Redis connection
+    :type r: Redis
+    """
+    await r.set(f"{USER_PREFIX}{user.email}", encode_user(user), ex=settings.user_cache_ttl)
+    local_cache.set(user.email, user)
+
+
+async def invalidate_user(email: str, r: Redis) -> None:
+    """Remove user from both tiers and tell other workers to drop it too
+
+    :param email: Email of user.
+    :type email: str
+    :param r: Redis connection
+    :type r: Redis
+    """
+    local_cache.invalidate(email)
+    await r.delete(f"{USER_PREFIX}{email}")
+    await r.publish(USER_CHANNEL, email)
+
+
+async def listen_invalidations(r: Redis, ready: asyncio.Event | None = None) -> None:
+    """Drop users changed by other workers from local cache, run it as background task
+
+    The local cache is cleared on every (re)subscribe, including silent
+    reconnects of redis-py, because invalidations published meanwhile were missed.
+
+    :param r: Redis connection
+    :type r: Redis
+    :param ready: Set when subscription is active
+    :type ready: asyncio.Event | None
+    """
+
+    async def clear() -> None:
+        local_cache.clear()
+
+    await listen_channel(r, USER_CHANNEL, local_cache.invalidate, clear, ready)
@@ -1,14 +1,18 @@
+from contextlib import contextmanager
 from datetime import datetime
 import os
 from pathlib import Path
 import sys
 import redis
+import fakeredis.aioredis
 from unittest.mock import AsyncMock, MagicMock
 import pytest
 from fastapi.testclient import TestClient
 from fastapi_limiter.depends import RateLimiter
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
 curr_path = Path(__file__).resolve().parent
 hw_path: str = str(curr_path.parent)
@@ -20,6 +24,7 @@ sys.path.append(hw_path)
 from main import app
 from src.database.models import Base
 from src.database.db import get_db
+from src.services.user_cache import LocalUserCache
 
 db_path = curr_path / "db.sqlite"
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{db_path}"
@@ -29,6 +34,54 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# the application works through AsyncSession, TestClient runs every request
+# in own event loop, so connections can't be pooled between requests
+async_engine = create_async_engine(
+    f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool
+)
+TestingAsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+
+@contextmanager
+def count_queries(bind=async_engine):
+    """
+    Collect SQL statements executed by the application while the block runs.
+
+    with count_queries() as statements:
+        ...
+    assert len(statements) == 2, statements
+    """
+    statements: list[str] = []
+    sync_engine = getattr(bind, "sync_engine", bind)
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture()
+def assert_max_queries():
+    """
+    Fail when the block runs more SQL statements than expected (N+1 regressions).
+    """
+
+    @contextmanager
+    def check(limit: int, bind=async_engine):
+        with count_queries(bind) as statements:
+            yield statements
+        assert len(statements) <= limit, (
+            f"{len(statements)} queries, expected at most {limit}:\n" + "\n".join(statements)
+        )
+
+    return check
+
 
 @pytest.fixture(scope="module")
 def session():
@@ -52,11 +105,11 @@ def mock_ratelimiter(monkeypatch):
     monkeypatch.setattr(
         "fastapi_limiter.FastAPILimiter.http_callback", mock_rate_limiter
     )
-    mock_redis = MagicMock(return_value=None)
-    monkeypatch.setattr("src.services.auth.auth_service.r.delete", mock_redis)
-    monkeypatch.setattr("src.services.auth.auth_service.r.set", mock_redis)
+    mock_redis = AsyncMock(return_value=None)
+    # user's cache is always missed, black list of tokens works on fake Redis
+    monkeypatch.setattr("src.services.user_cache.local_cache", LocalUserCache(maxsize=0))
+    monkeypatch.setattr("src.services.auth.auth_service.r", fakeredis.aioredis.FakeRedis())
     monkeypatch.setattr("src.services.auth.auth_service.r.get", mock_redis)
-    monkeypatch.setattr("src.services.auth.auth_service.r.expire", mock_redis)
 
 
 @pytest.fixture(scope="module")
@@ -66,11 +119,9 @@ def client(session):
     class Empty:
         ...
 
-    def override_get_db():
-        try:
-            yield session
-        finally:
-            session.close()
+    async def override_get_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
 
     async def override_get_limit():
         return None
@@ -0,0 +1,138 @@
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.database.models import Base, Bannedlist, Comment, Image, Role, Tag, User, image_m2m_tag
+from src.repository import comments as repository_comments
+from src.repository import logout as repository_logout
+from src.repository import profile as repository_profile
+from src.repository import users as repository_users
+from src.services.pagination import encode_cursor
+from src.services.posts import post as post_services
+
+USERS, IMAGES, COMMENTS, TAGS = 20, 2000, 6000, 100
+START = datetime(2023, 1, 1)
+
+
+@pytest.fixture(scope="module")
+def seeded_db(tmp_path_factory):
+    path = tmp_path_factory.mktemp("explain") / "db.sqlite"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User.__table__),
+            [
+                {
+                    "id": u,
+                    "username": f"user{u}",
+                    "email": f"user{u}@example.com",
+                    "password": "x",
+                    "roles": Role.admin.name if u == 1 else Role.user.name,
+                    "active": True,
+                    "confirmed": True,
+                }
+                for u in range(1, USERS + 1)
+            ],
+        )
+        conn.execute(insert(Tag.__table__), [{"id": t, "name": f"tag_{t}"} for t in range(1, TAGS + 1)])
+        conn.execute(
+            insert(Image.__table__),
+            [
+                {
+                    "id": i,
+                    "owner_id": i % USERS + 1,
+                    "url_original": f"url_{i}",
+                    "url_original_qr": "",
+                    "description": f"post {i}",
+                    "crated_at": START + timedelta(minutes=i),
+                }
+                for i in range(1, IMAGES + 1)
+            ],
+        )
+        conn.execute(
+            insert(image_m2m_tag),
+            [
+                {"image_id": i, "tag_id": (i + k) % TAGS + 1}
+                for i in range(1, IMAGES + 1)
+                for k in (0, TAGS // 2)
+            ],
+        )
+        conn.execute(
+            insert(Comment.__table__),
+            [
+                {
+                    "comment": f"comment {c}",
+                    "image_id": c % IMAGES + 1,
+                    "owner_id": c % USERS + 1,
+                    "crated_at": START + timedelta(minutes=c),
+                }
+                for c in range(1, COMMENTS + 1)
+            ],
+        )
+        conn.execute(
+            insert(Bannedlist.__table__),
+            [{"token": f"token {b}", "crated_at": START + timedelta(hours=b)} for b in range(500)],
+        )
+        conn.execute(text("ANALYZE"))
+    engine.dispose()
+    return path
+
+
+def capture_hot_queries(path) -> list[tuple[str, tuple]]:
+    """Run hot paths of the application and collect their SQL with parameters."""
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    statements: list[tuple[str, tuple]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "DELETE")):
+            statements.append((statement, tuple(parameters)))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+    async def run():
+        SessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+        async with SessionLocal() as db:
+            user = await repository_users.get_user_by_email("user3@example.com", db)
+            await repository_users.is_present_admin(db)
+            await repository_profile.read_profile(user, db)
+            cursor = encode_cursor(START + timedelta(minutes=1000), 1000)
+            await post_services.get_post_list_by_user_paginated(
+                db=db, user_id=user.id, limit=10, cursor=cursor
+            )
+            await post_services.search_posts_paginated(db=db, tag="tag_5", limit=10)
+            await repository_comments.get_comments(10, 10, 0, db, encode_cursor(START, 1))
+            await repository_logout.purge_old(db, duration=7)
+        await async_engine.dispose()
+
+    asyncio.run(run())
+    return statements
+
+
+def test_hot_queries_use_indexes(seeded_db):
+    statements = capture_hot_queries(seeded_db)
+    assert len(statements) >= 9
+    conn = sqlite3.connect(seeded_db)
+    problems = []
+    for statement, parameters in statements:
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+        # "SCAN images" is a sequential scan, "SCAN images USING INDEX" walks an index in order
+        full_scans = [step for step in plan if step.startswith("SCAN") and "USING" not in step]
+        if full_scans:
+            problems.append(f"{statement}\n  {plan}")
+    conn.close()
+    assert not problems, "sequential scan in hot query:\n" + "\n".join(problems)
+
+
+def test_lists_are_ordered_by_index(seeded_db):
+    conn = sqlite3.connect(seeded_db)
+    for statement, parameters in capture_hot_queries(seeded_db):
+        if "ORDER BY" in statement and "LIMIT" in statement and "JOIN" not in statement:
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+            assert not any("TEMP B-TREE" in step for step in plan), f"{statement}\n{plan}"
+    conn.close()
@@ -1,3 +1,4 @@
+import asyncio
 import os
 from pathlib import Path
 from unittest.mock import MagicMock
@@ -9,6 +10,7 @@ os.environ["PATH"] += os.pathsep + hw_path
 from src.conf import messages
 from src.database.models import User, Bannedlist
 from src.services.auth import auth_service
+from src.services.hashing import PasswordHasher
 
 
 
@@ -130,6 +132,38 @@ def test_login_wrong_email(client, user, mock_ratelimiter):
     assert data["detail"] == messages.AUTH_EMAIL_INVALID
 
 
+def test_login_hasher_busy(client, user, mock_ratelimiter, monkeypatch):
+    hasher = PasswordHasher(rounds=4, workers=1, queue_size=0)
+    hasher.in_flight = 1
+    monkeypatch.setattr("src.services.auth.auth_service.hasher", hasher)
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get("email"), "password": user.get("password")},
+    )
+    assert response.status_code == 503, response.text
+    assert response.headers["Retry-After"]
+    assert response.json()["detail"] == messages.AUTH_BUSY
+
+
+def test_login_rehash_password(client, user, mock_ratelimiter, session, monkeypatch):
+    current_user: User = (
+        session.query(User).filter(User.email == user.get("email")).first()
+    )
+    old_hash = current_user.password
+    monkeypatch.setattr(
+        "src.services.auth.auth_service.hasher", PasswordHasher(rounds=5)
+    )
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get("email"), "password": user.get("password")},
+    )
+    assert response.status_code == 200, response.text
+    session.expire_all()
+    new_hash = session.query(User.password).filter(User.email == user.get("email")).scalar()
+    assert new_hash != old_hash
+    assert new_hash.startswith("$2b$05$")
+
+
 def test_refresh_token_user(client, user, mock_ratelimiter, session):
     response = client.post(
         "/api/auth/login",
@@ -248,10 +282,9 @@ def test_logout_user(client, next_user, mock_ratelimiter, monkeypatch, session):
 
     response = client.get("/api/auth/logout", headers=headers)
     assert response.status_code == 204, response.text
-    bann: Bannedlist = (
-        session.query(Bannedlist).filter(Bannedlist.token == token).first()
-    )
-    assert bann is not None
+    assert asyncio.run(auth_service.is_token_revoked(token))
+    response = client.get("/api/auth/logout", headers=headers)
+    assert response.status_code == 401, response.text
     response = client.get("/api/users/me/", headers=headers)
     assert response.status_code == 401, response.text
     data = response.json()
@@ -1,8 +1,9 @@
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
 from src.database.models import User, Comment, Image, Role
+from src.repository import users as repository_users
 from src.services.auth import auth_service
 from src.conf import messages
 
@@ -122,7 +123,7 @@ def token_moderator(client, next_user_moderator):
 
 
 def test_create_comment_by_admin(client, user_admin, token_admin, session):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # create image
@@ -148,7 +149,7 @@ def test_create_comment_by_admin(client, user_admin, token_admin, session):
 
 
 def test_create_comment_by_user(client, user_simple, token_user, session):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # create image
@@ -174,7 +175,7 @@ def test_create_comment_by_user(client, user_simple, token_user, session):
 
 
 def test_create_comment_by_moderator(client, user_moderator, token_moderator, session):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # create image
@@ -200,7 +201,7 @@ def test_create_comment_by_moderator(client, user_moderator, token_moderator, se
 
 
 def test_create_comment_by_admin_image_not_found(client, user_admin, token_admin):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image_id = 10
@@ -219,7 +220,7 @@ def test_create_comment_by_admin_image_not_found(client, user_admin, token_admin
 
 
 def test_create_comment_by_user_image_not_found(client, user_simple, token_admin):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image_id = 10
@@ -240,7 +241,7 @@ def test_create_comment_by_user_image_not_found(client, user_simple, token_admin
 def test_create_comment_by_moderator_image_not_found(
     client, user_moderator, token_admin
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image_id = 10
@@ -259,7 +260,7 @@ def test_create_comment_by_moderator_image_not_found(
 
 
 def test_get_comments_by_admin(client, user_admin, token_admin, session, monkeypatch):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image = session.query(Image).filter(Image.owner == user_admin).first()
@@ -278,7 +279,7 @@ def test_get_comments_by_admin(client, user_admin, token_admin, session, monkeyp
 
 
 def test_get_comments_by_user(client, user_simple, token_user, session, monkeypatch):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image = session.query(Image).filter(Image.owner == user_simple).first()
@@ -297,7 +298,7 @@ def test_get_comments_by_user(client, user_simple, token_user, session, monkeypa
 def test_get_comments_by_moderator(
     client, user_moderator, token_moderator, session, monkeypatch
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image = session.query(Image).filter(Image.owner == user_moderator).first()
@@ -318,7 +319,7 @@ def test_get_comments_by_moderator(
 def test_get_comments_by_admin_image_not_found(
     client, user_admin, token_admin, session, monkeypatch
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image_id = 10
@@ -338,7 +339,7 @@ def test_get_comments_by_admin_image_not_found(
 def test_get_comments_by_user_image_not_found(
     client, user_simple, token_user, session, monkeypatch
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image_id = 10
@@ -358,7 +359,7 @@ def test_get_comments_by_user_image_not_found(
 def test_get_comments_by_moderator_image_not_found(
     client, user_moderator, token_moderator, session, monkeypatch
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image_id = 10
@@ -376,7 +377,7 @@ def test_get_comments_by_moderator_image_not_found(
 
 
 def test_get_comment_by_admin(client, user_admin, token_admin, session, monkeypatch):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -399,7 +400,7 @@ def test_get_comment_by_admin(client, user_admin, token_admin, session, monkeypa
 
 
 def test_get_comment_by_user(client, user_simple, token_user, session, monkeypatch):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -424,7 +425,7 @@ def test_get_comment_by_user(client, user_simple, token_user, session, monkeypat
 def test_get_comment_by_moderator(
     client, user_moderator, token_moderator, session, monkeypatch
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -449,7 +450,7 @@ def test_get_comment_by_moderator(
 def test_get_comment_by_admin_image_not_found(
     client, user_admin, token_admin, session, monkeypatch
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image_id = 10
@@ -471,7 +472,7 @@ def test_get_comment_by_admin_image_not_found(
 def test_get_comment_by_user_image_not_found(
     client, user_simple, token_user, session, monkeypatch
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image_id = 10
@@ -493,7 +494,7 @@ def test_get_comment_by_user_image_not_found(
 def test_get_comment_by_moderator_image_not_found(
     client, user_moderator, token_moderator, session, monkeypatch
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image_id = 10
@@ -515,7 +516,7 @@ def test_get_comment_by_moderator_image_not_found(
 def test_get_comment_by_admin_comment_not_found(
     client, user_admin, token_admin, session, monkeypatch
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -538,7 +539,7 @@ def test_get_comment_by_admin_comment_not_found(
 def test_get_comment_by_user_comment_not_found(
     client, user_simple, token_user, session, monkeypatch
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -561,7 +562,7 @@ def test_get_comment_by_user_comment_not_found(
 def test_get_comment_by_moderator_comment_not_found(
     client, user_moderator, token_moderator, session, monkeypatch
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -582,7 +583,7 @@ def test_get_comment_by_moderator_comment_not_found(
 
 
 def test_update_comment_by_admin(client, user_admin, token_admin, session):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -605,7 +606,7 @@ def test_update_comment_by_admin(client, user_admin, token_admin, session):
 
 
 def test_update_comment_by_user(client, user_simple, token_user, session):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -628,7 +629,7 @@ def test_update_comment_by_user(client, user_simple, token_user, session):
 
 
 def test_update_comment_by_moderator(client, user_moderator, token_moderator, session):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -653,7 +654,7 @@ def test_update_comment_by_moderator(client, user_moderator, token_moderator, se
 def test_update_comment_by_admin_image_not_found(
     client, user_admin, token_admin, session
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image_id = 10
@@ -676,7 +677,7 @@ def test_update_comment_by_admin_image_not_found(
 def test_update_comment_by_user_image_not_found(
     client, user_simple, token_user, session
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image_id = 10
@@ -699,7 +700,7 @@ def test_update_comment_by_user_image_not_found(
 def test_update_comment_by_moderator_image_not_found(
     client, user_moderator, token_moderator, session
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image_id = 10
@@ -722,7 +723,7 @@ def test_update_comment_by_moderator_image_not_found(
 def test_update_comment_by_admin_comment_not_found(
     client, user_admin, token_admin, session
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -746,7 +747,7 @@ def test_update_comment_by_admin_comment_not_found(
 def test_update_comment_by_user_comment_not_found(
     client, user_simple, token_user, session
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -770,7 +771,7 @@ def test_update_comment_by_user_comment_not_found(
 def test_update_comment_by_moderator_comment_not_found(
     client, user_moderator, token_moderator, session
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -792,7 +793,7 @@ def test_update_comment_by_moderator_comment_not_found(
 
 
 def test_delete_comment_by_admin(client, user_admin, token_admin, session):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -811,7 +812,7 @@ def test_delete_comment_by_admin(client, user_admin, token_admin, session):
 
 
 def test_delete_comment_by_user(client, user_simple, token_user, session):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -830,7 +831,7 @@ def test_delete_comment_by_user(client, user_simple, token_user, session):
 
 
 def test_delete_comment_by_moderator(client, user_moderator, token_moderator, session):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -849,7 +850,7 @@ def test_delete_comment_by_moderator(client, user_moderator, token_moderator, se
 
 
 def test_delete_comment_by_admin_repeat(client, user_admin, token_admin, session):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -870,7 +871,7 @@ def test_delete_comment_by_admin_repeat(client, user_admin, token_admin, session
 
 
 def test_delete_comment_by_user_repeat(client, user_simple, token_user, session):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -891,7 +892,7 @@ def test_delete_comment_by_user_repeat(client, user_simple, token_user, session)
 def test_delete_comment_by_moderator_repeat(
     client, user_moderator, token_moderator, session
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -914,7 +915,7 @@ def test_delete_comment_by_moderator_repeat(
 def test_delete_comment_by_admin_image_not_found(
     client, user_admin, token_admin, session
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image_id = 10
@@ -936,7 +937,7 @@ def test_delete_comment_by_admin_image_not_found(
 def test_delete_comment_by_user_image_not_found(
     client, user_simple, token_user, session
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image_id = 10
@@ -956,7 +957,7 @@ def test_delete_comment_by_user_image_not_found(
 def test_delete_comment_by_moderator_image_not_found(
     client, user_moderator, token_moderator, session
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         image_id = 10
@@ -978,7 +979,7 @@ def test_delete_comment_by_moderator_image_not_found(
 def test_delete_comment_by_admin_comment_not_found(
     client, user_admin, token_admin, session
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -1001,7 +1002,7 @@ def test_delete_comment_by_admin_comment_not_found(
 def test_delete_comment_by_user_comment_not_found(
     client, user_simple, token_user, session
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -1022,7 +1023,7 @@ def test_delete_comment_by_user_comment_not_found(
 def test_delete_comment_by_moderator_comment_not_found(
     client, user_moderator, token_moderator, session
 ):
-    with patch.object(auth_service, "r") as r_mock:
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
         r_mock.get.return_value = None
 
         # get image
@@ -1039,4 +1040,65 @@ def test_delete_comment_by_moderator_comment_not_found(
         # tests
         assert response.status_code == 404, response.text
         data = response.json()
-        assert data["detail"] == messages.COMMENT_NOT_FOUND
\ No newline at end of file
+        assert data["detail"] == messages.COMMENT_NOT_FOUND
+
+def test_get_comments_loads_user_once(client, user_admin, token_admin, session):
+    # RoleAccess and the route both depend on the current user
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock, patch.object(
+        repository_users,
+        "get_user_by_email",
+        new=AsyncMock(wraps=repository_users.get_user_by_email),
+    ) as get_user_mock:
+        r_mock.get.return_value = None
+        r_mock.exists.return_value = 0
+
+        image = session.query(Image).filter(Image.owner == user_admin).first()
+
+        response = client.get(
+            f"/api/comments/{image.id}/",
+            headers={"Authorization": f"Bearer {token_admin}"},
+        )
+
+        assert response.status_code == 200, response.text
+        assert get_user_mock.await_count == 1
+
+
+def test_get_comments_cursor(client, user_admin, token_admin, session):
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
+        r_mock.get.return_value = None
+        r_mock.exists.return_value = 0
+
+        image = session.query(Image).filter(Image.owner == user_admin).first()
+        session.add_all(
+            [Comment(comment=f"page {i}", image_id=image.id, owner_id=user_admin.id) for i in range(2)]
+        )
+        session.commit()
+        headers = {"Authorization": f"Bearer {token_admin}"}
+
+        expected = client.get(f"/api/comments/{image.id}/?limit=100", headers=headers).json()
+        pages, cursor = [], None
+        while True:
+            url = f"/api/comments/{image.id}/?limit=1" + (f"&cursor={cursor}" if cursor else "")
+            response = client.get(url, headers=headers)
+            assert response.status_code == 200, response.text
+            pages.extend(response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+
+        assert len(expected) >= 2
+        assert [c["id"] for c in pages] == [c["id"] for c in expected]
+
+
+def test_get_comments_invalid_cursor(client, user_admin, token_admin, session):
+    with patch.object(auth_service, "r", new_callable=AsyncMock) as r_mock:
+        r_mock.get.return_value = None
+        r_mock.exists.return_value = 0
+
+        image = session.query(Image).filter(Image.owner == user_admin).first()
+        response = client.get(
+            f"/api/comments/{image.id}/?cursor=broken",
+            headers={"Authorization": f"Bearer {token_admin}"},
+        )
+        assert response.status_code == 400, response.text
+        assert response.json()["detail"] == messages.PAGINATION_INVALID_CURSOR
@@ -2,3 +2,530 @@
 
 # проведено QA тестування функціональності роботи зі світлинами
 
+
+import asyncio
+import io
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import fakeredis
+import pytest
+from fastapi_limiter.depends import RateLimiter
+from PIL import Image as PILImage
+
+from main import app
+from src.database.models import Image, Tag, User
+from src.conf.config import settings
+from src.routes import static
+from src.services.cloudinary_srv import cloudinary_client
+from src.services.jobs import DONE, FAILED, JobContext, JobWorker, job_queue
+from src.services.qr import QRSpec, qr_renderer
+from src.services.qr_pipeline import DELAYED, PENDING, qr_pipeline
+from src.services.storage import LocalStorage, get_storage
+from src.services.tags import tag_suggest
+from tests.conftest import TestingAsyncSessionLocal, count_queries
+
+
+@pytest.fixture()
+def posts_owner(client, user, mock_ratelimiter, session, monkeypatch):
+    monkeypatch.setattr("libgravatar.Gravatar.get_image", MagicMock(return_value="MOC_AVATAR"))
+    monkeypatch.setattr("fastapi.BackgroundTasks.add_task", MagicMock())
+    client.post("/api/auth/signup", json=user)
+
+    owner: User = session.query(User).filter(User.email == user.get("email")).first()
+    owner.confirmed = True
+    owner.active = True
+    if not owner.images:
+        for i in range(5):
+            session.add(
+                Image(
+                    owner=owner,
+                    url_original=f"url_{i}",
+                    url_original_qr="",
+                    description=f"post {i}",
+                    tags=[Tag(name=f"tag_{i}"), Tag(name=f"other_{i}")],
+                )
+            )
+    session.commit()
+    return owner
+
+
+@pytest.fixture()
+def token(client, user, posts_owner):
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get("email"), "password": user.get("password")},
+    )
+    return response.json()["access_token"]
+
+
+def test_post_list_by_user_queries(client, posts_owner, token, assert_max_queries):
+    # user, page of images, tags of the whole page - not one query per post
+    with assert_max_queries(3):
+        response = client.get(
+            f"/posts/user/{posts_owner.id}?limit=10",
+            headers={"Authorization": f"Bearer {token}"},
+        )
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert len(data) == 5
+    assert all(len(post["tags"]) == 2 for post in data)
+
+
+def test_search_post_queries(client, posts_owner, assert_max_queries):
+    with count_queries() as one_post:
+        response = client.get("/posts/search/?tag=tag_1")
+    assert response.status_code == 200, response.text
+    assert set(response.json()[0]["tags"]) == {"tag_1", "other_1"}
+
+    with assert_max_queries(len(one_post)):
+        response = client.get("/posts/search/?description=post")
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 5
+
+
+def test_search_post_fulltext(client, posts_owner):
+    response = client.get(
+        "/posts/search/?mode=fulltext&description=pos&limit=3", headers={"Origin": "https://example.com"}
+    )
+    assert response.status_code == 200, response.text
+    first = response.json()
+    assert len(first) == 3
+    assert all("rank" in post for post in first)
+    cursor = response.headers["X-Next-Cursor"]
+    # readable by a script of another origin
+    assert response.headers["Access-Control-Expose-Headers"] == "X-Next-Cursor"
+
+    response = client.get(f"/posts/search/?mode=fulltext&description=pos&limit=3&cursor={cursor}")
+    assert response.status_code == 200, response.text
+    rest = response.json()
+    assert len(rest) == 2
+    assert "X-Next-Cursor" not in response.headers
+    assert {p["id"] for p in first + rest} == {i.id for i in posts_owner.images}
+
+    response = client.get("/posts/search/?mode=fulltext&description=post&tags=tag_2&tags=other_2")
+    assert response.status_code == 200, response.text
+    assert [set(p["tags"]) for p in response.json()] == [{"tag_2", "other_2"}]
+
+    # tags without words of the query
+    for query in ("tags=tag_2", "tag=tag_2&description=%21%21"):
+        response = client.get(f"/posts/search/?mode=fulltext&{query}")
+        assert response.status_code == 200, response.text
+        assert [set(p["tags"]) for p in response.json()] == [{"tag_2", "other_2"}]
+    assert client.get("/posts/search/?mode=fulltext").status_code == 404
+
+    response = client.get("/posts/search/?mode=fulltext&description=missing")
+    assert response.status_code == 404, response.text
+
+
+def test_search_post_fuzzy(client, posts_owner):
+    response = client.get("/posts/search/fuzzy?q=psot%203")
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data[0]["description"] == "post 3"
+    assert data[0]["similarity"] >= data[-1]["similarity"] >= 0.3
+
+    response = client.get(f"/posts/search/fuzzy?q={posts_owner.username[:-1]}&field=username&limit=2")
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 2
+
+    response = client.get("/posts/search/fuzzy?q=zzzz")
+    assert response.status_code == 404, response.text
+
+
+def test_search_post_fuzzy_follows_changes(client, posts_owner, session):
+    image = posts_owner.images[0]
+    image.description = "blue lagoon"
+    session.commit()
+    response = client.get("/posts/search/fuzzy?q=lagon&threshold=0.5")
+    assert response.status_code == 200, response.text
+    assert [p["id"] for p in response.json()] == [image.id]
+    image.description = "post 0"
+    session.commit()
+
+
+def limiters(path: str) -> list:
+    route = next(r for r in app.routes if getattr(r, "path", None) == path)
+    return [d.call for d in route.dependant.dependencies if isinstance(d.call, RateLimiter)]
+
+
+def test_suggest_tags_own_limiter():
+    # a request per keystroke would get 429 under the limiter of /posts
+    (limiter,) = limiters("/posts/tags/suggest")
+    assert (limiter.times, limiter.milliseconds) == (
+        settings.tag_suggest_rate_times, settings.tag_suggest_rate_seconds * 1000
+    )
+    assert limiters("/posts/search/")[0].times == 2
+
+
+def test_suggest_tags(client, posts_owner, token, session, monkeypatch):
+    tag_suggest.clear()
+    response = client.get("/posts/tags/suggest?prefix=TAG_&limit=3")
+    assert response.status_code == 200, response.text
+    assert len(response.json()) == 3
+    assert all(t["name"].startswith("tag_") and t["count"] == 1 for t in response.json())
+
+    monkeypatch.setattr(
+        cloudinary_client, "upload", AsyncMock(return_value={"secure_url": "https://example.com/x.jpg"})
+    )
+    response = client.post(
+        "/posts/publication",
+        data={"text": "new post", "tags": "tag_3,brand_new"},
+        files={"file": ("x.jpg", b"jpeg", "image/jpeg")},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200, response.text
+    # the index of this worker follows without a rebuild
+    assert client.get("/posts/tags/suggest?prefix=tag").json()[0] == {"name": "tag_3", "count": 2}
+    assert client.get("/posts/tags/suggest?prefix=bra").json() == [{"name": "brand_new", "count": 1}]
+    session.delete(session.get(Image, response.json()["id"]))
+    session.commit()
+
+
+def test_upload_resolves_tags_in_one_statement(client, posts_owner, token, session, monkeypatch):
+    monkeypatch.setattr(
+        cloudinary_client, "upload", AsyncMock(return_value={"secure_url": "https://example.com/y.jpg"})
+    )
+    with count_queries() as statements:
+        response = client.post(
+            "/posts/publication",
+            data={"text": "tagged", "tags": "tag_1, fresh_1,fresh_2"},
+            files={"file": ("y.jpg", b"jpeg", "image/jpeg")},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+    assert response.status_code == 200, response.text
+    assert sorted(response.json()["tags"]) == ["fresh_1", "fresh_2", "tag_1"]
+    # one upsert for all tags, no lookup per tag
+    assert len([s for s in statements if s.startswith("INSERT INTO tags")]) == 1, statements
+    assert not [s for s in statements if "WHERE tags.name =" in s], statements
+    session.delete(session.get(Image, response.json()["id"]))
+    session.commit()
+
+
+def test_upload_too_large_rejected_early(client, monkeypatch):
+    upload = AsyncMock()
+    monkeypatch.setattr(cloudinary_client, "upload", upload)
+    response = client.post(
+        "/posts/publication",
+        data={"text": "huge"},
+        files={"file": ("huge.jpg", b"\0" * (settings.upload_max_size + 128 * 1024), "image/jpeg")},
+    )
+    assert response.status_code == 413, response.text
+    upload.assert_not_called()
+
+
+def test_publish_and_delete_with_local_storage(client, posts_owner, token, session, tmp_path):
+    storage = LocalStorage(str(tmp_path), "/media")
+    app.dependency_overrides[get_storage] = lambda: storage
+    try:
+        posted = [
+            client.post(
+                "/posts/publication",
+                data={"text": f"local {i}"},
+                files={"file": ("z.png", b"\x89PNG same bytes", "image/png")},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            for i in range(2)
+        ]
+        assert all(r.status_code == 200 for r in posted), posted[0].text
+        url = posted[0].json()["url_original"]
+        assert url.startswith("/media/") and url.endswith(".png")
+        assert posted[1].json()["url_original"] == url
+        path = tmp_path / storage.key_from_url(url)
+
+        # the file is shared by both posts, it goes with the last one
+        headers = {"Authorization": f"Bearer {token}"}
+        assert client.delete(f"/posts/{posted[0].json()['id']}", headers=headers).status_code == 200
+        assert path.exists()
+        assert client.delete(f"/posts/{posted[1].json()['id']}", headers=headers).status_code == 200
+        assert not path.exists()
+    finally:
+        del app.dependency_overrides[get_storage]
+
+
+@pytest.fixture()
+def jobs_redis(posts_owner, monkeypatch):
+    r = fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer())
+    monkeypatch.setattr("src.services.auth.auth_service.r", r)
+    return r
+
+
+def run_jobs(r, storage) -> int:
+    """Run queued jobs as worker.py does, return the number of jobs."""
+    worker = JobWorker(job_queue, JobContext(TestingAsyncSessionLocal, storage, r), poll_timeout=0)
+
+    async def drain():
+        count = 0
+        while await worker.run_once():
+            count += 1
+        return count
+
+    return asyncio.run(drain())
+
+
+def test_transform_served_from_derived_cache(client, posts_owner, token, session, tmp_path, jobs_redis):
+    storage = LocalStorage(str(tmp_path), "/media")
+    app.dependency_overrides[get_storage] = lambda: storage
+    try:
+        png = io.BytesIO()
+        PILImage.new("RGB", (40, 20), "red").save(png, format="PNG")
+        post = client.post(
+            "/posts/publication",
+            data={"text": "to rotate"},
+            files={"file": ("r.png", png.getvalue(), "image/png")},
+            headers={"Authorization": f"Bearer {token}"},
+        ).json()
+        urls = []
+        for key in ("first", "second"):
+            response = client.get(
+                f"/cloudinary/transformed_image/{post['id']}?angle=90&width=10",
+                headers={"Idempotency-Key": key},
+            )
+            assert response.status_code == 202, response.text
+            assert run_jobs(jobs_redis, storage) == 1
+            urls.append(client.get(response.headers["location"]).json()["result"]["url_transformed"])
+        assert urls[0] == urls[1] and urls[0].startswith("/media/derived/")
+        assert storage.engine.stats()["renders"] == 1
+        assert storage.engine.stats()["cache"]["hits"] == 1
+        assert session.get(Image, post["id"]).url_transformed == urls[0]
+        assert client.get(f"/cloudinary/transformed_image/{post['id']}?crop=zoom").status_code == 422
+        assert client.get(f"/cloudinary/transformed_image/{post['id']}?width=90000").status_code == 422
+        # any angle is a valid request (Cloudinary), Pillow renders of local storage take multiples of 45
+        response = client.get(f"/cloudinary/transformed_image/{post['id']}?angle=30")
+        assert response.status_code == 202
+        assert run_jobs(jobs_redis, storage) == 1
+        assert client.get(response.headers["location"]).json()["status"] == "failed"
+
+        # evicted derivative is rendered again on request, cached by clients forever
+        storage.path(storage.key_from_url(urls[0])).unlink()
+        routes = list(app.router.routes)
+        with patch.object(settings, "storage_local_dir", str(tmp_path)):
+            static.add_media(app)
+        try:
+            response = client.get(urls[0])
+            # token which was not issued or is out of bounds is not rendered
+            digest = urls[0].split("/")[3]
+            huge = client.get(
+                f"/media/derived/{digest}/h_90000,w_90000.{storage.signature(digest, 'h_90000,w_90000', 'png')}.png"
+            )
+            odd = client.get(urls[0].replace("a_90", "a_180"))
+        finally:
+            app.router.routes[:] = routes
+        assert response.status_code == 200
+        assert "immutable" in response.headers["cache-control"]
+        with PILImage.open(io.BytesIO(response.content)) as image:
+            assert image.size == (10, 20)
+        assert (huge.status_code, odd.status_code) == (404, 404)
+        assert client.get("/api/healthchecker/transforms").json()["renders"] == 2
+        session.delete(session.get(Image, post["id"]))
+        session.commit()
+    finally:
+        del app.dependency_overrides[get_storage]
+        storage.engine.shutdown()
+
+
+def test_qr_load_etag(client, posts_owner, session):
+    qr_renderer.clear()
+    image = posts_owner.images[0]
+    response = client.get(f"/cloudinary/qr_load/{image.id}")
+    assert response.status_code == 200, response.text
+    assert response.headers["content-type"] == "image/png"
+    assert "immutable" in response.headers["cache-control"]
+    etag = response.headers["etag"]
+    assert etag == QRSpec(image.url_original).etag
+
+    renders = qr_renderer.renders
+    again = client.get(f"/cloudinary/qr_load/{image.id}")
+    assert again.content == response.content
+    assert qr_renderer.renders == renders
+
+    not_modified = client.get(f"/cloudinary/qr_load/{image.id}", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+
+    svg = client.get(f"/cloudinary/qr_load/{image.id}?format=svg")
+    assert svg.headers["content-type"] == "image/svg+xml"
+    assert svg.content.startswith(b"<svg")
+    assert svg.headers["etag"] != etag
+    assert client.get(f"/cloudinary/qr_load/{image.id}?format=gif").status_code == 422
+
+    # transformed url can change, its code is revalidated
+    image.url_transformed = "url_transformed"
+    session.commit()
+    transformed = client.get(f"/cloudinary/qr_load/{image.id}?option=transformed")
+    assert transformed.headers["cache-control"] == "no-cache"
+    assert transformed.headers["etag"] != etag
+    image.url_transformed = None
+    session.commit()
+
+    assert client.get("/cloudinary/qr_load/0").status_code == 404
+
+
+def test_qr_jobs(client, posts_owner, session, tmp_path, jobs_redis):
+    storage = LocalStorage(str(tmp_path), "/media")
+    app.dependency_overrides[get_storage] = lambda: storage
+    try:
+        png = io.BytesIO()
+        PILImage.new("RGB", (30, 30), "blue").save(png, format="PNG")
+        source = asyncio.run(storage.put(png.getvalue()))
+        image = Image(owner=posts_owner, url_original=source.url, url_original_qr="", description="qr jobs")
+        session.add(image)
+        session.commit()
+
+        responses = [client.get(f"/cloudinary/qr_codes_transformed_image/{image.id}") for _ in range(2)]
+        assert [r.status_code for r in responses] == [202, 202]
+        # the same request is the same job
+        assert responses[0].json()["job_id"] == responses[1].json()["job_id"]
+        status_url = responses[0].json()["status_url"]
+        assert client.get(status_url).json()["status"] == "queued"
+
+        # the API only queues, the worker does the uploads
+        session.refresh(image)
+        assert image.url_transformed is None
+        assert run_jobs(jobs_redis, storage) == 1
+        job = client.get(status_url).json()
+        assert job["status"] == DONE, job
+        session.refresh(image)
+        assert image.url_transformed == job["result"]["url_transformed"]
+        assert image.url_transformed_qr == job["result"]["url_transformed_qr"]
+        assert image.url_transformed.startswith("/media/derived/")
+        assert image.url_transformed_qr.startswith("/media/")
+
+        response = client.get(f"/cloudinary/qr_codes_image/{image.id}", headers={"Idempotency-Key": "k"})
+        assert client.get(
+            f"/cloudinary/qr_codes_image/{posts_owner.images[0].id}", headers={"Idempotency-Key": "k"}
+        ).status_code == 409
+        run_jobs(jobs_redis, storage)
+        session.refresh(image)
+        assert image.url_original_qr == client.get(response.headers["location"]).json()["result"]["url_original_qr"]
+        assert image.url_original_qr != image.url_transformed_qr
+
+        # url_x of the fixture posts are not files of the storage, no retries
+        response = client.get(f"/cloudinary/qr_codes_transformed_image/{posts_owner.images[1].id}")
+        run_jobs(jobs_redis, storage)
+        assert client.get(response.headers["location"]).json()["status"] == FAILED
+
+        assert client.get("/cloudinary/qr_codes_image/0").status_code == 404
+        assert client.get("/cloudinary/jobs/unknown").status_code == 404
+        session.delete(image)
+        session.commit()
+    finally:
+        del app.dependency_overrides[get_storage]
+        storage.engine.shutdown()
+
+
+def test_bulk_generation(client, posts_owner, token, session, tmp_path, jobs_redis):
+    storage = LocalStorage(str(tmp_path), "/media")
+    app.dependency_overrides[get_storage] = lambda: storage
+    try:
+        tag = Tag(name="bulk")
+        images = []
+        for color in ("red", "green", "blue"):
+            png = io.BytesIO()
+            PILImage.new("RGB", (20, 20), color).save(png, format="PNG")
+            source = asyncio.run(storage.put(png.getvalue()))
+            images.append(Image(owner=posts_owner, url_original=source.url, url_original_qr="", tags=[tag]))
+        session.add_all(images)
+        session.commit()
+
+        with count_queries() as statements:
+            response = client.post(
+                "/cloudinary/bulk",
+                json={"tag": "bulk", "operations": ["qr_original", "qr_transformed"], "batch_size": 2},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+        assert response.status_code == 200, response.text
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line.get("batch") for line in lines] == [1, 2, None]
+        assert lines[-1] == {"done": True, "batches": 2, "processed": 3, "updated": 3, "failed": 0}
+        # one UPDATE statement per batch, not an UPDATE per image
+        updates = [s for s in statements if s.startswith("UPDATE images")]
+        assert len(updates) == 2 and all("CASE images.id WHEN" in s for s in updates), updates
+
+        for image in images:
+            session.refresh(image)
+            assert image.url_transformed.startswith("/media/derived/")
+            assert image.url_original_qr.startswith("/media/") and image.url_transformed_qr.startswith("/media/")
+
+        # the fixture posts are not files of the storage, failures are reported and not written
+        response = client.post(
+            "/cloudinary/bulk",
+            json={"operations": ["transform"], "angle": 90},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        done = [json.loads(line) for line in response.text.splitlines()][-1]
+        assert done["processed"] == 8 and done["updated"] == 3 and done["failed"] == 5
+
+        # the first user is an admin, it may process other galleries
+        response = client.post(
+            "/cloudinary/bulk",
+            json={"owner_id": posts_owner.id + 1},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.json() == {"done": True, "batches": 0, "processed": 0, "updated": 0, "failed": 0}
+        assert client.post("/cloudinary/bulk", json={}).status_code == 401
+
+        for image in images:
+            session.delete(image)
+        session.delete(tag)
+        session.commit()
+    finally:
+        del app.dependency_overrides[get_storage]
+        storage.engine.shutdown()
+
+
+def test_qr_pipeline_after_publish(client, posts_owner, token, session, tmp_path, jobs_redis, monkeypatch):
+    storage = LocalStorage(str(tmp_path), "/media")
+    app.dependency_overrides[get_storage] = lambda: storage
+    context = JobContext(TestingAsyncSessionLocal, storage, jobs_redis)
+    try:
+        ids = []
+        for color in ("red", "green"):
+            png = io.BytesIO()
+            PILImage.new("RGB", (10, 10), color).save(png, format="PNG")
+            response = client.post(
+                "/posts/publication",
+                data={"text": f"qr {color}"},
+                files={"file": ("q.png", png.getvalue(), "image/png")},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            assert response.status_code == 200, response.text
+            ids.append(response.json()["id"])
+        # publish does not wait for the code
+        assert session.get(Image, ids[0]).url_original_qr == ""
+        published = asyncio.run(jobs_redis.zscore(PENDING, str(ids[0])))
+        # a second request for the same image is the same entry
+        asyncio.run(qr_pipeline.enqueue(jobs_redis, ids[0]))
+        assert asyncio.run(jobs_redis.zscore(PENDING, str(ids[0]))) == published
+        # a post deleted before its turn is dropped
+        asyncio.run(qr_pipeline.enqueue(jobs_redis, 10**6))
+
+        # storage is down for the first batch, its images wait for a retry
+        put = storage.put
+        monkeypatch.setattr(storage, "put", AsyncMock(side_effect=ConnectionError("down")))
+        monkeypatch.setattr(qr_pipeline, "backoff", 0)
+        assert asyncio.run(qr_pipeline.run_once(context)) == 3
+        assert asyncio.run(jobs_redis.zcard(DELAYED)) == 2
+        monkeypatch.setattr(storage, "put", put)
+
+        with count_queries() as statements:
+            assert asyncio.run(qr_pipeline.run_once(context)) == 2
+        assert len([s for s in statements if s.startswith("UPDATE images")]) == 1
+        assert asyncio.run(qr_pipeline.run_once(context)) == 0
+        for image_id in ids:
+            image = session.get(Image, image_id)
+            session.refresh(image)
+            assert image.url_original_qr.startswith("/media/")
+
+        stats = client.get("/api/healthchecker/qr-pipeline").json()
+        assert (stats["pending"], stats["delayed"], stats["ready"], stats["failed"], stats["retried"]) == (0, 0, 2, 0, 2)
+        assert 0 <= stats["publish_to_ready_p50"] <= stats["publish_to_ready_max"]
+
+        for image_id in ids:
+            session.delete(session.get(Image, image_id))
+        session.commit()
+    finally:
+        del app.dependency_overrides[get_storage]
+        storage.engine.shutdown()
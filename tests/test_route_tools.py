@@ -0,0 +1,81 @@
+import asyncio
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.database.db import MeasuredQueuePool, get_pool_status, pool_wait_stats
+
+
+def make_engine():
+    return create_async_engine(
+        "sqlite+aiosqlite:///tests/db.sqlite",
+        poolclass=MeasuredQueuePool,
+        pool_size=2,
+        max_overflow=1,
+        pool_timeout=0.1,
+    )
+
+
+def test_pool_status_checked_out():
+    async def run():
+        engine = make_engine()
+        pool_wait_stats.reset()
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            in_use = get_pool_status(engine)
+        released = get_pool_status(engine)
+        await engine.dispose()
+        return in_use, released
+
+    in_use, released = asyncio.run(run())
+    assert in_use["pool"] == "MeasuredQueuePool"
+    assert in_use["size"] == 2
+    assert in_use["checked_out"] == 1
+    assert released["checked_out"] == 0
+    assert released["checkouts"] == 1
+    assert released["wait_max_ms"] >= 0
+
+
+def test_pool_status_timeout():
+    async def run():
+        engine = make_engine()
+        pool_wait_stats.reset()
+        conns = [await engine.connect() for _ in range(3)]
+        overflow = get_pool_status(engine)
+        try:
+            await engine.connect()
+        except Exception as err:
+            error = err
+        for conn in conns:
+            await conn.close()
+        await engine.dispose()
+        return overflow, error
+
+    overflow, error = asyncio.run(run())
+    assert overflow["checked_out"] == 3
+    assert overflow["overflow"] == 1
+    assert "QueuePool limit" in str(error)
+    assert pool_wait_stats.timeouts == 1
+
+
+def test_healthchecker_pool(client, monkeypatch):
+    engine = make_engine()
+    monkeypatch.setattr("src.database.db.engine", engine)
+    response = client.get("/api/healthchecker/pool")
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["pool"] == "MeasuredQueuePool"
+    assert data["checked_out"] == 0
+
+
+def test_healthchecker_pool_not_configured(client, monkeypatch):
+    monkeypatch.setattr("src.database.db.engine", None)
+    response = client.get("/api/healthchecker/pool")
+    assert response.status_code == 503, response.text
+
+
+def test_healthchecker_user_cache(client):
+    response = client.get("/api/healthchecker/user-cache")
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert {"hits", "misses", "evictions", "size", "maxsize"} <= data.keys()
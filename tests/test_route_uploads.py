@@ -0,0 +1,81 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.database.models import Image, User
+from src.services.cloudinary_srv import cloudinary_client
+from src.services.resumable import resumable_uploads
+from src.services.uploads import iter_upload
+
+
+@pytest.fixture()
+def token(client, user, mock_ratelimiter, session, monkeypatch):
+    monkeypatch.setattr("libgravatar.Gravatar.get_image", MagicMock(return_value="MOC_AVATAR"))
+    monkeypatch.setattr("fastapi.BackgroundTasks.add_task", MagicMock())
+    client.post("/api/auth/signup", json=user)
+    owner: User = session.query(User).filter(User.email == user.get("email")).first()
+    owner.confirmed = True
+    owner.active = True
+    session.commit()
+    response = client.post(
+        "/api/auth/login",
+        data={"username": user.get("email"), "password": user.get("password")},
+    )
+    return response.json()["access_token"]
+
+
+@pytest.fixture()
+def staging(tmp_path, monkeypatch):
+    monkeypatch.setattr(resumable_uploads, "staging_dir", tmp_path)
+    return tmp_path
+
+
+def test_resumable_upload(client, token, staging, session, monkeypatch):
+    auth = {"Authorization": f"Bearer {token}"}
+    uploaded = []
+
+    async def upload(file, **options):
+        uploaded.append(b"".join([chunk async for chunk in iter_upload(file)]))
+        return {"secure_url": "https://example.com/big.jpg"}
+
+    monkeypatch.setattr(cloudinary_client, "upload", AsyncMock(side_effect=upload))
+
+    response = client.post("/posts/uploads/", json={"size": 10, "filename": "big.jpg"}, headers=auth)
+    assert response.status_code == 201, response.text
+    upload_id = response.json()["id"]
+    assert response.headers["Location"].endswith(f"/posts/uploads/{upload_id}")
+    url = f"/posts/uploads/{upload_id}"
+
+    response = client.put(url, content=b"0123", headers={**auth, "Upload-Offset": "0"})
+    assert response.json()["offset"] == 4
+
+    # the client lost the answer and sends the same chunk again
+    response = client.put(url, content=b"0123", headers={**auth, "Upload-Offset": "0"})
+    assert response.status_code == 409, response.text
+    assert client.head(url, headers=auth).headers["Upload-Offset"] == "4"
+
+    finalize = {"text": "resumed", "tags": ["tag_1,resumed"]}
+    assert client.post(f"{url}/finalize", json=finalize, headers=auth).status_code == 409
+
+    response = client.put(url, content=b"456789", headers={**auth, "Upload-Offset": "4"})
+    assert response.json() == {"id": upload_id, "size": 10, "offset": 10}
+    response = client.put(url, content=b"!", headers={**auth, "Upload-Offset": "10"})
+    assert response.status_code == 413, response.text
+
+    response = client.post(f"{url}/finalize", json=finalize, headers=auth)
+    assert response.status_code == 200, response.text
+    assert sorted(response.json()["tags"]) == ["resumed", "tag_1"]
+    assert uploaded == [b"0123456789"]
+    assert not list(staging.iterdir())
+    assert client.get(url, headers=auth).status_code == 404
+
+    session.delete(session.get(Image, response.json()["id"]))
+    session.commit()
+
+
+def test_upload_of_other_user_is_not_found(client, token, staging):
+    auth = {"Authorization": f"Bearer {token}"}
+    upload_id = client.post("/posts/uploads/", json={"size": 3}, headers=auth).json()["id"]
+    assert client.get("/posts/uploads/" + "0" * 32, headers=auth).status_code == 404
+    assert client.delete(f"/posts/uploads/{upload_id}", headers=auth).status_code == 204
+    assert client.get(f"/posts/uploads/{upload_id}", headers=auth).status_code == 404
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import sys
+import threading
+import unittest
+from pathlib import Path
+from tempfile import SpooledTemporaryFile
+
+from aiohttp import ClientTimeout, web
+from aiohttp.test_utils import TestServer
+import cloudinary.utils
+from fastapi import UploadFile
+
+hw_path: str = str(Path(__file__).resolve().parent.parent)
+sys.path.append(hw_path)
+
+from src.services.cloudinary_srv import CloudinaryClient, CloudinaryError
+from src.services.uploads import UploadTooLarge
+
+MB = 1024 * 1024
+
+
+def big_upload(size: int) -> UploadFile:
+    """UploadFile as Starlette makes it: spooled to disk after 1 MB."""
+    spooled = SpooledTemporaryFile(max_size=MB)
+    chunk = os.urandom(MB)
+    for _ in range(size // MB):
+        spooled.write(chunk)
+    spooled.seek(0)
+    return UploadFile(spooled, filename="big.jpg")
+
+
+class PeakRSS:
+    """Samples resident memory of the process in a thread while the block runs."""
+
+    def __enter__(self):
+        self.page = os.sysconf("SC_PAGE_SIZE")
+        self.baseline = self.peak = self.rss()
+        self.running = True
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def rss(self) -> int:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * self.page
+
+    def sample(self):
+        while self.running:
+            self.peak = max(self.peak, self.rss())
+            threading.Event().wait(0.001)
+
+    def __exit__(self, *exc):
+        self.running = False
+        self.thread.join()
+
+    @property
+    def growth(self) -> int:
+        return self.peak - self.baseline
+
+
+class TestCloudinaryClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests = []
+        self.sizes = []
+        self.replies = []
+        self.active = self.max_active = 0
+        app = web.Application()
+        app.router.add_post("/v1_1/demo/{resource}/upload", self.handler)
+        app.router.add_post("/v1_1/demo/{resource}/destroy", self.handler)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.client = CloudinaryClient(
+            cloud_name="demo",
+            api_key="key",
+            api_secret="secret",
+            timeout=0.5,
+            retries=2,
+            backoff=0.01,
+            concurrency=2,
+            max_size=100 * MB,
+            upload_prefix=str(self.server.make_url("")).rstrip("/"),
+        )
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        await self.server.close()
+
+    async def read_form(self, request: web.Request) -> dict:
+        if request.content_type != "multipart/form-data":
+            return dict(await request.post())
+        form = {}
+        async for part in await request.multipart():
+            if part.filename:
+                # read as a stream, keep only the head
+                head, size = b"", 0
+                while chunk := await part.read_chunk():
+                    head += chunk[: 1024 - len(head)]
+                    size += len(chunk)
+                form[part.name] = head
+                self.sizes.append(size)
+            else:
+                form[part.name] = await part.text()
+        return form
+
+    async def handler(self, request: web.Request) -> web.Response:
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            form = await self.read_form(request)
+            self.requests.append((request.match_info["resource"], form))
+            status, body, delay = self.replies.pop(0) if self.replies else (200, {"secure_url": "https://x/1.png"}, 0.02)
+            await asyncio.sleep(delay)
+            return web.json_response(body, status=status)
+        finally:
+            self.active -= 1
+
+    async def test_signed_destroy(self):
+        await self.client.destroy("publication/a")
+        resource, form = self.requests[0]
+        self.assertEqual(resource, "image")
+        self.assertEqual(form["public_id"], "publication/a")
+        self.assertEqual(form["invalidate"], "1")
+        signed = {k: v for k, v in form.items() if k not in ("api_key", "signature")}
+        self.assertEqual(form["signature"], cloudinary.utils.api_sign_request(signed, "secret"))
+
+    async def test_signed_upload(self):
+        result = await self.client.upload(b"\x89PNG", public_id="qr_codes/1", folder="qr_codes", overwrite=True)
+        self.assertEqual(result, {"secure_url": "https://x/1.png"})
+        resource, form = self.requests[0]
+        self.assertEqual(resource, "image")
+        self.assertEqual(form["file"], b"\x89PNG")
+        self.assertEqual(form["api_key"], "key")
+        signed = {k: v for k, v in form.items() if k not in ("file", "api_key", "signature")}
+        self.assertEqual(signed["public_id"], "qr_codes/1")
+        self.assertEqual(form["signature"], cloudinary.utils.api_sign_request(signed, "secret"))
+
+    async def test_remote_url_and_transformation(self):
+        await self.client.upload("https://example.com/a.jpg", transformation={"angle": 45})
+        _, form = self.requests[0]
+        self.assertEqual(form["file"], "https://example.com/a.jpg")
+        self.assertEqual(form["transformation"], "a_45")
+
+    async def test_retries_transient_errors(self):
+        self.replies = [
+            (503, {"error": {"message": "busy"}}, 0),
+            (200, {}, 1),  # timeout
+        ]
+        result = await self.client.upload(b"data")
+        self.assertEqual(result["secure_url"], "https://x/1.png")
+        self.assertEqual(len(self.requests), 3)
+
+    async def test_gives_up(self):
+        self.replies = [(500, {"error": {"message": "boom"}}, 0)] * 3
+        with self.assertRaises(CloudinaryError) as cm:
+            await self.client.upload(b"data")
+        self.assertEqual((cm.exception.status, str(cm.exception)), (500, "boom"))
+        self.assertEqual(len(self.requests), 3)
+
+    async def test_client_error_is_not_retried(self):
+        self.replies = [(400, {"error": {"message": "Invalid image file"}}, 0)]
+        with self.assertRaises(CloudinaryError) as cm:
+            await self.client.upload(b"data")
+        self.assertEqual(cm.exception.status, 400)
+        self.assertEqual(len(self.requests), 1)
+
+    async def test_concurrency_and_one_session(self):
+        await asyncio.gather(*(self.client.upload(b"data") for _ in range(6)))
+        session = self.client.session
+        await self.client.upload(b"data")
+        self.assertIs(self.client.session, session)
+        self.assertEqual(len(self.requests), 7)
+        self.assertEqual(self.max_active, 2)
+
+    @unittest.skipUnless(os.path.exists("/proc/self/statm"), "needs /proc")
+    async def test_large_file_is_streamed_with_bounded_memory(self):
+        upload = big_upload(64 * MB)
+        self.client.timeout = ClientTimeout(total=30)
+        self.replies = [(503, {"error": {"message": "busy"}}, 0)]
+        with PeakRSS() as rss:
+            result = await self.client.upload(upload, public_id="big")
+        await upload.close()
+        self.assertEqual(result["secure_url"], "https://x/1.png")
+        # the retry streamed the file again from the start
+        self.assertEqual(self.sizes, [64 * MB, 64 * MB])
+        self.assertLess(rss.growth, 16 * MB, f"peak RSS grew by {rss.growth / MB:.1f} MB")
+
+    async def test_too_large_is_cut_mid_stream(self):
+        self.client.max_size = 3 * MB
+        upload = big_upload(4 * MB)
+        with self.assertRaises(UploadTooLarge):
+            await self.client.upload(upload)
+        await upload.close()
+        self.assertLessEqual(len(self.requests), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import asyncio
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+hw_path: str = str(Path(__file__).resolve().parent.parent)
+sys.path.append(hw_path)
+
+from src.database.models import Base, Image
+from src.services import fuzzy
+from src.services.fuzzy import FuzzySearch, TrigramIndex, trigrams
+
+
+class TestTrigrams(unittest.TestCase):
+    def test_pg_trgm_shape(self):
+        # SELECT show_trgm('Cat') -> {"  c"," ca","at ",cat}
+        self.assertEqual(trigrams("Cat"), {"  c", " ca", "cat", "at "})
+        self.assertEqual(trigrams("a-b"), {"  a", " a ", "  b", " b "})
+        self.assertEqual(trigrams(" _ "), set())
+        self.assertEqual(trigrams(None), set())
+
+
+class TestTrigramIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = TrigramIndex()
+        for id, value in enumerate(
+            ["Sunset over the sea", "Sunny street", "Mountain lake", None, "Захід сонця"], 1
+        ):
+            self.index.add(id, value)
+
+    def test_substring_scores_one(self):
+        self.assertEqual(self.index.search("the sea", 0.3, 10), [(1, 1.0)])
+
+    def test_typo(self):
+        found = self.index.search("mountian", 0.3, 10)
+        self.assertEqual([id for id, _ in found], [3])
+        self.assertLess(found[0][1], 1)
+
+    def test_order_threshold_limit(self):
+        found = self.index.search("sunset", 0.3, 10)
+        self.assertEqual([id for id, _ in found], [1, 2])
+        self.assertGreater(found[0][1], found[1][1])
+        self.assertEqual(self.index.search("sunset", 0.9, 10), [(1, 1.0)])
+        self.assertEqual(len(self.index.search("sunset", 0.3, 1)), 1)
+
+    def test_unicode_and_empty(self):
+        self.assertEqual([id for id, _ in self.index.search("сонце", 0.3, 10)], [5])
+        self.assertEqual(self.index.search("!!", 0.3, 10), [])
+        self.assertEqual(self.index.search("qqqq", 0.1, 10), [])
+
+    def test_replace_and_remove(self):
+        self.index.add(3, "Mountain river")
+        self.assertEqual(self.index.search("lake", 0.5, 10), [])
+        self.assertEqual([id for id, _ in self.index.search("river", 0.5, 10)], [3])
+        self.index.remove(3)
+        self.index.remove(3)
+        self.assertEqual(self.index.search("mountain", 0.3, 10), [])
+        self.assertEqual(self.index.size, 4)
+        self.assertNotIn("riv", self.index.postings)
+
+
+class TestFuzzySearchIndex(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        path = Path(self.dir.name) / "fuzzy.sqlite"
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+        engine.dispose()
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+        self.Session = async_sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.search = FuzzySearch(ttl=300)
+        patcher = patch.object(fuzzy, "fuzzy_search", self.search)
+        patcher.start()
+        self.addAsyncCleanup(self.cleanup, patcher)
+
+    async def cleanup(self, patcher):
+        patcher.stop()
+        await self.engine.dispose()
+        self.dir.cleanup()
+
+    async def add(self, db, description: str) -> Image:
+        image = Image(url_original="u", url_original_qr="", description=description)
+        db.add(image)
+        await db.commit()
+        return image
+
+    async def found(self, db, query: str) -> list[str]:
+        return [image.description for image, _ in await self.search.search(db, query, threshold=0.5)]
+
+    async def test_changes_applied_after_commit(self):
+        async with self.Session() as db:
+            lake = await self.add(db, "Mountain lake")
+            self.assertEqual(await self.found(db, "mountain"), ["Mountain lake"])
+            with patch.object(fuzzy, "build_index", wraps=fuzzy.build_index) as build:
+                await self.add(db, "Mountain river")
+                lake.description = "Blue lagoon"
+                await db.commit()
+                self.assertEqual(await self.found(db, "mountain"), ["Mountain river"])
+                self.assertEqual(await self.found(db, "lagoon"), ["Blue lagoon"])
+
+                lake.description = "Rolled back"
+                await db.flush()
+                await db.rollback()
+                self.assertEqual(await self.found(db, "rolled"), [])
+
+                await db.delete(lake)
+                await db.commit()
+                self.assertEqual(await self.found(db, "lagoon"), [])
+            # incremental, no rebuild
+            build.assert_not_called()
+
+    async def test_rebuild_off_loop_serves_old_index(self):
+        started, release = threading.Event(), threading.Event()
+        build_index = fuzzy.build_index
+
+        def slow_build(rows):
+            started.set()
+            release.wait(5)
+            return build_index(rows)
+
+        async with self.Session() as db:
+            await self.add(db, "Sunset over the sea")
+            self.assertEqual(await self.found(db, "sunset"), ["Sunset over the sea"])
+            self.search.invalidate()
+            with patch.object(fuzzy, "build_index", slow_build):
+                # old index answers while the new one is built in a thread
+                self.assertEqual(await self.found(db, "sunset"), ["Sunset over the sea"])
+                await asyncio.to_thread(started.wait, 5)
+                await self.add(db, "Sunset in the mountains")
+                release.set()
+                state = self.search._indexes[db.get_bind()]["description"]
+                await state.rebuild
+            # committed during the rebuild, not lost by the swap
+            self.assertEqual(len(await self.found(db, "sunset")), 2)
+
+    async def test_refresh_sees_changes_of_other_workers(self):
+        async with self.Session() as db:
+            await self.add(db, "Sunset over the sea")
+            self.assertEqual(await self.found(db, "sunset"), ["Sunset over the sea"])
+            # written by another worker: no mapper event here
+            await db.execute(insert(Image).values(url_original="u", url_original_qr="", description="Sunset city"))
+            await db.commit()
+            self.assertEqual(self.search.refresh(), [])
+            self.search.ttl = 0
+            await asyncio.gather(*self.search.refresh())
+            with patch.object(fuzzy, "build_index") as build:
+                self.search.ttl = 300
+                self.assertEqual(len(await self.found(db, "sunset")), 2)
+            build.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
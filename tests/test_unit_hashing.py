@@ -0,0 +1,54 @@
+import asyncio
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+hw_path: str = str(Path(__file__).resolve().parent.parent)
+sys.path.append(hw_path)
+
+from src.services.hashing import HasherBusy, PasswordHasher
+
+
+class TestPasswordHasher(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.hasher = PasswordHasher(rounds=4, workers=1, queue_size=1)
+
+    async def asyncTearDown(self):
+        self.hasher.shutdown()
+
+    async def test_hash_and_verify(self):
+        hashed = await self.hasher.hash("qwerty")
+        self.assertTrue(await self.hasher.verify("qwerty", hashed))
+        self.assertFalse(await self.hasher.verify("wrong", hashed))
+        stats = self.hasher.stats()
+        self.assertEqual(stats["calls"], 3)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertGreater(stats["hash_avg_ms"], 0)
+
+    async def test_verify_and_update(self):
+        hashed = await self.hasher.hash("qwerty")
+        self.assertEqual(await self.hasher.verify_and_update("qwerty", hashed), (True, None))
+        stronger = PasswordHasher(rounds=5, workers=1)
+        verified, new_hash = await stronger.verify_and_update("qwerty", hashed)
+        stronger.shutdown()
+        self.assertTrue(verified)
+        self.assertTrue(new_hash.startswith("$2b$05$"))
+
+    async def test_busy(self):
+        release = threading.Event()
+        # one call is running and one is queued, the third is rejected
+        running = [
+            asyncio.create_task(self.hasher._run(release.wait, 5)) for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+        with self.assertRaises(HasherBusy):
+            await self.hasher.hash("qwerty")
+        release.set()
+        await asyncio.gather(*running)
+        self.assertEqual(self.hasher.rejected, 1)
+        self.assertGreaterEqual(self.hasher.stats()["wait_max_ms"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import sys
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock
+
+import fakeredis
+
+hw_path: str = str(Path(__file__).resolve().parent.parent)
+sys.path.append(hw_path)
+
+from src.services.jobs import (
+    DELAYED,
+    DONE,
+    FAILED,
+    JOB_PREFIX,
+    QUEUE,
+    QUEUED,
+    RETRYING,
+    IdempotencyConflict,
+    JobContext,
+    JobFailed,
+    JobQueue,
+    JobWorker,
+)
+
+
+class TestJobQueue(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.r = fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer())
+        self.queue = JobQueue(max_attempts=3, backoff=0, result_ttl=60)
+        self.handler = AsyncMock(return_value={"url": "done"})
+        self.queue.handler("work")(self.handler)
+        self.worker = JobWorker(self.queue, JobContext(None, None, self.r), name="w1", poll_timeout=0)
+
+    async def test_same_request_same_job(self):
+        job, created = await self.queue.enqueue(self.r, "work", {"image_id": 1})
+        again, created_again = await self.queue.enqueue(self.r, "work", {"image_id": 1})
+        self.assertEqual((created, created_again), (True, False))
+        self.assertEqual(again.id, job.id)
+        self.assertEqual(again.status, QUEUED)
+        self.assertEqual(await self.r.llen(QUEUE), 1)
+        other, _ = await self.queue.enqueue(self.r, "work", {"image_id": 2})
+        self.assertNotEqual(other.id, job.id)
+
+    async def test_idempotency_key(self):
+        job, _ = await self.queue.enqueue(self.r, "work", {"image_id": 1}, "key-1")
+        self.assertNotEqual(job.id, (await self.queue.enqueue(self.r, "work", {"image_id": 1}))[0].id)
+        with self.assertRaises(IdempotencyConflict):
+            await self.queue.enqueue(self.r, "work", {"image_id": 2}, "key-1")
+        with self.assertRaises(ValueError):
+            await self.queue.enqueue(self.r, "unknown", {})
+
+    async def test_partial_hash_is_not_a_job(self):
+        # id written by a request which died before it saved and queued the job
+        job_id = self.queue.job_id("work", {"image_id": 1})
+        await self.r.hset(f"{JOB_PREFIX}{job_id}", "id", job_id)
+        job, created = await self.queue.enqueue(self.r, "work", {"image_id": 1})
+        self.assertTrue(created)
+        self.assertEqual(await self.r.lrange(QUEUE, 0, -1), [job_id.encode()])
+        self.assertEqual((await self.queue.get(self.r, job_id)).status, QUEUED)
+        self.assertTrue(await self.worker.run_once())
+
+    async def test_done(self):
+        job, _ = await self.queue.enqueue(self.r, "work", {"image_id": 1})
+        self.assertTrue(await self.worker.run_once())
+        self.assertFalse(await self.worker.run_once())
+        job = await self.queue.get(self.r, job.id)
+        self.assertEqual((job.status, job.attempts, job.result), (DONE, 1, {"url": "done"}))
+        self.handler.assert_awaited_once()
+        self.assertEqual(self.handler.await_args.args[1], {"image_id": 1})
+        self.assertLessEqual(await self.r.ttl(f"{JOB_PREFIX}{job.id}"), 60)
+        self.assertEqual(await self.r.llen("jobs:processing:w1"), 0)
+        # done job is not queued again
+        self.assertFalse((await self.queue.enqueue(self.r, "work", {"image_id": 1}))[1])
+
+    async def test_retry_then_fail(self):
+        self.handler.side_effect = ConnectionError("storage is down")
+        job, _ = await self.queue.enqueue(self.r, "work", {"image_id": 1})
+        with self.assertLogs(level="WARNING"):
+            await self.worker.run_once()
+        job = await self.queue.get(self.r, job.id)
+        self.assertEqual((job.status, job.attempts), (RETRYING, 1))
+        self.assertIn("storage is down", job.error)
+        self.assertEqual(await self.r.zcard(DELAYED), 1)
+        with self.assertLogs(level="WARNING"):
+            for _ in range(2):
+                # the retry is due at once with backoff 0
+                self.assertTrue(await self.worker.run_once())
+        job = await self.queue.get(self.r, job.id)
+        self.assertEqual((job.status, job.attempts), (FAILED, 3))
+        self.assertEqual(self.handler.await_count, 3)
+        # failed job is queued again by the next request
+        self.handler.side_effect = None
+        job, created = await self.queue.enqueue(self.r, "work", {"image_id": 1})
+        self.assertTrue(created)
+        await self.worker.run_once()
+        self.assertEqual((await self.queue.get(self.r, job.id)).status, DONE)
+
+    async def test_retry_waits_backoff(self):
+        self.queue.backoff = 60
+        self.handler.side_effect = ConnectionError("down")
+        await self.queue.enqueue(self.r, "work", {"image_id": 1})
+        with self.assertLogs(level="WARNING"):
+            await self.worker.run_once()
+        self.assertFalse(await self.worker.run_once())
+        [(_, due)] = await self.r.zrange(DELAYED, 0, -1, withscores=True)
+        self.assertGreater(due, time.time() + 25)
+
+    async def test_permanent_failure(self):
+        self.handler.side_effect = JobFailed("image 1 not found")
+        job, _ = await self.queue.enqueue(self.r, "work", {"image_id": 1})
+        with self.assertLogs(level="ERROR"):
+            await self.worker.run_once()
+        job = await self.queue.get(self.r, job.id)
+        self.assertEqual((job.status, job.attempts), (FAILED, 1))
+        self.assertEqual(await self.r.zcard(DELAYED), 0)
+
+    async def test_recover_after_crash(self):
+        job, _ = await self.queue.enqueue(self.r, "work", {"image_id": 1})
+        # taken by a worker which died
+        await self.r.lmove(QUEUE, "jobs:processing:w1", "RIGHT", "LEFT")
+        self.assertFalse(await self.worker.run_once())
+        self.assertEqual(await self.worker.recover(), 1)
+        self.assertTrue(await self.worker.run_once())
+        self.assertEqual((await self.queue.get(self.r, job.id)).status, DONE)
+
+
+if __name__ == "__main__":
+    unittest.main()
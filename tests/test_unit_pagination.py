@@ -0,0 +1,46 @@
+import sys
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from fastapi import HTTPException
+
+hw_path: str = str(Path(__file__).resolve().parent.parent)
+sys.path.append(hw_path)
+
+from src.database.models import Comment, Tag
+from src.services.pagination import decode_cursor, encode_cursor, keyset, next_cursor
+from sqlalchemy import select
+
+
+class TestPagination(unittest.TestCase):
+    def test_round_trip(self):
+        created_at = datetime(2023, 12, 1, 12, 30, 15, 123456)
+        cursor = encode_cursor(created_at, 42)
+        self.assertNotIn("=", cursor)
+        self.assertEqual(
+            decode_cursor(cursor, (Comment.created_at, Comment.id)), [created_at, 42]
+        )
+
+    def test_invalid(self):
+        for cursor in ("broken", encode_cursor(1), encode_cursor("not a date", 1)):
+            with self.assertRaises(HTTPException) as err:
+                decode_cursor(cursor, (Comment.created_at, Comment.id))
+            self.assertEqual(err.exception.status_code, 400)
+
+    def test_keyset_where(self):
+        first = str(keyset(select(Tag), (Tag.name,)))
+        self.assertIn("ORDER BY tags.name ASC", first)
+        self.assertNotIn("WHERE", first)
+        after = str(keyset(select(Tag), (Tag.name,), encode_cursor("b"), descending=True))
+        self.assertIn("WHERE (tags.name) < (", after)
+        self.assertIn("ORDER BY tags.name DESC", after)
+
+    def test_next_cursor(self):
+        tags = [Tag(id=1, name="a"), Tag(id=2, name="b")]
+        self.assertIsNone(next_cursor(tags, 3, "name"))
+        self.assertEqual(next_cursor(tags, 2, "name"), encode_cursor("b"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import asyncio
+import io
+import re
+import sys
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+from xml.etree import ElementTree
+
+import fakeredis
+import numpy as np
+import qrcode
+from PIL import Image as PILImage
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+hw_path: str = str(Path(__file__).resolve().parent.parent)
+sys.path.append(hw_path)
+
+from src.services import qr
+from src.services.qr import QR_PREFIX, QRRenderer, QRSpec, etag_matches, qr_matrix, render_qr
+
+
+class TestSpec(unittest.TestCase):
+    def test_key(self):
+        spec = QRSpec("https://example.com/1.jpg")
+        self.assertEqual(spec.key, QRSpec("https://example.com/1.jpg").key)
+        self.assertNotEqual(spec.key, QRSpec("https://example.com/1.jpg", fill="navy").key)
+        self.assertNotEqual(spec.key, QRSpec("https://example.com/1.jpg", error="H").key)
+        self.assertEqual(spec.etag, f'"{spec.key}"')
+
+    def test_render_is_deterministic(self):
+        spec = QRSpec("https://example.com/1.jpg")
+        self.assertEqual(render_qr(spec), render_qr(spec))
+        with PILImage.open(io.BytesIO(render_qr(spec))) as image:
+            self.assertEqual(image.format, "PNG")
+
+    def test_png_matches_qrcode_image(self):
+        spec = QRSpec("https://example.com/1.jpg", fill="navy", back="lightyellow", error="H")
+        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_H, box_size=10, border=4)
+        qr.add_data(spec.data)
+        qr.make(fit=True)
+        expected = qr.make_image(fill_color="navy", back_color="lightyellow").get_image().convert("RGB")
+        png = render_qr(spec)
+        self.assertEqual(png[24], 1, "bit depth of IHDR")
+        with PILImage.open(io.BytesIO(png)) as image:
+            self.assertEqual(image.convert("RGB").tobytes(), expected.tobytes())
+
+    def test_svg(self):
+        spec = QRSpec("https://example.com/1.jpg", format="svg", box_size=5)
+        self.assertEqual(spec.media_type, "image/svg+xml")
+        self.assertNotEqual(spec.key, QRSpec("https://example.com/1.jpg", box_size=5).key)
+        svg = ElementTree.fromstring(render_qr(spec))
+        matrix = qr_matrix(spec)
+        size = matrix.shape[0]
+        self.assertEqual(svg.get("width"), str(size * 5))
+        # rows of the path cover exactly the dark modules
+        drawn = np.zeros_like(matrix)
+        path = svg.find("{http://www.w3.org/2000/svg}path").get("d")
+        for x, y, w in re.findall(r"M(\d+),(\d+)h(\d+)v1h-\d+z", path):
+            drawn[int(y), int(x) : int(x) + int(w)] = True
+        self.assertTrue((drawn == matrix).all())
+
+    def test_etag_matches(self):
+        etag = '"abc"'
+        self.assertTrue(etag_matches('"abc"', etag))
+        self.assertTrue(etag_matches('"x", W/"abc"', etag))
+        self.assertTrue(etag_matches("*", etag))
+        self.assertFalse(etag_matches('"abd"', etag))
+        self.assertFalse(etag_matches(None, etag))
+
+
+class TestQRRenderer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.r = fakeredis.aioredis.FakeRedis()
+        self.renderer = QRRenderer(max_bytes=10 * 1024 * 1024, ttl=60, workers=2)
+
+    async def asyncTearDown(self):
+        self.renderer.shutdown()
+
+    async def test_tiers(self):
+        spec = QRSpec("https://example.com/1.jpg")
+        png = await self.renderer.image(spec, self.r)
+        self.assertEqual(await self.r.get(f"{QR_PREFIX}{spec.key}"), png)
+        self.assertLessEqual(await self.r.ttl(f"{QR_PREFIX}{spec.key}"), 60)
+        self.assertEqual(await self.renderer.image(spec, self.r), png)
+        # another worker: empty local cache, the code comes from Redis
+        other = QRRenderer(workers=1)
+        self.assertEqual(await other.image(spec, self.r), png)
+        self.assertEqual((other.renders, other.redis_hits), (0, 1))
+        stats = self.renderer.stats()
+        self.assertEqual((stats["renders"], stats["local_hits"]), (1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    async def test_concurrent_requests_render_once(self):
+        spec = QRSpec("https://example.com/2.jpg")
+        results = await asyncio.gather(*(self.renderer.image(spec) for _ in range(10)))
+        self.assertEqual(len(set(results)), 1)
+        self.assertEqual((self.renderer.renders, self.renderer.coalesced), (1, 9))
+
+    async def test_render_out_of_event_loop(self):
+        threads = []
+
+        def render(spec):
+            threads.append(threading.current_thread().name)
+            return b"png"
+
+        with patch.object(qr, "render_qr", render):
+            await self.renderer.image(QRSpec("x"))
+        self.assertTrue(threads[0].startswith("qr"))
+
+    async def test_lru_in_bytes(self):
+        specs = [QRSpec(f"https://example.com/{i}.jpg") for i in range(3)]
+        limit = len(render_qr(specs[0])) * 2 + 10
+        renderer = QRRenderer(max_bytes=limit, workers=1)
+        try:
+            for spec in specs:
+                await renderer.image(spec)
+            self.assertLessEqual(renderer.size, limit)
+            self.assertEqual(renderer.evictions, 1)
+            self.assertNotIn(specs[0].key, renderer._data)
+            self.assertEqual(renderer.size, sum(len(png) for png in renderer._data.values()))
+        finally:
+            renderer.shutdown()
+
+    async def test_redis_down(self):
+        self.r.get = AsyncMock(side_effect=RedisConnectionError("down"))
+        self.r.set = AsyncMock(side_effect=RedisConnectionError("down"))
+        with self.assertLogs(level="WARNING"):
+            png = await self.renderer.image(QRSpec("https://example.com/3.jpg"), self.r)
+        self.assertTrue(png.startswith(b"\x89PNG"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import asyncio
+import sys
+import time
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import fakeredis
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import OperationalError
+
+hw_path: str = str(Path(__file__).resolve().parent.parent)
+sys.path.append(hw_path)
+
+from src.services.bulk_images import BulkGenerator, retryable, update_images
+from src.services.cloudinary_srv import CloudinaryError
+from src.services.jobs import JobContext, JobFailed
+from src.services.qr_pipeline import ATTEMPTS, DELAYED, PENDING, PROCESSING_PREFIX, QRPipeline
+
+
+def session_factory(ids: list[int]):
+    """Session of the pipeline: every queued id is a post without a QR code."""
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=lambda *args: MagicMock(all=lambda: [SimpleNamespace(id=i) for i in ids]))
+    db.commit = AsyncMock()
+    db.__aenter__ = AsyncMock(return_value=db)
+    db.__aexit__ = AsyncMock(return_value=False)
+    return MagicMock(return_value=db)
+
+
+class TestQRPipeline(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.r = fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer())
+        self.pipeline = QRPipeline(batch_size=2, concurrency=2, interval=0, samples=10, max_attempts=2, backoff=60)
+
+    async def test_workers_claim_different_batches(self):
+        for image_id in (1, 2, 3):
+            await self.pipeline.enqueue(self.r, image_id, published_at=image_id)
+        await self.pipeline.enqueue(self.r, 1, published_at=100)
+        self.assertEqual(await self.pipeline.claim(self.r, "w1"), {1: 1.0, 2: 2.0})
+        self.assertEqual(await self.pipeline.claim(self.r, "w2"), {3: 3.0})
+        # unfinished batch is taken again, not a new one
+        self.assertEqual(await self.pipeline.claim(self.r, "w1"), {1: 1.0, 2: 2.0})
+        # restarted worker queues its batch again
+        self.assertEqual(await self.pipeline.recover(self.r, "w1"), 2)
+        self.assertEqual(await self.r.zrange(PENDING, 0, -1), [b"1", b"2"])
+        self.assertEqual(await self.r.zcard(f"{PROCESSING_PREFIX}w1"), 0)
+
+    async def test_retry_with_backoff_then_give_up(self):
+        ctx = JobContext(session_factory([1, 2]), None, self.r)
+        await self.pipeline.enqueue(self.r, 1)
+        await self.pipeline.enqueue(self.r, 2)
+        failed = [
+            {"id": 1, "error": "down", "retry": True},
+            {"id": 2, "error": "bad image", "retry": False},
+        ]
+        batch = AsyncMock(side_effect=[([], failed), ([], failed[:1])])
+        with patch.object(BulkGenerator, "batch", batch):
+            self.assertEqual(await self.pipeline.run_once(ctx, "w1"), 2)
+            # the retry is not due yet: nothing to take, no busy loop
+            self.assertEqual(await self.pipeline.run_once(ctx, "w1"), 0)
+            self.assertGreater(await self.r.zscore(DELAYED, "1"), time.time() + 59)
+            self.assertEqual(await self.r.zcard(PENDING), 0)
+
+            await self.r.zadd(DELAYED, {"1": 0})
+            self.assertEqual(await self.pipeline.run_once(ctx, "w1"), 1)
+        # second failure of max_attempts=2: dropped
+        self.assertEqual(await self.r.zcard(DELAYED), 0)
+        self.assertFalse(await self.r.hexists(ATTEMPTS, "1"))
+        stats = await self.pipeline.stats(self.r)
+        self.assertEqual((stats["failed"], stats["retried"], stats["ready"]), (2, 1, 0))
+
+    async def test_failed_round_keeps_claimed_ids(self):
+        factory = session_factory([1])
+        factory.return_value.execute.side_effect = OperationalError("SELECT", {}, Exception("db is down"))
+        await self.pipeline.enqueue(self.r, 1, published_at=1)
+        task = asyncio.create_task(self.pipeline.run(JobContext(factory, None, self.r), "w1"))
+        while not factory.return_value.execute.await_count:
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        # the loop survives the error and waits before the next round
+        self.assertFalse(task.done())
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(await self.r.zcard(f"{PROCESSING_PREFIX}w1"), 1)
+        self.assertEqual(await self.pipeline.claim(self.r, "w1"), {1: 1.0})
+
+    async def test_update_images_postgresql(self):
+        db = MagicMock(execute=AsyncMock())
+        db.get_bind.return_value.dialect.name = "postgresql"
+        await update_images(db, [{"id": 1, "url_original_qr": "a"}, {"id": 2, "url_original_qr": "b"}])
+        (stmt,), _ = db.execute.await_args
+        sql = " ".join(str(stmt.compile(dialect=postgresql.dialect())).split())
+        self.assertIn("SET url_original_qr=v.url_original_qr FROM (VALUES", sql)
+        self.assertIn("WHERE images.id = v.id", sql)
+
+    def test_retryable(self):
+        self.assertTrue(retryable(ConnectionError("down")))
+        self.assertTrue(retryable(CloudinaryError("busy", 503)))
+        self.assertTrue(retryable(CloudinaryError("rate limit", 429)))
+        self.assertTrue(retryable(CloudinaryError("timeout")))
+        self.assertFalse(retryable(CloudinaryError("bad request", 400)))
+        self.assertFalse(retryable(ValueError("cannot render")))
+        self.assertFalse(retryable(JobFailed("not a file of the storage")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import sys
+import unittest
+from pathlib import Path
+
+import fakeredis
+import redis.asyncio as redis
+from fakeredis.aioredis import FakeConnection
+
+hw_path: str = str(Path(__file__).resolve().parent.parent)
+sys.path.append(hw_path)
+
+from src.conf.config import settings
+from src.database.redis_pool import build_redis_pool
+
+
+class TestRedisPool(unittest.IsolatedAsyncioTestCase):
+    async def test_build_redis_pool(self):
+        pool = build_redis_pool()
+        self.assertEqual(pool.max_connections, settings.redis_max_connections)
+        retry = pool.connection_kwargs["retry"]
+        self.assertEqual(retry._retries, settings.redis_retries)
+        self.assertLessEqual(retry._backoff.compute(10), settings.redis_retry_backoff_cap)
+
+        # the same pool with connections to fakeredis
+        pool.connection_class = FakeConnection
+        pool.connection_kwargs["server"] = fakeredis.FakeServer()
+        r = redis.Redis(connection_pool=pool)
+        try:
+            self.assertTrue(await r.ping())
+        finally:
+            await r.close()
+            await pool.disconnect()
+
+
+if __name__ == "__main__":
+    unittest.main()
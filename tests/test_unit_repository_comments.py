@@ -1,9 +1,9 @@
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 from datetime import datetime, timedelta
 
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 from src.database.models import Comment, User
@@ -26,7 +26,7 @@ class TestContactsRepository(unittest.IsolatedAsyncioTestCase):
         :param self: Represent the instance of the class
         :return: None
         """
-        self.session = MagicMock(spec=Session)
+        self.session = AsyncMock(spec=AsyncSession)
         self.user = User(id=1, email="test@test.com")
         self.body = CommentBase(comment="some comment")
         self.image_id = 1
@@ -43,7 +43,7 @@ class TestContactsRepository(unittest.IsolatedAsyncioTestCase):
         """
         comments = [Comment(), Comment(), Comment()]
 
-        self.session.query().filter().limit().offset().all.return_value = comments
+        self.session.scalars.return_value = MagicMock(all=MagicMock(return_value=comments))
         result = await get_comments(self.image_id, 10, 0, self.session)
         self.assertEqual(result, comments)
 
@@ -59,7 +59,7 @@ class TestContactsRepository(unittest.IsolatedAsyncioTestCase):
         """
         comment = Comment()
 
-        self.session.query().filter().first.return_value = comment
+        self.session.scalar.return_value = comment
         result = await get_comment_by_id(self.image_id, self.comment_id, self.session)
         self.assertEqual(result, comment)
 
@@ -84,7 +84,7 @@ class TestContactsRepository(unittest.IsolatedAsyncioTestCase):
         :return: None
         """
         comment = Comment()
-        self.session.query().filter().first.return_value = comment
+        self.session.scalar.return_value = comment
         self.session.commit.return_value = None
         result = await update_comment(
             self.image_id, self.comment_id, self.body, self.user, self.session
@@ -99,7 +99,7 @@ class TestContactsRepository(unittest.IsolatedAsyncioTestCase):
         :param self: Represent the instance of a class
         :return: None
         """
-        self.session.query().filter().first.return_value = None
+        self.session.scalar.return_value = None
         self.session.commit.return_value = None
         result = await update_comment(
             self.image_id, self.comment_id, self.body, self.user, self.session
@@ -115,7 +115,7 @@ class TestContactsRepository(unittest.IsolatedAsyncioTestCase):
         :return: None
         """
         comment = Comment()
-        self.session.query().filter().first.return_value = comment
+        self.session.scalar.return_value = comment
         self.session.commit.return_value = None
         result = await remove_comment(
             self.image_id, self.comment_id, self.user, self.session
@@ -130,7 +130,7 @@ class TestContactsRepository(unittest.IsolatedAsyncioTestCase):
         :param self: Represent the instance of a class
         :return: None
         """
-        self.session.query().filter().first.return_value = None
+        self.session.scalar.return_value = None
         self.session.commit.return_value = None
         result = await remove_comment(
             self.image_id, self.comment_id, self.user, self.session
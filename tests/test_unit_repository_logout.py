@@ -6,8 +6,9 @@ import unittest
 from unittest.mock import MagicMock
 from pathlib import Path
 
-
-from sqlalchemy.orm import Session, sessionmaker
+import fakeredis.aioredis
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlalchemy import select, text, extract, desc, create_engine
 
 
@@ -17,71 +18,168 @@ sys.path.append(hw_path)
 # os.environ["PYTHONPATH"] += os.pathsep + hw_path
 # print(f'{os.environ["PYTHONPATH"]=}')
 
-from src.database.db import get_db
 from src.database.models import Bannedlist, Base
+from src.repository import logout as repository_logout
+from src.repository.logout import (
+    add_token,
+    check_token,
+    load_tokens,
+    get_tokens,
+    delete_tokens,
+    purge_old,
+)
+
+
+class TestLogoutRepository(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.test_token = "123.456.987"
 
+    async def asyncSetUp(self):
+        self.r = fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer())
 
-from src.repository.logout import add_token, check_token, purge_old
+    async def test_add_token(self):
+        result = await add_token(self.test_token, 60, self.r)
+        self.assertTrue(result)
+        ttl = await self.r.ttl(f"{repository_logout.BANNED_PREFIX}{self.test_token}")
+        self.assertTrue(0 < ttl <= 60)
 
+    async def test_add_token_wrong_none(self):
+        result = await add_token(None, 60, self.r)
+        self.assertFalse(result)
 
-class TestContactsRepository(unittest.IsolatedAsyncioTestCase):
+    async def test_add_token_wrong_empty(self):
+        result = await add_token("", 60, self.r)
+        self.assertFalse(result)
+
+    async def test_add_token_expired(self):
+        result = await add_token("expired", 0, self.r)
+        self.assertFalse(result)
+
+    async def test_check_token_is(self):
+        await add_token(self.test_token, 60, self.r)
+        result = await check_token(self.test_token, self.r)
+        self.assertTrue(result)
+
+    async def test_check_token_missed(self):
+        result = await check_token("GoIT", self.r)
+        self.assertFalse(result)
+
+    async def test_check_token_missed_no_redis(self):
+        # not revoked token is answered by filter, without request to Redis
+        r = MagicMock()
+        result = await check_token("not-revoked-token", r)
+        self.assertFalse(result)
+        r.exists.assert_not_called()
+
+    async def test_check_token_expired_in_redis(self):
+        await add_token("short", 60, self.r)
+        await self.r.delete(f"{repository_logout.BANNED_PREFIX}short")
+        result = await check_token("short", self.r)
+        self.assertFalse(result)
+
+    async def test_load_tokens(self):
+        r = self.r
+        await r.set(f"{repository_logout.BANNED_PREFIX}from-other-worker", 1, ex=60)
+        self.assertFalse(await check_token("from-other-worker", r))
+        result = await load_tokens(r)
+        self.assertEqual(result, 1)
+        self.assertTrue(await check_token("from-other-worker", r))
+
+    async def test_listen_tokens(self):
+        ready = asyncio.Event()
+        task = asyncio.create_task(repository_logout.listen_tokens(self.r, ready))
+        await asyncio.wait_for(ready.wait(), timeout=5)
+        # revoked by other worker: stored in Redis and published
+        await self.r.set(f"{repository_logout.BANNED_PREFIX}published", 1, ex=60)
+        await self.r.publish(repository_logout.BANNED_CHANNEL, "published")
+        for _ in range(50):
+            if "published" in repository_logout.banned_filter:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+        self.assertTrue(await check_token("published", self.r))
+
+    async def test_listen_tokens_resubscribe(self):
+        pubsubs = []
+        pubsub = self.r.pubsub
+
+        def track(**kwargs):
+            pubsubs.append(pubsub(**kwargs))
+            return pubsubs[-1]
+
+        self.r.pubsub = track
+        ready = asyncio.Event()
+        task = asyncio.create_task(repository_logout.listen_tokens(self.r, ready))
+        await asyncio.wait_for(ready.wait(), timeout=5)
+        # revoked while redis-py was reconnecting: stored, the message is lost
+        await self.r.set(f"{repository_logout.BANNED_PREFIX}missed", 1, ex=60)
+        self.assertFalse(await check_token("missed", self.r))
+        # what redis-py does after it reconnects on timeout, no error is raised
+        await pubsubs[0].on_connect(pubsubs[0].connection)
+        for _ in range(50):
+            if "missed" in repository_logout.banned_filter:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+        self.assertEqual(len(pubsubs), 1)
+        self.assertTrue(await check_token("missed", self.r))
+
+
+class TestBannedlistRepository(unittest.IsolatedAsyncioTestCase):
     @classmethod
-    def setUpClass(cls):        
+    def setUpClass(cls):
         cls.test_token = "123.456.987"
         DATABASE_URL = "sqlite:///tests/db.sqlite"
         cls.engine = create_engine(DATABASE_URL, echo=False)
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=cls.engine)
-        cls.session = SessionLocal()
         Base.metadata.drop_all(bind=cls.engine)
         Base.metadata.create_all(bind=cls.engine)
-
-        # If want use REAL database can use it:
-        # cls.session = next(get_db())
+        cls.async_engine = create_async_engine(
+            "sqlite+aiosqlite:///tests/db.sqlite", echo=False, poolclass=NullPool
+        )
+        cls.SessionLocal = async_sessionmaker(
+            bind=cls.async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
 
     @classmethod
     def tearDownClass(cls):
-        cls.session.close()
-
-    async def test_add_token(self):
-        result = await add_token(self.test_token, self.session)
-        # print(f"{result=}")
-        self.assertIsNotNone(result)
+        cls.engine.dispose()
 
-    async def test_add_token_wrong_none(self):
-        result = await add_token(None, self.session)
-        # print(f"{result=}")
-        self.assertIsNone(result)
+    async def asyncSetUp(self):
+        self.session = self.SessionLocal()
 
-    async def test_add_token_wrong_empty(self):
-        result = await add_token("", self.session)
-        # print(f"{result=}")
-        self.assertIsNone(result)
+    async def asyncTearDown(self):
+        await self.session.close()
 
-    async def test_check_token_is(self):
-        result = await check_token(self.test_token, self.session)
-        # print(f"{result=}")
-        self.assertTrue(result)
+    async def test_get_and_delete_tokens(self):
+        self.session.add_all(
+            [Bannedlist(token=self.test_token), Bannedlist(token=self.test_token * 2)]
+        )
+        await self.session.commit()
+        tokens = await get_tokens(self.session)
+        self.assertEqual(set(tokens), {self.test_token, self.test_token * 2})
+        result = await delete_tokens(self.session, tokens)
+        self.assertEqual(result, 2)
+        self.assertEqual(await get_tokens(self.session), [])
 
-    async def test_check_token_missed(self):
-        result = await check_token("GoIT", self.session)
-        # print(f"{result=}")
-        self.assertFalse(result)
+    async def test_delete_tokens_empty(self):
+        result = await delete_tokens(self.session, [])
+        self.assertEqual(result, 0)
 
     async def test_purge_token(self):
         start_range = datetime.now() - timedelta(days=5)
-        stmt = select(Bannedlist).where(Bannedlist.token == self.test_token)
-        ban = self.session.scalar(stmt)
-        ban.created_at = start_range  # type: ignore
-        self.session.commit()
-        await add_token(self.test_token * 2, self.session)
+        self.session.add_all(
+            [
+                Bannedlist(token=self.test_token * 3, created_at=start_range),
+                Bannedlist(token=self.test_token * 4),
+            ]
+        )
+        await self.session.commit()
 
         result = await purge_old(self.session, duration=1)
         #print(f"{result=}")
         self.assertEqual(result,1)
-
-    async def test_purge_token_empty(self):
         result = await purge_old(self.session, duration=1)
-        #print(f"{result=}")
         self.assertEqual(result,0)
 
 
@@ -8,7 +8,8 @@ from libgravatar import Gravatar
 from pathlib import Path
 
 
-from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlalchemy import select, text, extract, desc, create_engine
 
 
@@ -30,10 +31,14 @@ class TestContactsRepository(unittest.IsolatedAsyncioTestCase):
         cls.test_token = "123.456.987"
         DATABASE_URL = "sqlite:///tests/db.sqlite"
         cls.engine = create_engine(DATABASE_URL, echo=False)
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=cls.engine)
-        cls.session = SessionLocal()
         Base.metadata.drop_all(bind=cls.engine)
         Base.metadata.create_all(bind=cls.engine)
+        cls.async_engine = create_async_engine(
+            "sqlite+aiosqlite:///tests/db.sqlite", echo=False, poolclass=NullPool
+        )
+        cls.SessionLocal = async_sessionmaker(
+            bind=cls.async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
         cls.testUser = None
 
         # If want use REAL database can use it:
@@ -41,7 +46,13 @@ class TestContactsRepository(unittest.IsolatedAsyncioTestCase):
 
     @classmethod
     def tearDownClass(cls):
-        cls.session.close()
+        cls.engine.dispose()
+
+    async def asyncSetUp(self):
+        self.session = self.SessionLocal()
+
+    async def asyncTearDown(self):
+        await self.session.close()
 
     def get_image(*args, **kwargs):
         return "MOCK IMG"
@@ -0,0 +1,138 @@
+import asyncio
+import os
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import fakeredis
+from fastapi import HTTPException
+
+hw_path: str = str(Path(__file__).resolve().parent.parent)
+sys.path.append(hw_path)
+
+from src.services.resumable import UPLOAD_PREFIX, ResumableUploads, UploadLock
+from src.services.uploads import UploadTooLarge
+
+
+async def chunks(*parts, fail=False):
+    for part in parts:
+        yield part
+    if fail:
+        raise ConnectionError("client disconnected")
+
+
+class TestResumableUploads(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = TemporaryDirectory()
+        self.r = fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer())
+        self.uploads = ResumableUploads(self.tmp.name, ttl=60, max_size=100, lock_ttl=0.1, max_sessions=2)
+
+    async def asyncTearDown(self):
+        self.tmp.cleanup()
+
+    async def test_too_large_session(self):
+        with self.assertRaises(UploadTooLarge):
+            await self.uploads.create(self.r, 1, 101, "a.jpg")
+
+    async def test_broken_chunk_counts_received_bytes(self):
+        session = await self.uploads.create(self.r, 1, 10, "a.jpg")
+        with self.assertRaises(ConnectionError):
+            await self.uploads.append(self.r, session.id, 1, 0, chunks(b"abc", b"de", fail=True))
+        session = await self.uploads.get(self.r, session.id, 1)
+        self.assertEqual(session.offset, 5)
+        session = await self.uploads.append(self.r, session.id, 1, 5, chunks(b"fghij"))
+        self.assertTrue(session.complete)
+        _, path = await self.uploads.complete(self.r, session.id, 1)
+        self.assertEqual(path.read_bytes(), b"abcdefghij")
+        self.assertLessEqual(await self.r.ttl(f"{UPLOAD_PREFIX}{session.id}"), 60)
+
+    async def test_one_writer_at_a_time(self):
+        session = await self.uploads.create(self.r, 1, 10, "a.jpg")
+        async with self.uploads.lock(self.r, session.id):
+            with self.assertRaises(HTTPException) as cm:
+                await self.uploads.append(self.r, session.id, 1, 0, chunks(b"a"))
+        self.assertEqual(cm.exception.status_code, 409)
+        await self.uploads.append(self.r, session.id, 1, 0, chunks(b"a"))
+
+    async def test_slow_chunk_keeps_lock(self):
+        session = await self.uploads.create(self.r, 1, 10, "a.jpg")
+
+        async def slow(*parts):
+            for part in parts:
+                # longer than lock_ttl
+                await asyncio.sleep(0.25)
+                yield part
+
+        writing = asyncio.create_task(self.uploads.append(self.r, session.id, 1, 0, slow(b"abc")))
+        await asyncio.sleep(0.15)
+        with self.assertRaises(HTTPException) as cm:
+            await self.uploads.append(self.r, session.id, 1, 0, chunks(b"xyz"))
+        self.assertEqual(cm.exception.status_code, 409)
+        self.assertEqual((await writing).offset, 3)
+        self.assertFalse(await self.r.exists(f"{UPLOAD_PREFIX}{session.id}:lock"))
+
+    async def test_lock_released_only_by_holder(self):
+        session = await self.uploads.create(self.r, 1, 10, "a.jpg")
+        key = f"{UPLOAD_PREFIX}{session.id}:lock"
+        async with self.uploads.lock(self.r, session.id) as lock:
+            # refresh stopped (e.g. event loop blocked), the lock expired and was taken
+            lock._refresh.cancel()
+            other = UploadLock(self.r, key, 60)
+            await self.r.delete(key)
+            self.assertTrue(await other.acquire())
+        self.assertEqual(await self.r.get(key), other.token.encode())
+        await other.release()
+        self.assertFalse(await self.r.exists(key))
+
+    async def test_lost_lock_does_not_move_offset(self):
+        session = await self.uploads.create(self.r, 1, 10, "a.jpg")
+
+        async def taken_over(*parts):
+            for part in parts:
+                yield part
+            # the lock of this writer is gone, another request holds it
+            await self.r.set(f"{UPLOAD_PREFIX}{session.id}:lock", "other")
+
+        with self.assertRaises(HTTPException) as cm:
+            await self.uploads.append(self.r, session.id, 1, 0, taken_over(b"abc"))
+        self.assertEqual(cm.exception.status_code, 409)
+        self.assertEqual((await self.uploads.get(self.r, session.id, 1)).offset, 0)
+
+    async def test_open_sessions_per_user(self):
+        first = await self.uploads.create(self.r, 1, 10, "a.jpg")
+        expired = await self.uploads.create(self.r, 1, 10, "b.jpg")
+        await self.r.delete(f"{UPLOAD_PREFIX}{expired.id}")
+        await self.uploads.create(self.r, 1, 10, "c.jpg")
+        with self.assertRaises(HTTPException) as cm:
+            await self.uploads.create(self.r, 1, 10, "d.jpg")
+        self.assertEqual(cm.exception.status_code, 429)
+        # other users are not affected, a removed upload frees its place
+        await self.uploads.create(self.r, 2, 10, "a.jpg")
+        await self.uploads.remove(self.r, first.id, 1)
+        await self.uploads.create(self.r, 1, 10, "d.jpg")
+
+    async def test_owner_and_id_checked(self):
+        session = await self.uploads.create(self.r, 1, 10, "a.jpg")
+        for upload_id, owner_id in ((session.id, 2), ("../etc", 1)):
+            with self.assertRaises(HTTPException) as cm:
+                await self.uploads.get(self.r, upload_id, owner_id)
+            self.assertEqual(cm.exception.status_code, 404)
+
+    async def test_cleanup_removes_expired(self):
+        alive = await self.uploads.create(self.r, 1, 10, "a.jpg")
+        expired = await self.uploads.create(self.r, 2, 10, "b.jpg")
+        fresh = await self.uploads.create(self.r, 3, 10, "c.jpg")
+        await self.r.delete(f"{UPLOAD_PREFIX}{expired.id}", f"{UPLOAD_PREFIX}{fresh.id}")
+        old = os.path.getmtime(self.uploads.path(alive.id)) - 3600
+        for upload in (alive, expired):
+            os.utime(self.uploads.path(upload.id), (old, old))
+        self.assertEqual(await self.uploads.cleanup(self.r), 1)
+        self.assertTrue(self.uploads.path(alive.id).exists())
+        self.assertFalse(self.uploads.path(expired.id).exists())
+        # just created, its key may be written right now
+        self.assertTrue(self.uploads.path(fresh.id).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
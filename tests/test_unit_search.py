@@ -0,0 +1,120 @@
+import sys
+import unittest
+from pathlib import Path
+
+from sqlalchemy import create_engine, delete, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+hw_path: str = str(Path(__file__).resolve().parent.parent)
+sys.path.append(hw_path)
+
+from src.database.models import Base, Image, Tag, User, image_m2m_tag
+from src.services.pagination import encode_cursor
+from src.services.search import post_search, search_terms
+
+
+class TestSearchTerms(unittest.TestCase):
+    def test_terms(self):
+        self.assertEqual(search_terms('Sea "sunset" OR -city*'), ["sea", "sunset", "or", "city"])
+        self.assertEqual(search_terms("  ___ ' \" "), [])
+        self.assertEqual(search_terms(None), [])
+
+    def test_unicode(self):
+        self.assertEqual(search_terms("Захід сонця"), ["захід", "сонця"])
+
+
+class TestPostSearch(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        path = Path(hw_path) / "tests" / "search.sqlite"
+        cls.engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.drop_all(bind=cls.engine)
+        Base.metadata.create_all(bind=cls.engine)
+        cls.async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+        cls.SessionLocal = async_sessionmaker(
+            bind=cls.async_engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        Base.metadata.drop_all(bind=cls.engine)
+        cls.engine.dispose()
+        (Path(hw_path) / "tests" / "search.sqlite").unlink(missing_ok=True)
+
+    async def asyncSetUp(self):
+        self.db = self.SessionLocal()
+        await self.db.execute(delete(image_m2m_tag))
+        await self.db.execute(delete(Image))
+        await self.db.execute(delete(Tag))
+        await self.db.execute(delete(User))
+        owner = User(username="searcher", email="searcher@example.com", password="x")
+        sea, city = Tag(name="sea"), Tag(name="city")
+        self.images = [
+            Image(owner=owner, url_original="1", url_original_qr="", description="Sunset over the sea", tags=[sea]),
+            Image(owner=owner, url_original="2", url_original_qr="", description="Sea, sea and more sea", tags=[]),
+            Image(owner=owner, url_original="3", url_original_qr="", description="Night city lights", tags=[city, sea]),
+            Image(owner=owner, url_original="4", url_original_qr="", description="Mountains", tags=[]),
+        ]
+        self.db.add_all(self.images)
+        await self.db.commit()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+
+    async def ids(self, query, **kwargs):
+        return [image.id for image, _ in await post_search.search(self.db, query, **kwargs)]
+
+    async def test_ranked(self):
+        found = await post_search.search(self.db, "sea")
+        self.assertEqual({image.id for image, _ in found}, {self.images[i].id for i in (0, 1, 2)})
+        self.assertEqual(found[0][0].id, self.images[1].id)
+        ranks = [rank for _, rank in found]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    async def test_prefix_and_all_terms(self):
+        self.assertEqual(await self.ids("sun"), [self.images[0].id])
+        self.assertEqual(await self.ids("sun sea"), [self.images[0].id])
+        self.assertEqual(await self.ids("nothing"), [])
+        self.assertEqual(await self.ids("!!!"), [])
+
+    async def test_tags_filter(self):
+        self.assertEqual(await self.ids("lights", tags=["city", "sea"]), [self.images[2].id])
+        self.assertEqual(await self.ids("sea", tags=["city"]), [self.images[2].id])
+        self.assertEqual(await self.ids("sunset", tags=["city"]), [])
+
+    async def test_tag_names_are_searched(self):
+        self.assertEqual(await self.ids("city"), [self.images[2].id])
+
+    async def test_cursor(self):
+        everything = await post_search.search(self.db, "sea", limit=10)
+        pages, cursor = [], None
+        while True:
+            page = await post_search.search(self.db, "sea", limit=1, cursor=cursor)
+            if not page:
+                break
+            pages.extend(page)
+            image, rank = page[-1]
+            cursor = encode_cursor(rank, image.id)
+        self.assertEqual([i.id for i, _ in pages], [i.id for i, _ in everything])
+
+    async def test_index_follows_changes(self):
+        image = self.images[3]
+        await self.db.execute(
+            update(Image).where(Image.id == image.id).values(description="Sea of clouds")
+        )
+        await self.db.commit()
+        self.assertIn(image.id, await self.ids("clouds"))
+
+        await self.db.execute(delete(image_m2m_tag).where(image_m2m_tag.c.image_id == self.images[2].id))
+        await self.db.commit()
+        self.assertEqual(await self.ids("city"), [self.images[2].id])  # description
+        self.assertEqual(await self.ids("sea", tags=["city"]), [])
+
+        await self.db.execute(delete(Image).where(Image.id == self.images[0].id))
+        await self.db.commit()
+        self.assertEqual(await self.ids("sunset"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
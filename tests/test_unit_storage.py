@@ -0,0 +1,134 @@
+import io
+import sys
+import unittest
+from pathlib import Path
+from tempfile import SpooledTemporaryFile, TemporaryDirectory
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from fastapi import FastAPI, UploadFile
+from fastapi.testclient import TestClient
+from PIL import Image as PILImage
+
+hw_path: str = str(Path(__file__).resolve().parent.parent)
+sys.path.append(hw_path)
+
+from src.conf.config import settings
+from src.routes import static
+from src.services.storage import CloudinaryStorage, LocalStorage, StoredFile
+
+
+def png(width: int = 40, height: int = 20) -> bytes:
+    out = io.BytesIO()
+    PILImage.new("RGB", (width, height), "red").save(out, format="PNG")
+    return out.getvalue()
+
+
+class TestLocalStorage(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = TemporaryDirectory()
+        self.root = Path(self.tmp.name, "media")
+        self.storage = LocalStorage(str(self.root), "/media/")
+
+    async def asyncTearDown(self):
+        self.storage.engine.shutdown()
+        self.tmp.cleanup()
+
+    async def test_same_content_stored_once(self):
+        spooled = SpooledTemporaryFile()
+        spooled.write(png())
+        first = await self.storage.put(UploadFile(spooled, filename="a.png"), key="ignored")
+        second = await self.storage.put(png())
+        self.assertEqual(first, second)
+        self.assertRegex(first.key, r"^[0-9a-f]{2}/[0-9a-f]{64}\.png$")
+        self.assertEqual(first.url, f"/media/{first.key}")
+        self.assertEqual(len([p for p in self.root.rglob("*.png")]), 1)
+        # written outside the served directory
+        self.assertEqual(self.storage.tmp_dir, Path(self.tmp.name, "media_tmp"))
+        self.assertEqual(list(self.storage.tmp_dir.iterdir()), [])
+        self.assertEqual(sorted(p.name for p in self.root.iterdir()), [first.key[:2]])
+
+    async def test_get_delete(self):
+        stored = await self.storage.put(b"text", format="txt")
+        self.assertEqual(await self.storage.get(stored.key), b"text")
+        await self.storage.delete(stored.key)
+        await self.storage.delete(stored.key)
+        with self.assertRaises(FileNotFoundError):
+            await self.storage.get(stored.key)
+
+    async def test_key_outside_root(self):
+        with self.assertRaises(ValueError):
+            await self.storage.get("../secret")
+
+    async def test_transform(self):
+        stored = await self.storage.put(png())
+        rotated = await self.storage.transform(stored, angle=90)
+        self.assertNotEqual(rotated.key, stored.key)
+        with PILImage.open(io.BytesIO(await self.storage.get(rotated.key))) as image:
+            self.assertEqual(image.size, (20, 40))
+        # derived file is content addressed too
+        self.assertEqual(await self.storage.transform(stored, angle=90), rotated)
+
+    def test_key_from_url(self):
+        self.assertEqual(self.storage.key_from_url("/media/ab/abc.png"), "ab/abc.png")
+        self.assertIsNone(self.storage.key_from_url("https://res.cloudinary.com/x/image/upload/v1/a.jpg"))
+
+
+class TestCloudinaryStorage(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.client = MagicMock(cloud_name="demo")
+        self.storage = CloudinaryStorage(self.client)
+
+    async def test_put(self):
+        self.client.upload = AsyncMock(
+            return_value={
+                "public_id": "publication/a",
+                "secure_url": "https://res.cloudinary.com/demo/image/upload/v12/publication/a.jpg",
+                "version": 12,
+            }
+        )
+        stored = await self.storage.put(b"jpeg", key="a", folder="publication")
+        self.assertEqual(stored, StoredFile("publication/a", stored.url, "12"))
+        self.client.upload.assert_awaited_once_with(
+            b"jpeg", public_id="a", folder="publication", format=None, overwrite=True
+        )
+
+    async def test_transform_is_delivery_url(self):
+        self.client.upload = AsyncMock()
+        stored = StoredFile("publication/a", "", "12")
+        transformed = await self.storage.transform(stored, angle=45, width=250, crop="fill")
+        self.assertEqual(
+            transformed.url,
+            "https://res.cloudinary.com/demo/image/upload/a_45,c_fill,w_250/v12/publication/a",
+        )
+        self.client.upload.assert_not_called()
+        # Cloudinary rotates by any angle
+        self.assertIn("/a_30/", (await self.storage.transform(stored, angle=30)).url)
+
+    def test_key_from_url(self):
+        self.assertEqual(
+            self.storage.key_from_url("https://res.cloudinary.com/demo/image/upload/v12/qr_codes/a_qr.png"),
+            "qr_codes/a_qr",
+        )
+        self.assertEqual(
+            self.storage.key_from_url("https://res.cloudinary.com/demo/image/upload/a_45/v12/a.jpg"), "a"
+        )
+        self.assertIsNone(self.storage.key_from_url("/media/ab/abc.png"))
+
+
+class TestMediaMount(unittest.TestCase):
+    def test_media_is_immutable(self):
+        with TemporaryDirectory() as tmp:
+            Path(tmp, "ab").mkdir()
+            Path(tmp, "ab", "abc.png").write_bytes(png())
+            app = FastAPI()
+            with patch.multiple(
+                settings, storage_backend="local", storage_local_dir=tmp, storage_local_url="/media"
+            ):
+                static.add_static(app)
+            response = TestClient(app).get("/media/ab/abc.png")
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("immutable", response.headers["cache-control"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import asyncio
+import sys
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+hw_path: str = str(Path(__file__).resolve().parent.parent)
+sys.path.append(hw_path)
+
+from src.database.models import Base, Tag
+from src.services.tags import TagServices, TagSuggestIndex
+
+
+class TestTagSuggestIndex(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.db = MagicMock()
+        self.db.execute = AsyncMock(
+            return_value=[("sea", 5), ("Sunset", 9), ("summer", 2), ("city", 7), ("sun", 0)]
+        )
+        self.db.__aenter__ = AsyncMock(return_value=self.db)
+        self.db.__aexit__ = AsyncMock(return_value=False)
+        # the rebuild opens its own session
+        session = patch("src.services.tags.AsyncSession", return_value=self.db)
+        session.start()
+        self.addCleanup(session.stop)
+        self.index = TagSuggestIndex(ttl=300)
+        await self.index.get(self.db, "")
+
+    async def test_prefix_by_popularity(self):
+        self.assertEqual(self.index.suggest("s"), [("Sunset", 9), ("sea", 5), ("summer", 2), ("sun", 0)])
+        self.assertEqual(self.index.suggest("SU", 2), [("Sunset", 9), ("summer", 2)])
+        self.assertEqual(self.index.suggest("x"), [])
+        self.assertEqual(self.index.suggest("")[0], ("Sunset", 9))
+
+    async def test_incremental(self):
+        self.index.suggest("su")
+        self.index.add(["sun"], images=10)
+        self.index.add(["surf"], images=0)
+        self.assertEqual(self.index.suggest("su")[0], ("sun", 10))
+        self.assertIn(("surf", 0), self.index.suggest("sur"))
+        self.index.remove("Sunset")
+        self.assertNotIn("Sunset", [name for name, _ in self.index.suggest("s")])
+        self.index.remove("missing")
+
+    async def test_memo_is_bounded(self):
+        index = TagSuggestIndex(ttl=300, memo_size=2)
+        await index.get(self.db, "s")
+        index.suggest("su")
+        index.suggest("s")
+        index.suggest("c")
+        # least recently asked prefix is dropped
+        self.assertEqual(list(index.top), ["s", "c"])
+        self.assertEqual(index.suggest("su")[0], ("Sunset", 9))
+
+    async def test_rebuilt_when_stale(self):
+        self.assertEqual(self.db.execute.await_count, 1)
+        await self.index.get(self.db, "s")
+        self.assertEqual(self.db.execute.await_count, 1)
+        self.index.ttl = 0
+        read = asyncio.Event()
+        rows = self.db.execute.return_value
+
+        async def slow_read(*args):
+            await read.wait()
+            return rows
+
+        self.db.execute.side_effect = slow_read
+        # stale index: one rebuild, requests meanwhile get the old index
+        results = await asyncio.gather(*(self.index.get(self.db, "su", 1) for _ in range(5)))
+        self.assertEqual(results, [[("Sunset", 9)]] * 5)
+        self.index.add(["surf"], images=3)
+        self.assertEqual(self.db.execute.await_count, 2)
+        read.set()
+        await self.index.rebuild
+        self.assertIsNone(self.index.rebuild)
+        # a change made during the rebuild is kept in the new index
+        self.assertEqual(self.index.suggest("sur"), [("surf", 3)])
+
+    async def test_failed_rebuild_keeps_old_index(self):
+        self.index.ttl = 0
+        self.db.execute.side_effect = ConnectionError("db is down")
+        self.assertEqual(await self.index.get(self.db, "c"), [("city", 7)])
+        await asyncio.sleep(0)
+        self.assertIsNone(self.index.rebuild)
+        self.assertEqual(self.index.suggest("c"), [("city", 7)])
+
+    def test_not_built_ignores_changes(self):
+        index = TagSuggestIndex()
+        index.add(["sea"])
+        self.assertEqual(index.counts, {})
+
+
+class TestUpsertTags(unittest.IsolatedAsyncioTestCase):
+    path = Path(hw_path) / "tests" / "tags.sqlite"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = create_engine(f"sqlite:///{cls.path}")
+        Base.metadata.create_all(bind=cls.engine)
+        cls.async_engine = create_async_engine(f"sqlite+aiosqlite:///{cls.path}", poolclass=NullPool)
+        cls.SessionLocal = async_sessionmaker(
+            bind=cls.async_engine, class_=AsyncSession, expire_on_commit=False
+        )
+        cls.services = TagServices(Tag)
+
+    @classmethod
+    def tearDownClass(cls):
+        Base.metadata.drop_all(bind=cls.engine)
+        cls.engine.dispose()
+        cls.path.unlink(missing_ok=True)
+
+    async def asyncSetUp(self):
+        async with self.SessionLocal() as db:
+            await db.execute(delete(Tag))
+            db.add(Tag(name="sea"))
+            await db.commit()
+
+    async def test_existing_and_new_in_one_statement(self):
+        async with self.SessionLocal() as db:
+            tags = await self.services.upsert_tags(db, [" sun", "sea", "", "sun ", "city"])
+            await db.commit()
+            self.assertEqual([tag.name for tag in tags], ["sun", "sea", "city"])
+            self.assertTrue(all(tag.id for tag in tags))
+            names = set(await db.scalars(select(Tag.name)))
+        self.assertEqual(names, {"sea", "sun", "city"})
+
+        async with self.SessionLocal() as db:
+            again = await self.services.upsert_tags(db, ["city", "sun"])
+        self.assertEqual([tag.id for tag in again], [tags[2].id, tags[0].id])
+
+    async def test_concurrent_uploads_share_new_tag(self):
+        async def upload(names):
+            async with self.SessionLocal() as db:
+                tags = await self.services.upsert_tags(db, names)
+                await db.commit()
+                return {tag.name: tag.id for tag in tags}
+
+        first, second = await asyncio.gather(upload(["new", "sea"]), upload(["sea", "new"]))
+        self.assertEqual(first, second)
+
+    async def test_empty(self):
+        async with self.SessionLocal() as db:
+            self.assertEqual(await self.services.upsert_tags(db, ["", " "]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import asyncio
+import io
+import os
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+from PIL import Image as PILImage
+
+hw_path: str = str(Path(__file__).resolve().parent.parent)
+sys.path.append(hw_path)
+
+from src.services.storage import LocalStorage
+from src.services.transforms import DerivedCache, TransformEngine, local_spec, normalize, parse_token, spec_token
+
+
+def png(width: int = 40, height: int = 20) -> bytes:
+    out = io.BytesIO()
+    PILImage.new("RGB", (width, height), "red").save(out, format="PNG")
+    return out.getvalue()
+
+
+class TestSpec(unittest.TestCase):
+    def test_normalize_drops_defaults(self):
+        self.assertEqual(normalize(angle=360, crop="fill", effect=None), {})
+        self.assertEqual(normalize(angle=-90, width="250", format="JPEG"), {"angle": 270, "width": 250, "format": "jpg"})
+
+    def test_token_round_trip(self):
+        spec = normalize(angle=90, width=250, height=100, crop="fill", effect="grayscale", format="webp")
+        token = spec_token(spec)
+        self.assertEqual(token, "a_90,c_fill,e_grayscale,f_webp,h_100,w_250")
+        self.assertEqual(parse_token(token), spec)
+
+    def test_invalid(self):
+        for transformation in (
+            {"crop": "zoom"}, {"width": 0}, {"height": 4097}, {"format": "bmp"}, {"blur": 3}
+        ):
+            with self.assertRaises(ValueError):
+                normalize(**transformation)
+        # any angle for Cloudinary, a step of 45 for Pillow
+        self.assertEqual(normalize(angle=30), {"angle": 30})
+        with self.assertRaises(ValueError):
+            local_spec(angle=30)
+        # same spec written differently would be a second copy in the cache
+        for token in ("w_250,a_90", "a_450", "c_fill", "x_1", "h_90000,w_90000", "a_1", "a_359"):
+            with self.assertRaises(ValueError):
+                parse_token(token)
+
+
+class TestDerivedCache(unittest.TestCase):
+    def test_lru_by_bytes(self):
+        with TemporaryDirectory() as tmp:
+            cache = DerivedCache(tmp, max_bytes=25)
+            for name in ("s/a.png", "s/b.png"):
+                cache.write(name, b"x" * 10)
+                cache.add(name, 10)
+            self.assertIsNotNone(cache.get("s/a.png"))
+            cache.write("s/c.png", b"x" * 10)
+            cache.add("s/c.png", 10)
+            # b is the least recently used
+            self.assertIsNone(cache.get("s/b.png"))
+            self.assertFalse(Path(tmp, "s/b.png").exists())
+            self.assertEqual(cache.stats()["bytes"], 20)
+            self.assertEqual(cache.stats()["evictions"], 1)
+            self.assertEqual(cache.stats()["hit_ratio"], 0.5)
+            # index of another process is built from the directory
+            self.assertEqual(list(DerivedCache(tmp, max_bytes=25).entries), ["s/a.png", "s/c.png"])
+
+    def test_file_removed_by_other_process(self):
+        with TemporaryDirectory() as tmp:
+            cache = DerivedCache(tmp, max_bytes=100)
+            cache.write("s/a.png", b"x")
+            cache.add("s/a.png", 1)
+            Path(tmp, "s/a.png").unlink()
+            self.assertIsNone(cache.get("s/a.png"))
+            self.assertEqual(cache.stats()["bytes"], 0)
+
+
+class TestLocalTransforms(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = TemporaryDirectory()
+        self.storage = LocalStorage(str(Path(self.tmp.name, "media")), "/media")
+        self.engine = self.storage.engine
+
+    async def asyncTearDown(self):
+        self.engine.shutdown()
+        self.tmp.cleanup()
+
+    async def test_repeat_is_cache_hit(self):
+        source = await self.storage.put(png())
+        derived = await self.storage.transform(source, angle=90, width=10, crop="fill", effect="grayscale")
+        signature = self.storage.signature(source.key[3:-4], "a_90,c_fill,e_grayscale,w_10", "png")
+        self.assertEqual(
+            derived.url, f"/media/derived/{source.key[3:-4]}/a_90,c_fill,e_grayscale,w_10.{signature}.png"
+        )
+        with PILImage.open(io.BytesIO(await self.storage.get(derived.key))) as image:
+            self.assertEqual((image.width, image.mode), (10, "L"))
+        self.assertEqual(await self.storage.transform(source, width=10, effect="grayscale", crop="fill", angle=450), derived)
+        stats = self.engine.stats()
+        self.assertEqual(stats["renders"], 1)
+        self.assertEqual(stats["cache"]["hits"], 1)
+
+    async def test_nothing_to_do(self):
+        source = await self.storage.put(png())
+        self.assertEqual(await self.storage.transform(source, angle=0, format="png"), source)
+
+    async def test_concurrent_requests_render_once(self):
+        source = await self.storage.put(png())
+        results = await asyncio.gather(*(self.storage.transform(source, format="jpg") for _ in range(5)))
+        self.assertEqual(len(set(results)), 1)
+        self.assertRegex(results[0].key, r"/f_jpg\.[0-9a-f]{16}\.jpg$")
+        self.assertEqual(self.engine.renders, 1)
+        self.assertEqual(self.engine.coalesced, 4)
+
+    async def test_evicted_file_is_rendered_again(self):
+        source = await self.storage.put(png())
+        derived = await self.storage.transform(source, angle=180)
+        self.storage.path(derived.key).unlink()
+        path = await self.storage.derived(derived.key)
+        self.assertEqual(path.read_bytes(), await self.storage.get(derived.key))
+        self.assertEqual(self.engine.renders, 2)
+        with self.assertRaises(ValueError):
+            await self.storage.derived(derived.key.replace("a_180", "a_0180"))
+
+    async def test_unsigned_key_is_not_rendered(self):
+        source = await self.storage.put(png())
+        derived = await self.storage.transform(source, angle=180)
+        digest = source.key[3:-4]
+        # signature of another secret, of another token, no signature
+        other = LocalStorage(str(self.storage.root), "/media", self.engine, secret="other")
+        for key in (
+            f"derived/{digest}/a_90.{other.signature(digest, 'a_90', 'png')}.png",
+            derived.key.replace("a_180", "a_90"),
+            f"derived/{digest}/a_90.png",
+        ):
+            with self.assertRaises(ValueError):
+                await self.storage.derived(key)
+        self.assertEqual(self.engine.renders, 1)
+
+    async def test_source_delete_drops_derived(self):
+        source = await self.storage.put(png())
+        derived = await self.storage.transform(source, angle=180)
+        await self.storage.delete(source.key)
+        self.assertFalse(self.storage.path(derived.key).exists())
+        with self.assertRaises(FileNotFoundError):
+            await self.storage.derived(derived.key)
+
+
+class TestEngineInProcesses(unittest.IsolatedAsyncioTestCase):
+    async def test_render_runs_in_worker_process(self):
+        with TemporaryDirectory() as tmp:
+            source = Path(tmp, "source.png")
+            source.write_bytes(png())
+            engine = TransformEngine(DerivedCache(Path(tmp, "derived"), 1024 * 1024), workers=1)
+            try:
+                path = await engine.derive(source, "s/a_90.png", {"angle": 90})
+                self.assertEqual(len(engine.executor._processes), 1)
+                self.assertNotIn(os.getpid(), engine.executor._processes)
+                with PILImage.open(path) as image:
+                    self.assertEqual(image.size, (20, 40))
+            finally:
+                engine.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
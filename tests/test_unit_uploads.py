@@ -0,0 +1,66 @@
+import io
+import sys
+import unittest
+from pathlib import Path
+
+from fastapi import FastAPI, Request, UploadFile
+from fastapi.testclient import TestClient
+
+hw_path: str = str(Path(__file__).resolve().parent.parent)
+sys.path.append(hw_path)
+
+from src.services.uploads import BodySizeLimitMiddleware, UploadTooLarge, iter_upload
+
+
+class TestIterUpload(unittest.IsolatedAsyncioTestCase):
+    async def test_chunks_from_start(self):
+        upload = UploadFile(io.BytesIO(b"abcdefg"))
+        await upload.read(3)
+        self.assertEqual([c async for c in iter_upload(upload, chunk_size=3, max_size=10)], [b"abc", b"def", b"g"])
+
+    async def test_too_large(self):
+        upload = UploadFile(io.BytesIO(b"abcdefg"))
+        chunks = []
+        with self.assertRaises(UploadTooLarge):
+            async for chunk in iter_upload(upload, chunk_size=3, max_size=5):
+                chunks.append(chunk)
+        self.assertEqual(chunks, [b"abc"])
+
+
+class TestBodySizeLimitMiddleware(unittest.TestCase):
+    def setUp(self):
+        self.read = []
+        app = FastAPI()
+        app.add_middleware(BodySizeLimitMiddleware, max_size=1000)
+
+        @app.post("/upload")
+        async def upload(request: Request):
+            body = b""
+            async for chunk in request.stream():
+                self.read.append(len(chunk))
+                body += chunk
+            return {"size": len(body)}
+
+        self.client = TestClient(app)
+
+    def test_small_body_passes(self):
+        response = self.client.post("/upload", content=b"x" * 1000)
+        self.assertEqual(response.json(), {"size": 1000})
+
+    def test_content_length_rejected_before_reading(self):
+        response = self.client.post("/upload", content=b"x" * 1001)
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.read, [])
+
+    def test_chunked_body_cut_mid_stream(self):
+        def chunks():
+            for _ in range(10):
+                yield b"x" * 300
+
+        response = self.client.post("/upload", content=chunks())
+        self.assertEqual(response.status_code, 413)
+        self.assertLess(sum(self.read), 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
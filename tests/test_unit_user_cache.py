@@ -0,0 +1,187 @@
+import asyncio
+import sys
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+import fakeredis.aioredis
+import msgpack
+
+hw_path: str = str(Path(__file__).resolve().parent.parent)
+sys.path.append(hw_path)
+
+from src.database.models import Role, User
+from src.services import user_cache
+from src.services.user_cache import (
+    SCHEMA_VERSION,
+    USER_PREFIX,
+    CachedUser,
+    LocalUserCache,
+    decode_user,
+    encode_user,
+)
+
+
+def make_user(email: str = "cached@example.com") -> CachedUser:
+    return CachedUser(
+        id=1,
+        email=email,
+        username="cached",
+        role=Role.user,
+        active=True,
+        confirmed=True,
+        avatar=None,
+        created_at=None,
+    )
+
+
+class TestUserCache(unittest.TestCase):
+    def setUp(self):
+        self.user = User(
+            id=1,
+            username="cached",
+            email="cached@example.com",
+            password="secret",
+            avatar=None,
+            role=Role.admin,
+            active=True,
+            confirmed=False,
+            created_at=datetime(2023, 12, 1, 12, 30),
+        )
+
+    def test_round_trip(self):
+        cached = CachedUser.from_user(self.user)
+        result = decode_user(encode_user(cached))
+        self.assertEqual(result, cached)
+        self.assertIs(result.role, Role.admin)
+        self.assertFalse(result.confirmed)
+        self.assertEqual(result.created_at, self.user.created_at)
+
+    def test_no_password_in_payload(self):
+        payload = encode_user(CachedUser.from_user(self.user))
+        self.assertNotIn(b"secret", payload)
+
+    def test_other_version_is_miss(self):
+        payload = encode_user(CachedUser.from_user(self.user))
+        self.assertIsNone(decode_user(bytes((SCHEMA_VERSION + 1,)) + payload[1:]))
+
+    def test_garbage_is_miss(self):
+        self.assertIsNone(decode_user(None))
+        self.assertIsNone(decode_user(b""))
+        self.assertIsNone(decode_user(bytes((SCHEMA_VERSION,)) + b"\xc1"))
+        self.assertIsNone(
+            decode_user(bytes((SCHEMA_VERSION,)) + msgpack.packb([1, "a"]))
+        )
+
+
+class TestLocalUserCache(unittest.TestCase):
+    def test_hit_and_miss(self):
+        cache = LocalUserCache(maxsize=2, ttl=30)
+        self.assertIsNone(cache.get("a@example.com"))
+        cache.set("a@example.com", make_user("a@example.com"))
+        self.assertEqual(cache.get("a@example.com").email, "a@example.com")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_lru_eviction(self):
+        cache = LocalUserCache(maxsize=2, ttl=30)
+        cache.set("a", make_user("a"))
+        cache.set("b", make_user("b"))
+        cache.get("a")
+        cache.set("c", make_user("c"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl(self):
+        cache = LocalUserCache(maxsize=2, ttl=30)
+        with patch("src.services.user_cache.time.monotonic", return_value=100.0):
+            cache.set("a", make_user("a"))
+        with patch("src.services.user_cache.time.monotonic", return_value=131.0):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.expired, 1)
+
+    def test_disabled(self):
+        cache = LocalUserCache(maxsize=0)
+        cache.set("a", make_user("a"))
+        self.assertIsNone(cache.get("a"))
+
+    def test_stats(self):
+        cache = LocalUserCache(maxsize=2, ttl=30)
+        cache.set("a", make_user("a"))
+        cache.get("a")
+        cache.get("b")
+        cache.invalidate("a")
+        stats = cache.stats()
+        self.assertEqual(stats["hit_ratio"], 0.5)
+        self.assertEqual(stats["invalidations"], 1)
+        self.assertEqual(stats["size"], 0)
+
+
+class TestTwoTierUserCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.r = fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer())
+        self.local = LocalUserCache(maxsize=10, ttl=30)
+        patcher = patch.object(user_cache, "local_cache", self.local)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_set_and_get(self):
+        user = make_user()
+        await user_cache.set_user(user, self.r)
+        self.assertTrue(await self.r.exists(f"{USER_PREFIX}{user.email}"))
+        self.local.clear()
+        # loaded from Redis and kept locally
+        self.assertEqual(await user_cache.get_user(user.email, self.r), user)
+        self.assertIsNotNone(self.local.get(user.email))
+
+    async def test_invalidate(self):
+        user = make_user()
+        await user_cache.set_user(user, self.r)
+        await user_cache.invalidate_user(user.email, self.r)
+        self.assertIsNone(await user_cache.get_user(user.email, self.r))
+
+    async def test_listen_invalidations(self):
+        ready = asyncio.Event()
+        task = asyncio.create_task(user_cache.listen_invalidations(self.r, ready))
+        await asyncio.wait_for(ready.wait(), timeout=5)
+        user = make_user()
+        self.local.set(user.email, user)
+        # changed by other worker
+        await self.r.publish(user_cache.USER_CHANNEL, user.email)
+        for _ in range(50):
+            if not len(self.local):
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+        self.assertIsNone(self.local.get(user.email))
+
+    async def test_listen_invalidations_resubscribe(self):
+        pubsubs = []
+        pubsub = self.r.pubsub
+
+        def track(**kwargs):
+            pubsubs.append(pubsub(**kwargs))
+            return pubsubs[-1]
+
+        self.r.pubsub = track
+        ready = asyncio.Event()
+        task = asyncio.create_task(user_cache.listen_invalidations(self.r, ready))
+        await asyncio.wait_for(ready.wait(), timeout=5)
+        # banned while redis-py was reconnecting, the invalidation is lost
+        user = make_user()
+        self.local.set(user.email, user)
+        # what redis-py does after it reconnects on timeout, no error is raised
+        await pubsubs[0].on_connect(pubsubs[0].connection)
+        for _ in range(50):
+            if not len(self.local):
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+        self.assertEqual(len(pubsubs), 1)
+        self.assertIsNone(self.local.get(user.email))
+
+
+if __name__ == "__main__":
+    unittest.main()
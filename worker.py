@@ -0,0 +1,60 @@
+"""Worker of background jobs: transforms and QR codes of posts,
+and QR codes of new posts queued by the publication.
+
+    python worker.py --name worker-1 --concurrency 4
+
+Jobs are queued by the API (src/routes/cloudinary_route.py) in Redis.
+A worker restarted with the same --name queues again the jobs it took
+and did not finish.
+"""
+import argparse
+import asyncio
+import logging
+import socket
+
+from src.conf.config import settings
+from src.database import redis_pool
+from src.database.db import SessionLocal
+from src.services import image_jobs  # noqa: F401 handlers of the jobs
+from src.services.cloudinary_srv import cloudinary_client
+from src.services.jobs import JobContext, JobWorker, job_queue
+from src.services.qr import qr_renderer
+from src.services.qr_pipeline import qr_pipeline
+from src.services.storage import LocalStorage, storage
+
+
+async def run(name: str, concurrency: int) -> None:
+    r = await redis_pool.init_redis()
+    context = JobContext(session_factory=SessionLocal, storage=storage, r=r)
+    worker = JobWorker(
+        job_queue,
+        context,
+        name=name,
+        concurrency=concurrency,
+        poll_timeout=settings.job_poll_timeout,
+    )
+    logging.info(f"Job worker {name}: {concurrency} jobs at a time")
+    try:
+        await asyncio.gather(worker.run(), qr_pipeline.run(context, name))
+    finally:
+        await cloudinary_client.close()
+        qr_renderer.shutdown()
+        if isinstance(storage, LocalStorage):
+            storage.engine.shutdown()
+        await redis_pool.close_redis()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--name", default=socket.gethostname())
+    parser.add_argument("--concurrency", type=int, default=settings.job_workers)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(run(args.name, args.concurrency))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()